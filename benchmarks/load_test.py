@@ -0,0 +1,480 @@
+"""Load test of every generated endpoint, with a JSON report and a comparison against a baseline report.
+
+Synthetic CSV files shaped like data/tunisian_pop.csv (the same governorates, plus float, boolean, date and
+missing values, with low and high cardinality columns) are generated once per size in --data-dir with a fixed
+seed. For each size, every endpoint is driven :
+- through the Flask test client, one request at a time, in a process of its own so that its peak RSS is measured,
+- through a real local gunicorn server (config/gunicorn.conf.py) by --concurrency client threads.
+The throughput, the p50/p95/p99 latencies, the errors and the peak RSS of each endpoint are written to --output.
+
+With --baseline, the report is compared with a previous one and the regressions of the p95 latency, of the
+throughput or of the peak RSS beyond --threshold are listed (exit status 1). A stored report can be compared
+without running the benchmark again with --compare.
+
+Usage : python benchmarks/load_test.py [--sizes 10k,1M,10M] [--modes client,server] [--requests 50]
+                                       [--concurrency 8] [--output report.json] [--baseline baseline.json]
+        python benchmarks/load_test.py --compare report.json --baseline baseline.json
+"""
+import argparse
+import base64
+import datetime
+import http.client
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+REPOSITORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SOURCE_CSV = os.path.join(REPOSITORY, "data", "tunisian_pop.csv")
+sys.path.insert(0, REPOSITORY)
+
+SIZES = {"10k": 10000, "1M": 1000000, "10M": 10000000}
+DATASET = "synthetic_pop"
+WRITES_DATASET = "synthetic_pop_writes"
+GENERATION_CHUNK_ROWS = 1000000
+MARKER_GOUVERNORAT = 0  # code of the rows written by the benchmark, absent from the generated ones
+
+# Metrics compared with a baseline : True when a higher value is a regression
+COMPARED_METRICS = {"p95_ms": True, "throughput_rps": False, "peak_rss_mb": True}
+
+
+# -----------------------------
+# Synthetic data
+# -----------------------------
+
+def generate_csv(path, rows, seed):
+    """Write a CSV of the given number of rows shaped like the bundled one, chunk by chunk."""
+    gouvernorats = pd.read_csv(SOURCE_CSV)[["code_gouvernorat", "nom_gouvernorat_ar"]].drop_duplicates()
+    codes = gouvernorats["code_gouvernorat"].to_numpy()
+    names = gouvernorats["nom_gouvernorat_ar"].to_numpy()
+    rng = np.random.default_rng(seed)
+    municipalites = max(rows // 20, 1)
+    temporary_path = path + ".tmp"
+    for start in range(0, rows, GENERATION_CHUNK_ROWS):
+        count = min(GENERATION_CHUNK_ROWS, rows - start)
+        gouvernorat = rng.integers(0, len(codes), count)
+        municipalite = rng.integers(0, municipalites, count)
+        density = rng.lognormal(5, 1.5, count).round(2)
+        density[rng.random(count) < 0.05] = np.nan
+        chunk = pd.DataFrame({
+            "code_municipalite": codes[gouvernorat] * 100000 + municipalite,  # high cardinality
+            "nom_municipalite_ar": np.char.add("Municipalite ", municipalite.astype(str)),
+            "code_gouvernorat": codes[gouvernorat],  # low cardinality
+            "nom_gouvernorat_ar": names[gouvernorat],
+            "population_annee": rng.integers(2014, 2025, count),
+            "population_valeur": rng.integers(1000, 1000000, count),
+            "densite": density,  # float with missing values
+            "est_urbaine": rng.random(count) < 0.6,
+            "date_recensement": (np.datetime64("2014-01-01") + rng.integers(0, 3650, count)).astype(str),
+        })
+        chunk.to_csv(temporary_path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+    os.replace(temporary_path, path)
+
+
+def prepare_work_directory(data_dir, size, seed, response_cache):
+    """Lay out a work directory with its own config and data directory (the API reads ./config and ./data),
+    generating the CSV of this size if it is not there yet and copying it for the writes."""
+    work_directory = os.path.join(data_dir, size)
+    os.makedirs(os.path.join(work_directory, "data"), exist_ok=True)
+    os.makedirs(os.path.join(work_directory, "config"), exist_ok=True)
+    csv_path = os.path.join(data_dir, "%s_%s_seed%d.csv" % (DATASET, size, seed))
+    if not os.path.exists(csv_path):
+        print("Generating %s rows into %s" % (size, csv_path), file=sys.stderr)
+        generate_csv(csv_path, SIZES[size], seed)
+    for name in os.listdir(os.path.join(work_directory, "data")):
+        if name.endswith(".csv"):
+            os.remove(os.path.join(work_directory, "data", name))
+    for filename in [DATASET, WRITES_DATASET]:
+        shutil.copyfile(csv_path, os.path.join(work_directory, "data", filename + ".csv"))
+
+    config = json.load(open(os.path.join(REPOSITORY, "config", "config.json")))
+    # Without the response cache, the repeated requests measure the work of the endpoints, not the cache
+    if not response_cache:
+        config["response_cache_max_memory_mb"] = 0
+    config["indexed_columns"] = {filename: ["code_gouvernorat", "nom_gouvernorat_ar", "population_annee"] for filename in [DATASET, WRITES_DATASET]}
+    json.dump(config, open(os.path.join(work_directory, "config", "config.json"), "w"), indent=4)
+    shutil.copyfile(os.path.join(REPOSITORY, "config", "gunicorn.conf.py"), os.path.join(work_directory, "config", "gunicorn.conf.py"))
+    return work_directory, os.path.getsize(csv_path)
+
+
+# -----------------------------
+# Scenarios
+# -----------------------------
+
+def marker_row():
+    return [{"code_municipalite": 1, "nom_municipalite_ar": "Benchmark", "code_gouvernorat": MARKER_GOUVERNORAT,
+        "nom_gouvernorat_ar": "Benchmark", "population_annee": 2024, "population_valeur": 1, "densite": 1.0,
+        "est_urbaine": True, "date_recensement": "2024-01-01"}]
+
+
+def scratch_creation(scratch):
+    return ("POST", "/csv2api/" + scratch + "/csv_file_creation/records", {"json": [{"a": 1, "b": "x"}, {"a": 2, "b": "y"}]})
+
+
+def scratch_deletion(scratch):
+    return ("DELETE", "/csv2api/" + scratch + "/csv_file_deletion", {})
+
+
+def scenarios():
+    """The benchmarked requests : name -> (request, heavy). A request is a function of a unique number returning
+    the timed request (method, path, options) and optionally the untimed ones to send before and after it.
+    Heavy requests return the whole file and are sent --heavy-requests times only."""
+    sql = base64.urlsafe_b64encode(("SELECT nom_gouvernorat_ar, sum(population_valeur) AS population FROM " + DATASET
+        + " GROUP BY 1 ORDER BY 2 DESC").encode()).decode()
+    batch = {"queries": dict(
+        [("municipalite_%d" % i, {"type": "filter", "column": "code_municipalite", "value": 1100000 + i}) for i in range(100)]
+        + [("population", {"type": "aggregate", "function": "sum", "column": "population_valeur", "group_by": "nom_gouvernorat_ar"})])}
+    data = "/csv2api/" + DATASET
+    writes = "/csv2api/" + WRITES_DATASET
+    return {
+        "header": (lambda n: (("GET", data + "/header", {}),), False),
+        "all_data": (lambda n: (("GET", data + "/all_data", {}),), True),
+        "all_data_stream": (lambda n: (("GET", data + "/all_data?stream=ndjson", {}),), True),
+        "filter_page": (lambda n: (("GET", data + "/filter/code_gouvernorat/11?limit=1000&offset=%d" % (n * 1000 % 5000), {}),), False),
+        "filter_low_cardinality": (lambda n: (("GET", data + "/filter/code_gouvernorat/11?limit=1000", {}),), False),
+        "filter_high_cardinality": (lambda n: (("GET", data + "/filter/code_municipalite/%d" % (1100000 + n % 100), {}),), False),
+        "filter_string": (lambda n: (("GET", data + "/filter/nom_gouvernorat_ar/Ariana?limit=1000&fields=nom_municipalite_ar,densite", {}),), False),
+        "search": (lambda n: (("POST", data + "/search?code_gouvernorat=12&population_annee=2020&limit=1000", {}),), False),
+        "summary_stats": (lambda n: (("GET", data + "/summary_stats", {}),), False),
+        "value_counts": (lambda n: (("GET", data + "/value_counts", {}),), False),
+        "sql": (lambda n: (("GET", data + "/sql?query=" + sql, {}),), False),
+        "batch": (lambda n: (("POST", data + "/batch", {"json": batch}),), False),
+        "catalog": (lambda n: (("GET", "/csv2api/catalog", {}),), False),
+        "health": (lambda n: (("GET", "/csv2api/health", {}),), False),
+        "ready": (lambda n: (("GET", "/csv2api/ready", {}),), False),
+        "cache_stats": (lambda n: (("GET", "/csv2api/cache_stats", {}),), False),
+        "metrics": (lambda n: (("GET", "/metrics", {}),), False),
+        "row_append": (lambda n: (("PUT", writes + "/row_append/records", {"json": marker_row()}),), False),
+        "value_replace": (lambda n: (("PUT", writes + "/value_replace?_column_to_update_=population_valeur&_new_value_to_set_=%d&code_gouvernorat=%d"
+            % (n, MARKER_GOUVERNORAT), {}),), False),
+        "row_deletion": (lambda n: (("DELETE", writes + "/row_deletion?code_gouvernorat=%d" % MARKER_GOUVERNORAT, {}),
+            ("PUT", writes + "/row_append/records", {"json": marker_row()})), False),
+        "csv_file_creation": (lambda n: (scratch_creation("scratch_%d" % n), None, scratch_deletion("scratch_%d" % n)), False),
+        "column_deletion": (lambda n: (("DELETE", "/csv2api/scratch_%d/column_deletion/b" % n, {}),
+            scratch_creation("scratch_%d" % n), scratch_deletion("scratch_%d" % n)), False),
+        "csv_file_deletion": (lambda n: (scratch_deletion("scratch_%d" % n), scratch_creation("scratch_%d" % n)), False),
+    }
+
+
+def summarize(latencies, errors, elapsed, peak_rss_mb):
+    latencies_ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "peak_rss_mb": round(peak_rss_mb, 1) if peak_rss_mb is not None else None,
+    }
+
+
+def request_count(heavy, args):
+    return args.heavy_requests if heavy else args.requests
+
+
+# -----------------------------
+# Flask test client
+# -----------------------------
+
+def peak_rss_mb():
+    """Peak resident set size of the current process, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_client(work_directory, args, results):
+    """Send the requests of every scenario one after the other through the Flask test client."""
+    os.chdir(work_directory)
+    import csv2api
+    start = time.perf_counter()
+    client = csv2api.create_app("./config/config.json").test_client()
+    report = {"startup_seconds": round(time.perf_counter() - start, 3), "peak_rss_after_startup_mb": round(peak_rss_mb(), 1), "scenarios": {}}
+    counter = itertools.count()
+
+    def send(method, path, options):
+        return client.open(path, method=method, **options)
+
+    for name, (build, heavy) in scenarios().items():
+        latencies, errors = [], 0
+        requests = [build(next(counter)) for _ in range(request_count(heavy, args) + 1)]
+        for i, (timed, before, after) in enumerate(request + (None,) * (3 - len(request)) for request in requests):
+            if before is not None:
+                send(*before)
+            start = time.perf_counter()
+            response = send(*timed)
+            response.get_data()
+            elapsed = time.perf_counter() - start
+            if after is not None:
+                send(*after)
+            # The first request warms up the caches and is not measured
+            if i == 0:
+                continue
+            latencies.append(elapsed)
+            errors += response.status_code >= 400
+        report["scenarios"][name] = summarize(latencies, errors, sum(latencies), peak_rss_mb())
+        print("client %s %s %s" % (os.path.basename(work_directory), name, report["scenarios"][name]), file=sys.stderr)
+    report["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    results["client"] = report
+
+
+# -----------------------------
+# Real local server
+# -----------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_processes(pid):
+    """The pid of the gunicorn master and of its workers."""
+    pids = [pid]
+    for name in os.listdir("/proc"):
+        if name.isdigit():
+            try:
+                with open("/proc/" + name + "/stat") as stat:
+                    if int(stat.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        pids.append(int(name))
+            except (OSError, IndexError, ValueError):
+                pass
+    return pids
+
+
+def server_peak_rss_mb(pid):
+    """Sum of the peak RSS (VmHWM) of the server processes, in MB. None where /proc is not available."""
+    if not os.path.isdir("/proc"):
+        return None
+    total = 0
+    for process in server_processes(pid):
+        try:
+            with open("/proc/%d/status" % process) as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        total += int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    return total
+
+
+class HTTP_Client:
+    """One keep-alive connection to the server per client thread."""
+
+    def __init__(self, port):
+        self.port = port
+        self.local = threading.local()
+
+    def send(self, method, path, options):
+        body, headers = None, {}
+        if "json" in options:
+            body, headers = json.dumps(options["json"]), {"Content-Type": "application/json"}
+        for attempt in range(2):
+            connection = getattr(self.local, "connection", None)
+            if connection is None:
+                connection = self.local.connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=600)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                self.local.connection = None
+                if attempt:
+                    raise
+
+
+def wait_until_ready(client, process, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The server stopped with the status %d" % process.returncode)
+        try:
+            if client.send("GET", "/csv2api/ready", {}) == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("The server was not ready after %d seconds" % timeout)
+
+
+def run_server(work_directory, args):
+    """Start gunicorn on the work directory and send the requests of every scenario from --concurrency threads."""
+    port = free_port()
+    environment = dict(os.environ, PYTHONPATH=os.path.abspath(REPOSITORY) + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    command = [sys.executable, "-m", "gunicorn", "-c", "config/gunicorn.conf.py", "--bind", "127.0.0.1:%d" % port,
+        "--workers", str(args.server_workers), "csv2api:create_app()"]
+    log = open(os.path.join(work_directory, "gunicorn.log"), "w")
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=work_directory, env=environment, stdout=log, stderr=subprocess.STDOUT)
+    client = HTTP_Client(port)
+    counter = itertools.count()
+    try:
+        wait_until_ready(client, process, args.startup_timeout)
+        report = {"startup_seconds": round(time.perf_counter() - start, 3), "concurrency": args.concurrency,
+            "workers": args.server_workers, "peak_rss_after_startup_mb": server_peak_rss_mb(process.pid), "scenarios": {}}
+
+        def timed_request(request):
+            timed, before, after = request + (None,) * (3 - len(request))
+            if before is not None:
+                client.send(*before)
+            start = time.perf_counter()
+            status = client.send(*timed)
+            elapsed = time.perf_counter() - start
+            if after is not None:
+                client.send(*after)
+            return elapsed, status
+
+        with ThreadPoolExecutor(args.concurrency) as executor:
+            for name, (build, heavy) in scenarios().items():
+                # Warm up every client thread and the caches of every worker
+                list(executor.map(timed_request, [build(next(counter)) for _ in range(args.concurrency)]))
+                requests = [build(next(counter)) for _ in range(request_count(heavy, args))]
+                scenario_start = time.perf_counter()
+                timings = list(executor.map(timed_request, requests))
+                elapsed = time.perf_counter() - scenario_start
+                report["scenarios"][name] = summarize([latency for latency, _ in timings], sum(status >= 400 for _, status in timings),
+                    elapsed, server_peak_rss_mb(process.pid))
+                print("server %s %s %s" % (os.path.basename(work_directory), name, report["scenarios"][name]), file=sys.stderr)
+        report["peak_rss_mb"] = server_peak_rss_mb(process.pid)
+        return report
+    finally:
+        process.terminate()
+        process.wait()
+        log.close()
+
+
+# -----------------------------
+# Report and comparison
+# -----------------------------
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=REPOSITORY, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report_metadata(args):
+    import flask
+    return {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "flask": flask.__version__,
+        "platform": platform.platform(),
+        "cpu_count": multiprocessing.cpu_count(),
+        "arguments": {key: value for key, value in vars(args).items() if key not in ["compare", "baseline", "output"]},
+    }
+
+
+def compare_reports(baseline, current, threshold):
+    """Return the regressions of the current report : the metrics of a scenario which got worse than in the baseline
+    by more than 'threshold' (relative). Latencies below 1 ms are too noisy to be compared."""
+    regressions = []
+    for size, modes in current["results"].items():
+        for mode, report in modes.items():
+            if not isinstance(report, dict) or "scenarios" not in report:
+                continue
+            baseline_report = baseline["results"].get(size, {}).get(mode, {})
+            for name, metrics in report["scenarios"].items():
+                baseline_metrics = baseline_report.get("scenarios", {}).get(name)
+                if baseline_metrics is None:
+                    continue
+                for metric, higher_is_worse in COMPARED_METRICS.items():
+                    before, after = baseline_metrics.get(metric), metrics.get(metric)
+                    if not before or after is None:
+                        continue
+                    if metric.endswith("_ms") and max(before, after) < 1:
+                        continue
+                    change = (after - before) / before
+                    if (change > threshold) if higher_is_worse else (change < -threshold):
+                        regressions.append({"size": size, "mode": mode, "scenario": name, "metric": metric,
+                            "baseline": before, "current": after, "change": round(change, 3)})
+    return regressions
+
+
+def print_regressions(regressions, threshold):
+    if not regressions:
+        print("No regression beyond %d%% against the baseline." % (threshold * 100))
+        return
+    print("%d regression(s) beyond %d%% against the baseline :" % (len(regressions), threshold * 100))
+    for regression in regressions:
+        print("  %(size)s %(mode)s %(scenario)s %(metric)s : %(baseline)s -> %(current)s (%(change)+.1f%%)"
+            % dict(regression, change=regression["change"] * 100))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10k,1M,10M", help="comma separated sizes among " + ", ".join(SIZES))
+    parser.add_argument("--modes", default="client,server", help="'client' (Flask test client) and/or 'server' (gunicorn)")
+    parser.add_argument("--requests", type=int, default=50, help="measured requests per endpoint")
+    parser.add_argument("--heavy-requests", type=int, default=5, help="measured requests of the endpoints returning the whole file")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads sending requests to the server")
+    parser.add_argument("--server-workers", type=int, default=2)
+    parser.add_argument("--startup-timeout", type=int, default=1800)
+    parser.add_argument("--response-cache", action="store_true", help="keep the response cache of the config enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "csv2api_benchmarks"))
+    parser.add_argument("--output", default="load_test_report.json")
+    parser.add_argument("--baseline", help="previous report to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    parser.add_argument("--compare", help="compare this stored report with --baseline instead of running the benchmark")
+    args = parser.parse_args()
+
+    if args.compare:
+        if not args.baseline:
+            parser.error("--compare requires --baseline")
+        report = json.load(open(args.compare))
+    else:
+        sizes = args.sizes.split(",")
+        modes = args.modes.split(",")
+        for size in sizes:
+            if size not in SIZES:
+                parser.error("unknown size '%s'" % size)
+        report = {"metadata": report_metadata(args), "results": {}}
+        for size in sizes:
+            work_directory, csv_bytes = prepare_work_directory(args.data_dir, size, args.seed, args.response_cache)
+            results = multiprocessing.Manager().dict()
+            if "client" in modes:
+                process = multiprocessing.Process(target=run_client, args=(work_directory, args, results))
+                process.start()
+                process.join()
+                if process.exitcode != 0:
+                    raise RuntimeError("The test client benchmark of %s rows failed" % size)
+                # The writes of the test client run are not carried over to the server run
+                work_directory, csv_bytes = prepare_work_directory(args.data_dir, size, args.seed, args.response_cache)
+            if "server" in modes:
+                results["server"] = run_server(work_directory, args)
+            report["results"][size] = dict(results, rows=SIZES[size], csv_mb=round(csv_bytes / (1024 * 1024), 1))
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=4)
+        print("Report written to " + args.output)
+
+    if args.baseline:
+        regressions = compare_reports(json.load(open(args.baseline)), report, args.threshold)
+        print_regressions(regressions, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
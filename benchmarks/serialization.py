@@ -0,0 +1,89 @@
+"""Benchmark of the JSON serialization of the 'records' endpoints (all_data, filter, search, sql).
+
+Compares the former path, json.loads(df.to_json()) re-serialized by flask_restx, with the direct one
+which sends the pandas JSON string as it is. The bundled data/tunisian_pop.csv is scaled up to the
+wished number of rows and each mode runs in its own process so that its peak RSS can be measured.
+
+Usage : python benchmarks/serialization.py [--rows 1000000] [--repeat 3]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# Imported by both modes before their baseline RSS is measured : neither the timings nor the peak RSS
+# of the direct path include the import of flask_restx, duckdb or pyarrow
+import csv2api
+
+SOURCE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "tunisian_pop.csv")
+
+
+def scaled_dataframe(rows):
+    """Repeat the bundled CSV until it reaches the wished number of rows."""
+    df = pd.read_csv(SOURCE_CSV)
+    repeats = rows // len(df) + 1
+    return pd.concat([df] * repeats, ignore_index=True).iloc[:rows]
+
+
+def before(df):
+    """Former path : pandas JSON string parsed back into python objects, then serialized again."""
+    records = json.loads(df.to_json(orient="records"))
+    return json.dumps(records).encode()
+
+
+def after(df):
+    """Direct path : the pandas JSON string is sent as it is."""
+    with csv2api.app.test_request_context("/"):
+        return csv2api.dataframe_response(df).get_data()
+
+
+def peak_rss_mb():
+    """Peak resident set size of the current process, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_mode(mode, rows, repeat, results):
+    df = scaled_dataframe(rows)
+    rss_loaded = peak_rss_mb()
+    serialize = before if mode == "before" else after
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = serialize(df)
+        durations.append(time.perf_counter() - start)
+        del body
+    best = min(durations)
+    results[mode] = {
+        "rows": rows,
+        "best_seconds": round(best, 4),
+        "records_per_second": int(rows / best),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "peak_rss_over_loaded_dataframe_mb": round(peak_rss_mb() - rss_loaded, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = multiprocessing.Manager().dict()
+    for mode in ["before", "after"]:
+        process = multiprocessing.Process(target=run_mode, args=(mode, args.rows, args.repeat, results))
+        process.start()
+        process.join()
+    results = dict(results)
+    results["speedup"] = round(results["after"]["records_per_second"] / results["before"]["records_per_second"], 2)
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# Settings of the pre-fork multi-worker production server, taken from ./config/config.json
+# Run it with : gunicorn -c config/gunicorn.conf.py "csv2api:create_app()"
+# kill -HUP <gunicorn master pid> replaces the workers gracefully and reads again the server settings below, but with
+# 'preload_app' the new workers are forked from the app loaded by the master : the code and the other settings of
+# config.json are only reloaded by a full restart of gunicorn
+import gc
+import json
+import multiprocessing
+
+server_config = json.load(open('./config/config.json',))
+
+bind = server_config["server_bind"]
+workers = int(server_config["server_workers"]) or multiprocessing.cpu_count() # 0 means one worker per core
+threads = int(server_config["server_threads"])
+worker_class = "gthread"
+timeout = int(server_config["server_timeout_seconds"])
+graceful_timeout = int(server_config["server_timeout_seconds"])
+
+# The app (and the datasets of 'preload_datasets') is loaded once in the master before forking the workers,
+# which then share the memory pages of the loaded dataframes copy-on-write. With 'background_warm_up',
+# each worker loads them itself after the fork instead, so that the server starts at once.
+preload_app = True
+
+def pre_fork(server, worker):
+    # Keep the garbage collector of the workers from writing into the pages of the preloaded objects
+    gc.freeze()
+
+def post_fork(server, worker):
+    # Threads do not survive the fork : the background warm-up and the watcher of ./data are started in each worker
+    import csv2api
+    csv2api.start_background_tasks()
@@ -1,15 +1,55 @@
-from flask import Flask, jsonify, request
+from flask import Flask, request, Response, stream_with_context
 from flask_restx import Api, Resource, reqparse, fields
+import numpy as np
 import pandas as pd
 import pandasql as ps
-from pandas.api.types import is_numeric_dtype
+from pandas.api.types import is_numeric_dtype, is_scalar
 import os
 import json
 import base64
+import copy
+import hashlib
+import functools
+import io
+import itertools
+import multiprocessing
 import re
+import threading
+import time
+import fcntl
+import zlib
+import cProfile
+import pstats
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import quote
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
 
 app = Flask(__name__)
-app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
 api = Api(app,
     title='CSV 2 API',
     version='1.0',
@@ -20,6 +60,106 @@ home_directory = "./data/"
 API_error_no_CSV_found = "API successfully reached but this CSV was not found. Please try another endpoint with an existing filename."
 API_error_endpoint_disabled = "API successfully reached but this functionnality of the API / endpoint is disabled."
 
+
+# -----------------------------
+# Instrumentation
+# -----------------------------
+
+def format_metric_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(k + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """Registry of the counters and latency histograms of the process, exposed in the Prometheus text format
+    by /metrics. Every worker process of the production server has its own registry."""
+
+    buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def render(self, gauges):
+        """Return the Prometheus text exposition of the counters, of the histograms and of the given gauges,
+        a list of (name, labels, value)."""
+        lines = []
+        def add_type(name, metric_type):
+            if not lines or not lines[-1].startswith(name):
+                lines.append("# TYPE " + name + " " + metric_type)
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                add_type(name, "counter")
+                lines.append(name + format_metric_labels(labels) + " " + repr(float(value)))
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                add_type(name, "histogram")
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    lines.append(name + "_bucket" + format_metric_labels(labels + (("le", repr(bound)),)) + " " + str(count))
+                lines.append(name + "_bucket" + format_metric_labels(labels + (("le", "+Inf"),)) + " " + str(histogram["count"]))
+                lines.append(name + "_sum" + format_metric_labels(labels) + " " + repr(histogram["sum"]))
+                lines.append(name + "_count" + format_metric_labels(labels) + " " + str(histogram["count"]))
+        for name, labels, value in gauges:
+            add_type(name, "gauge")
+            lines.append(name + format_metric_labels(tuple(sorted(labels.items()))) + " " + repr(float(value)))
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+# Instrumentation state of the request served by the current thread (also set in the work pool threads running for it)
+request_state = threading.local()
+
+def current_request_state():
+    return getattr(request_state, "current", None)
+
+
+@contextmanager
+def timed_phase(phase):
+    """Time a phase of the current request : load, parse, filter, sql, aggregate, serialization or write.
+    Phases can be nested (e.g. parse is part of load) so their durations do not add up."""
+    state = current_request_state()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe("csv2api_phase_duration_seconds", elapsed, endpoint=state["endpoint"] if state else "background", phase=phase)
+        if state is not None:
+            state["phases"][phase] = state["phases"].get(phase, 0.0) + elapsed
+
+
+def count_rows(scanned=0, returned=0):
+    """Count the rows scanned and returned by the current request."""
+    state = current_request_state()
+    endpoint = state["endpoint"] if state else "background"
+    if scanned:
+        metrics.increment("csv2api_rows_scanned_total", scanned, endpoint=endpoint)
+    if returned:
+        metrics.increment("csv2api_rows_returned_total", returned, endpoint=endpoint)
+    if state is not None:
+        state["rows_scanned"] += scanned
+        state["rows_returned"] += returned
+
+
 def convert_pandas_dtypes_to_builtin_types(col_type):
     """Convert pandas data types to python builtin ones, like pandas object to python str."""
     col_type = str(col_type)
@@ -35,7 +175,8 @@ def convert_pandas_dtypes_to_builtin_types(col_type):
         return str
 
 def read_csv_by_chunks(complete_path, chunksize):
-    """Read & load progressively a stored CSV file chunk by chunk."""
+    """Read & load progressively a stored CSV file chunk by chunk. The chunks are concatenated, so the whole file
+    ends up in memory : the files processed out-of-core (see is_out_of_core) are never read this way."""
     df_chunk = pd.read_csv(complete_path, chunksize=chunksize)
     chunk_list = []
     for chunk in df_chunk:
@@ -44,10 +185,2173 @@ def read_csv_by_chunks(complete_path, chunksize):
     return df_concat
 
 
+def is_out_of_core(filename):
+    """True if a stored CSV file is larger than 'out_of_core_min_mb' : it is then never loaded whole in memory,
+    and the endpoints supporting it process it chunk by chunk of 'out_of_core_chunksize' rows instead."""
+    min_mb = float(config["out_of_core_min_mb"])
+    try:
+        return min_mb > 0 and os.path.getsize(home_directory + filename + ".csv") >= min_mb * 1024 * 1024
+    except FileNotFoundError:
+        return False
+
+
+class Out_Of_Core_Error(Exception):
+    """Raised when an endpoint needing the whole dataset in memory is called on a CSV file processed out-of-core."""
+
+
+class File_Lock:
+    """Reader/writer lock of a stored CSV file, shared by the threads and the processes of the server
+    (flock on a file of 'lock_directory'). Writers take it exclusive, loads from the disk take it shared.
+    A thread which already holds the lock of a file takes it again without blocking."""
+
+    held = threading.local()
+
+    def __init__(self, filename, exclusive):
+        self.filename = filename
+        self.exclusive = exclusive
+        self.lock_file = None
+
+    def __enter__(self):
+        held_filenames = File_Lock.held.__dict__.setdefault("filenames", set())
+        if File_Lock.is_held(self.filename):
+            return self
+        os.makedirs(config["lock_directory"], exist_ok=True)
+        self.lock_file = open(config["lock_directory"] + self.filename + ".lock", "a")
+        fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        held_filenames.add(self.filename)
+        return self
+
+    @staticmethod
+    def is_held(filename):
+        """Whether the current thread holds the lock of a file."""
+        return filename in getattr(File_Lock.held, "filenames", ())
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.lock_file is not None:
+            File_Lock.held.filenames.discard(self.filename)
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+
+
+def write_csv_atomically(filename, df):
+    """Rewrite a stored CSV file through a temporary file renamed over it, so that a reader sees either the
+    old or the new file but never a half-written one. Must be called with the exclusive File_Lock of the file."""
+    complete_path = home_directory + filename + ".csv"
+    temporary_path = home_directory + "." + filename + ".csv.tmp"
+    try:
+        with open(temporary_path, "w", newline="") as csv_file:
+            df.to_csv(csv_file, index = False, chunksize = int(config["pandas_chunksize"]))
+            csv_file.flush()
+            os.fsync(csv_file.fileno())
+        os.replace(temporary_path, complete_path)
+    except:
+        if os.path.isfile(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def write_csv_chunks_atomically(filename, chunks, is_changed):
+    """Rewrite a stored CSV file like write_csv_atomically, from chunks of rows spilled one by one to the temporary file.
+    Once all the chunks are written, the file is only replaced if is_changed() : return whether it was."""
+    complete_path = home_directory + filename + ".csv"
+    temporary_path = home_directory + "." + filename + ".csv.tmp"
+    try:
+        with open(temporary_path, "w", newline="") as csv_file:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(csv_file, index = False, header = i == 0)
+            is_replaced = is_changed()
+            if is_replaced:
+                csv_file.flush()
+                os.fsync(csv_file.fileno())
+        if is_replaced:
+            os.replace(temporary_path, complete_path)
+        else:
+            os.remove(temporary_path)
+        return is_replaced
+    except:
+        if os.path.isfile(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def sidecar_path(filename):
+    """Path of the columnar Arrow IPC (Feather v2) sidecar of a stored CSV file."""
+    return config["sidecar_directory"] + filename + ".arrow"
+
+
+def open_fresh_sidecar(filename):
+    """Memory-map the sidecar of a CSV file and return its Arrow IPC reader, or None if it is missing,
+    stale (the CSV mtime or size changed since its conversion) or if pyarrow is not installed."""
+    if pa is None or not os.path.isfile(sidecar_path(filename)):
+        return None
+    stat = os.stat(home_directory + filename + ".csv")
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(sidecar_path(filename), "r"))
+    except (pa.ArrowInvalid, OSError):
+        return None
+    metadata = reader.schema.metadata or {}
+    if metadata.get(b"csv_mtime") == str(stat.st_mtime_ns).encode() and metadata.get(b"csv_size") == str(stat.st_size).encode():
+        return reader
+    return None
+
+
+def build_sidecar(filename, df=None):
+    """Convert a stored CSV file (or its already parsed dataframe) into its sidecar, with the column types
+    fixed at conversion time and one record batch per pandas chunk. Return the dataframe."""
+    complete_path = home_directory + filename + ".csv"
+    stat = os.stat(complete_path)
+    if df is None:
+        df = read_csv_file(complete_path)
+    if pa is None:
+        return df
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return df # Mixed types in a column : this file is kept without sidecar
+    metadata = dict(table.schema.metadata or {})
+    metadata.update({b"csv_mtime": str(stat.st_mtime_ns).encode(), b"csv_size": str(stat.st_size).encode()})
+    table = table.replace_schema_metadata(metadata)
+
+    # Written next to the final path then renamed, so that a reader never maps a half-written sidecar
+    os.makedirs(config["sidecar_directory"], exist_ok=True)
+    temporary_path = sidecar_path(filename) + "." + str(os.getpid()) + "." + str(threading.get_ident()) + ".tmp"
+    with pa.OSFile(temporary_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=int(config["pandas_chunksize"]))
+    os.replace(temporary_path, sidecar_path(filename))
+    return df
+
+
+def remove_sidecar(filename):
+    """Delete the sidecar of a CSV file, if any."""
+    if os.path.isfile(sidecar_path(filename)):
+        os.remove(sidecar_path(filename))
+
+
+
+def read_dataset(filename):
+    """Load a stored CSV file from its memory-mapped sidecar, or parse it and (re)build the sidecar."""
+    reader = open_fresh_sidecar(filename)
+    if reader is None:
+        return build_sidecar(filename)
+    return reader.read_all().to_pandas(split_blocks=True)
+
+
+class Column_Index:
+    """Secondary index of one column of a cached dataset, for equality lookups.
+    Numeric columns are indexed as a sorted array of their values (with the row position of each value),
+    the other ones as a value -> row positions hash map."""
+
+    def __init__(self, series):
+        self.is_sorted = is_numeric_dtype(series)
+        if self.is_sorted:
+            values = series.to_numpy()
+            order = np.argsort(values, kind="stable")
+            self.sorted = (values[order], order)
+            self.memory = order.nbytes + values.nbytes
+        else:
+            self.positions = series.groupby(series.to_numpy(), sort=False).indices
+            self.memory = sum(p.nbytes + 100 for p in self.positions.values())
+
+    def lookup(self, value):
+        """Return the sorted row positions where the column is equal to the value. Like the comparison of the
+        unindexed queries, NaN is equal to no value (it would be found among the NaNs sorted at the end of the array)."""
+        if is_scalar(value) and pd.isna(value):
+            return np.empty(0, dtype=np.int64)
+        if self.is_sorted:
+            sorted_values, order = self.sorted
+            left = np.searchsorted(sorted_values, value, side="left")
+            right = np.searchsorted(sorted_values, value, side="right")
+            return np.sort(order[left:right])
+        return self.positions.get(value, np.empty(0, dtype=np.int64))
+
+    def append(self, series, start):
+        """Index new rows appended at the end of the dataset, their first row being at position 'start'.
+        The new values are sorted then merged into the sorted array with a single insertion, in a time
+        proportional to the array copy rather than to a sort. The arrays are replaced and never modified,
+        so that concurrent lookups stay consistent (and may return the positions of the new rows)."""
+        new_positions = np.arange(start, start + len(series))
+        if self.is_sorted:
+            sorted_values, order = self.sorted
+            values = series.to_numpy()
+            if values.dtype != sorted_values.dtype:
+                values = np.concatenate([sorted_values, values])
+                resorted = np.argsort(values, kind="stable")
+                self.sorted = (values[resorted], np.concatenate([order, new_positions])[resorted])
+            else:
+                new_order = np.argsort(values, kind="stable")
+                insertion = np.searchsorted(sorted_values, values[new_order], side="right")
+                self.sorted = (np.insert(sorted_values, insertion, values[new_order]), np.insert(order, insertion, new_positions[new_order]))
+            self.memory = self.sorted[0].nbytes + self.sorted[1].nbytes
+        else:
+            for value, positions in series.groupby(series.to_numpy(), sort=False).indices.items():
+                previous = self.positions.get(value)
+                self.positions[value] = new_positions[positions] if previous is None else np.concatenate([previous, new_positions[positions]])
+                self.memory += positions.nbytes + (100 if previous is None else 0)
+
+
+class Column_Statistics:
+    """Mergeable statistics of one column, updated when rows are added or removed instead of being computed again.
+
+    Numeric columns keep their count, mean and sum of squared deviations (for the std), their min and max,
+    and a reservoir sample of their values for the quantiles (exact as long as the column fits in the sample).
+    Every column keeps the frequency of each of its values, until it has more than 'value_counts_max_exact_distinct'
+    distinct values. Its frequencies then become approximate : only its 'value_counts_max_exact_distinct' largest counters
+    are kept, each one underestimating the frequency of its value by at most 'error' (the sum of the highest counts dropped
+    at each reduction), and the number of distinct values is estimated by a HyperLogLog sketch."""
+
+    hll_precision = 12
+
+    def __init__(self, series, is_numeric):
+        self.is_numeric = is_numeric
+        self.sample_size = int(config["statistics_sample_size"])
+        self.max_exact_distinct = int(config["value_counts_max_exact_distinct"])
+        self.top_k = int(config["value_counts_top_k"])
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.sample = np.empty(0)
+        self.seen = 0
+        self.is_stale = False
+        self.counts = {}
+        self.error = 0
+        self.registers = None
+        self.add(series)
+
+    def add(self, series):
+        """Add the values of new rows to the statistics."""
+        values = series.dropna()
+        if self.is_numeric and len(values):
+            numbers = values.to_numpy(dtype=float)
+            self._merge_moments(len(numbers), numbers.mean(), ((numbers - numbers.mean()) ** 2).sum())
+            self.min = numbers.min() if self.min is None else min(self.min, numbers.min())
+            self.max = numbers.max() if self.max is None else max(self.max, numbers.max())
+            self._add_to_sample(numbers)
+        self.count += len(values)
+        self._add_counts(values.value_counts())
+
+    def remove(self, series):
+        """Remove the values of deleted rows from the statistics. If a removed value was the min or the max,
+        the column is marked as stale and has to be computed again."""
+        values = series.dropna()
+        if self.is_numeric and len(values):
+            numbers = values.to_numpy(dtype=float)
+            self._merge_moments(-len(numbers), numbers.mean(), ((numbers - numbers.mean()) ** 2).sum())
+            if numbers.min() <= self.min or numbers.max() >= self.max:
+                self.is_stale = True
+            remaining = pd.Series(self.sample).value_counts().sub(pd.Series(numbers).value_counts(), fill_value=0)
+            remaining = remaining[remaining > 0]
+            self.sample = np.repeat(remaining.index.to_numpy(dtype=float), remaining.to_numpy(dtype=int))
+            self.seen = max(self.seen - len(numbers), len(self.sample))
+        self.count -= len(values)
+        if self.is_approximate and len(values):
+            # The removed values cannot be taken out of the HyperLogLog sketch
+            self.is_stale = True
+        self._add_counts(-values.value_counts())
+
+    def merge(self, other):
+        """Merge the statistics of the other rows of the column (e.g. computed on another part of the file)."""
+        self.is_numeric = self.is_numeric and other.is_numeric
+        if self.is_numeric and other.count:
+            self._merge_moments(other.count, other.mean, other.m2)
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+            self._merge_sample(other)
+        self.count += other.count
+        self.is_stale = self.is_stale or other.is_stale
+        if other.is_approximate:
+            if not self.is_approximate:
+                self._start_approximation()
+            self.registers = np.maximum(self.registers, other.registers)
+            self.error += other.error
+        self._add_counts(pd.Series(other.counts, dtype="int64"))
+
+    def describe(self):
+        """Return the statistics of df.describe() for this column."""
+        if self.is_numeric:
+            std = np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+            quantiles = np.quantile(self.sample, [0.25, 0.5, 0.75]) if len(self.sample) else [np.nan] * 3
+            return pd.Series([float(self.count), self.mean if self.count else np.nan, std, self.min, quantiles[0], quantiles[1], quantiles[2], self.max],
+                index=["count", "mean", "std", "min", "25%", "50%", "75%", "max"])
+        top = max(self.counts, key=self.counts.get) if self.counts else np.nan
+        unique = self._estimate_distinct() if self.is_approximate else len(self.counts)
+        return pd.Series([self.count, unique, top, self.counts.get(top, np.nan)], index=["count", "unique", "top", "freq"])
+
+    def value_counts(self):
+        """Return the count of each value, the most frequent first. The counts of an approximate column are the ones
+        of its value_counts_top_k most frequent values, each one lower than the real count by at most self.error."""
+        counts = pd.Series(self.counts, dtype="int64").sort_values(ascending=False, kind="stable")
+        return counts.head(self.top_k) if self.is_approximate else counts
+
+    @property
+    def is_approximate(self):
+        return self.registers is not None
+
+    @property
+    def has_approximate_quantiles(self):
+        return self.is_numeric and self.count > len(self.sample)
+
+    @property
+    def memory(self):
+        registers_memory = self.registers.nbytes if self.registers is not None else 0
+        return self.sample.nbytes + registers_memory + 100 * len(self.counts)
+
+    def _merge_moments(self, count, mean, m2):
+        """Merge (or remove, with a negative count) the mean and M2 of a group of values (Chan et al.)
+        into the ones of the column. Called before self.count is updated."""
+        previous = self.count
+        total = previous + count
+        if total <= 0:
+            self.mean, self.m2 = 0.0, 0.0
+        elif count > 0:
+            delta = mean - self.mean
+            self.mean += delta * count / total
+            self.m2 += m2 + delta ** 2 * previous * count / total
+        else:
+            removed = -count
+            remaining_mean = (previous * self.mean - removed * mean) / total
+            delta = mean - remaining_mean
+            self.m2 = max(self.m2 - m2 - delta ** 2 * total * removed / previous, 0.0)
+            self.mean = remaining_mean
+
+    def _add_to_sample(self, numbers):
+        """Reservoir sampling of the numeric values, used for the quantiles."""
+        free = max(self.sample_size - len(self.sample), 0)
+        if free:
+            self.sample = np.concatenate([self.sample, numbers[:free]])
+            self.seen += len(numbers[:free])
+            numbers = numbers[free:]
+        if len(numbers):
+            positions = (np.random.random(len(numbers)) * (self.seen + np.arange(1, len(numbers) + 1))).astype(np.int64)
+            kept = positions < self.sample_size
+            self.sample = self.sample.copy()
+            self.sample[positions[kept]] = numbers[kept]
+            self.seen += len(numbers)
+
+    def _merge_sample(self, other):
+        """Merge the reservoir sample of other values, each sample contributing in proportion to the values it has seen."""
+        seen = self.seen + other.seen
+        if len(self.sample) + len(other.sample) <= self.sample_size:
+            self.sample = np.concatenate([self.sample, other.sample])
+        else:
+            kept = min(int(round(self.sample_size * self.seen / seen)), len(self.sample))
+            other_kept = min(self.sample_size - kept, len(other.sample))
+            self.sample = np.concatenate([np.random.choice(self.sample, kept, replace=False),
+                np.random.choice(other.sample, other_kept, replace=False)])
+        self.seen = seen
+
+    def _add_counts(self, value_counts):
+        """Add (or remove, with negative counts) value frequencies. Once approximate, only the max_exact_distinct largest
+        counters are kept whenever there are more of them, and the removed values which are not counted are ignored :
+        a dropped value counted again restarts from 0, so the counts stay between the real count minus error and the real count."""
+        if self.is_approximate:
+            self._update_registers(value_counts.index[value_counts.to_numpy() > 0])
+        for value, count in value_counts.items():
+            if count < 0 and value not in self.counts:
+                continue
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+            if self.counts[value] <= 0:
+                del self.counts[value]
+        kept = max(self.max_exact_distinct, self.top_k)
+        if len(self.counts) > kept:
+            if not self.is_approximate:
+                self._start_approximation()
+            # Only the largest counters are kept as they are, the highest count dropped is added to the error
+            all_counts = pd.Series(self.counts, dtype="int64").sort_values(ascending=False, kind="stable")
+            self.error += int(all_counts.iloc[kept])
+            self.counts = all_counts.iloc[:kept].to_dict()
+
+    def _start_approximation(self):
+        self.registers = np.zeros(2 ** self.hll_precision, dtype=np.uint8)
+        self._update_registers(pd.Index(list(self.counts)))
+
+    def _update_registers(self, values):
+        """Add values to the HyperLogLog sketch : each register keeps the highest rank of the first 1 bit of the hashes
+        falling into it."""
+        if not len(values):
+            return
+        hashes = pd.util.hash_array(np.asarray(values).astype(str).astype(object))
+        remaining_bits = 64 - self.hll_precision
+        buckets = (hashes >> np.uint64(remaining_bits)).astype(np.int64)
+        _, bit_lengths = np.frexp((hashes & np.uint64(2 ** remaining_bits - 1)).astype(float))
+        np.maximum.at(self.registers, buckets, (remaining_bits - bit_lengths + 1).astype(np.uint8))
+
+    def _estimate_distinct(self):
+        """HyperLogLog estimate of the number of distinct values (standard error of 1.04 / sqrt(2 ** hll_precision), about 1.6 %),
+        with the linear counting correction for the small cardinalities."""
+        size = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / size) * size ** 2 / np.sum(2.0 ** -self.registers.astype(float))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * size and empty:
+            estimate = size * np.log(size / empty)
+        return int(round(estimate))
+
+
+class Dataset_Statistics:
+    """Summary statistics and value counts of a cached dataset, kept up to date by the write endpoints
+    so that summary_stats and value_counts only have to read them."""
+
+    def __init__(self, df):
+        self.numeric_columns = list(df.select_dtypes(include="number").columns)
+        self.columns = OrderedDict((c, Column_Statistics(df[c], c in self.numeric_columns)) for c in df.columns)
+        self.version = 0
+
+    def add_rows(self, rows_df):
+        for column, statistics in self.columns.items():
+            statistics.add(rows_df[column])
+        self.version += 1
+
+    def remove_rows(self, rows_df):
+        for column, statistics in self.columns.items():
+            statistics.remove(rows_df[column])
+        self.version += 1
+
+    def replace_values(self, column, old_values, new_values):
+        self.columns[column].remove(old_values)
+        self.columns[column].add(new_values)
+        self.version += 1
+
+    def drop_column(self, column):
+        self.columns.pop(column, None)
+        if column in self.numeric_columns:
+            self.numeric_columns.remove(column)
+        self.version += 1
+
+    def stale_columns(self):
+        """Return the columns whose min or max was removed, {column: is_numeric}, and the version of the statistics.
+        They are computed again by compute_columns, without holding the lock of the cache, then swapped in by summary."""
+        return OrderedDict((c, statistics.is_numeric) for c, statistics in self.columns.items() if statistics.is_stale), self.version
+
+    @staticmethod
+    def compute_columns(df, columns):
+        return OrderedDict((c, Column_Statistics(df[c], is_numeric)) for c, is_numeric in columns.items() if c in df.columns)
+
+    def summary(self, recomputed=None, version=None):
+        """Return the equivalent of df.describe(), with the stale columns replaced by their recomputed statistics.
+        These are only kept if no write updated the statistics since stale_columns returned this version."""
+        recomputed = recomputed or {}
+        if version == self.version:
+            for column, statistics in recomputed.items():
+                if column in self.columns:
+                    self.columns[column] = statistics
+        columns = OrderedDict((c, recomputed.get(c, statistics)) for c, statistics in self.columns.items())
+        described_columns = self.numeric_columns if self.numeric_columns else list(columns)
+        return pd.DataFrame(OrderedDict((c, columns[c].describe()) for c in described_columns))
+
+    def merge(self, other):
+        """Merge the statistics of other rows of the dataset (e.g. computed on another part of the file)."""
+        for column, statistics in other.columns.items():
+            if column in self.columns:
+                self.columns[column].merge(statistics)
+            else:
+                self.columns[column] = statistics
+        self.numeric_columns = [c for c, statistics in self.columns.items() if statistics.is_numeric]
+        self.version += 1
+
+    def value_counts(self):
+        return OrderedDict((c, statistics.value_counts()) for c, statistics in self.columns.items())
+
+    def approximate_quantiles(self, columns=None):
+        """Return the 'X-Approximate-Quantiles' header value listing the numeric columns (among columns) whose quantiles
+        are computed on a sample of their values, with the size of this sample, or None if they are all exact."""
+        approximate = ["%s;sample_size=%d" % (quote(str(c), safe=""), len(self.columns[c].sample))
+            for c in (columns if columns is not None else self.columns) if self.columns[c].has_approximate_quantiles]
+        return ", ".join(approximate) if approximate else None
+
+    def approximate_columns(self, columns=None):
+        """Return the 'X-Approximate-Counts' header value listing the columns (among columns) whose counts are approximate,
+        (URL-encoded) with the maximum underestimation of their counts, or None if they are all exact."""
+        approximate = ["%s;max_error=%d" % (quote(str(c), safe=""), self.columns[c].error) for c in (columns if columns is not None else self.columns)
+            if self.columns[c].is_approximate]
+        return ", ".join(approximate) if approximate else None
+
+    @property
+    def memory(self):
+        return sum(statistics.memory for statistics in self.columns.values())
+
+
+# -----------------------------
+# Parallel scan of large CSV files
+# -----------------------------
+
+def split_csv_byte_ranges(complete_path, parts):
+    """Split a CSV file into about 'parts' byte ranges, each one starting at the beginning of a line.
+    Return its header line and the (start, end) offsets of the ranges. Quoted values spanning several
+    lines are not supported."""
+    size = os.path.getsize(complete_path)
+    with open(complete_path, "rb") as csv_file:
+        header = csv_file.readline()
+        offsets = [csv_file.tell()]
+        for i in range(1, parts):
+            csv_file.seek(max(offsets[0] + (size - offsets[0]) * i // parts, offsets[-1]) - 1)
+            csv_file.readline()
+            offsets.append(csv_file.tell())
+    offsets.append(size)
+    return header, [(start, end) for start, end in zip(offsets, offsets[1:]) if end > start]
+
+
+def init_scan_worker(worker_config):
+    """Initializer of the scan worker processes, which do not go through create_app()."""
+    global config
+    config = worker_config
+
+
+class Byte_Range_Reader(io.RawIOBase):
+    """File object reading the header line then one byte range of a CSV file, so that pandas can parse
+    the range chunk by chunk instead of reading it whole."""
+
+    def __init__(self, complete_path, header, start, end):
+        self.csv_file = open(complete_path, "rb")
+        self.csv_file.seek(start)
+        self.header = header
+        self.remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.header:
+            size = min(len(buffer), len(self.header))
+            buffer[:size] = self.header[:size]
+            self.header = self.header[size:]
+            return size
+        data = self.csv_file.read(min(len(buffer), self.remaining))
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self.csv_file.close()
+        super().close()
+
+
+def scan_csv_byte_range(complete_path, header, start, end, task, arguments, chunksize=None):
+    """Run in a scan worker process : parse a byte range of a CSV file and run task(df, *arguments) on it.
+    Return the number of rows of the range and the result of the task. With a chunksize, the task runs on
+    each chunk of the range as it is parsed : the filtered rows of the chunks are concatenated and their
+    statistics merged, so that only one chunk is held in memory besides the result (None if the range is empty)."""
+    if chunksize is None:
+        with open(complete_path, "rb") as csv_file:
+            csv_file.seek(start)
+            data = csv_file.read(end - start)
+        df = pd.read_csv(io.BytesIO(header + data))
+        return len(df), task(df, *arguments)
+
+    rows, frames, result = 0, [], None
+    with io.BufferedReader(Byte_Range_Reader(complete_path, header, start, end)) as range_file:
+        for chunk in pd.read_csv(range_file, chunksize=chunksize):
+            rows += len(chunk)
+            partial = task(chunk, *arguments)
+            if isinstance(partial, pd.DataFrame):
+                frames.append(partial)
+            elif result is None:
+                result = partial
+            else:
+                result.merge(partial)
+    return rows, pd.concat(frames) if frames else result
+
+
+def parse_task(df):
+    return df
+
+
+def filter_task(df, predicates, columns):
+    mask = np.ones(len(df), dtype=bool)
+    for column, operator, value in predicates:
+        mask &= query_operators[operator](df[column], value).to_numpy()
+    return df[mask] if columns is None else df.loc[mask, columns]
+
+
+def statistics_task(df):
+    return Dataset_Statistics(df)
+
+
+class Parallel_Scanner:
+    """Pool of worker processes scanning the CSV files larger than 'parallel_scan_min_mb' : the file is split
+    into one byte range per worker, each range is parsed and filtered or aggregated in its own process, and
+    the partial results are merged by the caller. The pool is started lazily in each worker process of the
+    server, with the spawn method so that the threads of the server are not forked."""
+
+    def __init__(self, workers, min_mb):
+        self.workers = int(workers) or os.cpu_count() or 1
+        self.min_size = float(min_mb) * 1024 * 1024
+        self.pid = None
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def is_worthwhile(self, complete_path):
+        return self.workers > 1 and os.path.getsize(complete_path) >= self.min_size
+
+    def get_executor(self):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_scan_worker, initargs=(config,))
+            return self.executor
+
+    def scan(self, complete_path, task, *arguments, chunksize=None):
+        """Run task(df, *arguments) on every byte range of a CSV file in the worker processes, or on every chunk
+        of chunksize rows of the ranges (see scan_csv_byte_range). Return the (number of rows, result) of each range,
+        in the order of the file."""
+        header, ranges = split_csv_byte_ranges(complete_path, self.workers)
+        futures = [self.get_executor().submit(scan_csv_byte_range, complete_path, header, start, end, task, arguments, chunksize)
+            for start, end in ranges]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        """Stop the worker processes of this process, they are started again on the next scan."""
+        with self.lock:
+            if self.executor is not None and self.pid == os.getpid():
+                self.executor.shutdown()
+            self.pid = None
+            self.executor = None
+
+
+def read_csv_file(complete_path):
+    """Parse a whole CSV file, in parallel if it is large enough, otherwise chunk by chunk."""
+    if not parallel_scanner.is_worthwhile(complete_path):
+        return read_csv_by_chunks(complete_path, int(config["pandas_chunksize"]))
+    return pd.concat([df for _, df in parallel_scanner.scan(complete_path, parse_task)], ignore_index=True)
+
+
+def compute_dataset_statistics(filename, df, stat):
+    """Compute the statistics of a dataframe. If it is the one of a large CSV file which did not change
+    since it was loaded (same mtime and size as stat), they are computed from the file in parallel,
+    and the columns typed differently in a part of the file are computed again on the dataframe."""
+    complete_path = home_directory + filename + ".csv"
+    with File_Lock(filename, exclusive=False):
+        current_stat = os.stat(complete_path)
+        if stat is None or (current_stat.st_mtime_ns, current_stat.st_size) != stat or not parallel_scanner.is_worthwhile(complete_path):
+            return Dataset_Statistics(df)
+        partials = [statistics for _, statistics in parallel_scanner.scan(complete_path, statistics_task)]
+    statistics = partials[0]
+    for other in partials[1:]:
+        statistics.merge(other)
+    numeric_columns = list(df.select_dtypes(include="number").columns)
+    for column in df.columns:
+        if column not in statistics.columns or statistics.columns[column].is_numeric != (column in numeric_columns):
+            statistics.columns[column] = Column_Statistics(df[column], column in numeric_columns)
+    statistics.columns = OrderedDict((c, statistics.columns[c]) for c in df.columns)
+    statistics.numeric_columns = numeric_columns
+    return statistics
+
+
+def compute_file_statistics(filename):
+    """Compute the statistics of a CSV file processed out-of-core by merging partial statistics, one per chunk
+    (in parallel on parts of the file if it is large enough), so that only one chunk per process is held in memory.
+    Return them and the stat of the file they were computed on."""
+    complete_path = home_directory + filename + ".csv"
+    with File_Lock(filename, exclusive=False):
+        stat = os.stat(complete_path)
+        if parallel_scanner.is_worthwhile(complete_path):
+            partials = [statistics for _, statistics in parallel_scanner.scan(complete_path, statistics_task,
+                chunksize=int(config["out_of_core_chunksize"]))]
+        else:
+            partials = (Dataset_Statistics(chunk) for chunk in iter_dataset_chunks(filename))
+        statistics = None
+        for partial in partials:
+            if partial is None:
+                continue
+            if statistics is None:
+                statistics = partial
+            else:
+                statistics.merge(partial)
+        if statistics is None:
+            statistics = Dataset_Statistics(pd.read_csv(complete_path, nrows=0))
+    return statistics, stat
+
+
+class Server_Busy_Error(Exception):
+    """Raised when the work pool already has 'work_pool_max_queue' heavy operations waiting."""
+
+
+class Work_Pool:
+    """Bounded pool of threads running the heavy work of the requests (CSV loads, SQL queries, query scans).
+
+    At most 'work_pool_threads' heavy operations run at once and 'work_pool_max_queue' more can wait for a thread,
+    beyond which requests are rejected with a 503 error. Requests which only read the header or a cached
+    dataframe do not go through the pool, so they are still served while heavy operations are running
+    (pandas, Arrow and DuckDB release the GIL in their heavy loops). The threads are started lazily in
+    each worker process of the pre-fork server."""
+
+    def __init__(self, threads, max_queue):
+        self.threads = int(threads)
+        self.max_queue = int(max_queue)
+        self.slots = threading.BoundedSemaphore(self.threads + self.max_queue)
+        self.local = threading.local()
+        self.pid = None
+        self.executor = None
+        self.executor_lock = threading.Lock()
+        self.rejected = 0
+
+    def get_executor(self):
+        with self.executor_lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="csv2api-work")
+            return self.executor
+
+    def run(self, function, *args):
+        """Run function(*args) on a thread of the pool and return its result. Work submitted from a thread
+        of the pool is run directly, so that nested heavy operations cannot deadlock the pool."""
+        if getattr(self.local, "is_pool_thread", False):
+            return function(*args)
+        if not self.slots.acquire(blocking=False):
+            self.rejected += 1
+            raise Server_Busy_Error("Too many heavy requests are already running, please retry later.")
+        try:
+            return self.get_executor().submit(self._call, function, args, current_request_state()).result()
+        finally:
+            self.slots.release()
+
+    def _call(self, function, args, state):
+        self.local.is_pool_thread = True
+        request_state.current = state
+        try:
+            return function(*args)
+        finally:
+            request_state.current = None
+
+
+class Dataset_Cache:
+    """Process-wide cache of the loaded CSV dataframes, keyed by filename.
+
+    An entry is fresh as long as the mtime and size of its CSV file did not change. When the total
+    memory used by the cached dataframes goes over the budget, the least recently used ones are evicted.
+    Cached dataframes are shared between requests and never modified in place : the writes build new ones,
+    which replace them once the file is written (see publish). The rows appended through the API are kept aside
+    in a list of deltas, merged into the dataframe once on its next read (see append)."""
+
+    def __init__(self, max_memory_mb):
+        self.max_memory = int(max_memory_mb) * 1024 * 1024
+        self.entries = OrderedDict()
+        self.memory_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loading = {}
+        self.file_statistics = {}
+        self.lock = threading.RLock()
+
+    def get(self, filename, loader):
+        """Return the cached dataframe of a CSV file, or load it with loader(complete_path) if missing or stale.
+        Loads run on the work pool without holding the lock of the cache, and concurrent requests missing
+        the same file wait for a single load."""
+        complete_path = home_directory + filename + ".csv"
+        stat = os.stat(complete_path)
+        is_locked = File_Lock.is_held(filename)
+        with self.lock:
+            entry = self.entries.get(filename)
+            is_fresh = entry is not None and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size
+            if is_fresh:
+                self.entries.move_to_end(filename)
+                self.hits += 1
+                if not entry["deltas"]:
+                    return entry["df"]
+            else:
+                self.misses += 1
+                loading = self.loading.get(filename)
+                is_loading_thread = loading is None
+                if is_loading_thread:
+                    loading = self.loading[filename] = Future()
+        if is_fresh:
+            return self._merge_deltas(entry)
+
+        # A writer holding the lock of the file can neither wait for the load of another thread nor queue on the
+        # work pool, whose threads may be waiting for this lock : it loads the file in its own thread, and the other
+        # requests missing the file wait for its load. Writers load their file before locking it (see run_write_batch),
+        # so this only happens when the file changed in between.
+        if not is_loading_thread and not is_locked:
+            return loading.result()
+        try:
+            if is_locked:
+                df = self._load(filename, loader)
+            else:
+                df = work_pool.run(self._load, filename, loader)
+        except BaseException as error:
+            if is_loading_thread:
+                loading.set_exception(error)
+            raise
+        finally:
+            if is_loading_thread:
+                with self.lock:
+                    del self.loading[filename]
+        if is_loading_thread:
+            loading.set_result(df)
+        return df
+
+    def _load(self, filename, loader):
+        complete_path = home_directory + filename + ".csv"
+        with File_Lock(filename, exclusive=False):
+            stat = os.stat(complete_path)
+            with timed_phase("parse"):
+                df = loader(complete_path)
+        self._store(filename, df, stat)
+        return df
+
+    def append(self, filename, new_rows_df, previous_stat):
+        """Add rows appended to a CSV file through the API to its cached dataframe, once the file is written,
+        if the file did not change before the append (same mtime and size as previous_stat). The rows are kept
+        as a delta, merged into the dataframe on its next read, and the indexes, the statistics and the memory used
+        are updated with them only : the cost of an append does not depend on the size of the dataset."""
+        stat = os.stat(home_directory + filename + ".csv")
+        new_rows_df = new_rows_df.reset_index(drop=True)
+        memory = int(new_rows_df.memory_usage(index=False, deep=True).sum())
+        with self.lock:
+            entry = self.entries.get(filename)
+            if entry is None or (entry["mtime"], entry["size"]) != (previous_stat.st_mtime_ns, previous_stat.st_size):
+                return
+            for column, index in entry["indexes"].items():
+                memory -= index.memory
+                index.append(new_rows_df[column], entry["rows"])
+                memory += index.memory
+            if entry["statistics"] is not None:
+                memory -= entry["statistics"].memory
+                entry["statistics"].add_rows(new_rows_df)
+                memory += entry["statistics"].memory
+            entry["deltas"].append(new_rows_df)
+            entry.update({"rows": entry["rows"] + len(new_rows_df), "mtime": stat.st_mtime_ns, "size": stat.st_size})
+            entry["memory"] += memory
+            self.memory_used += memory
+            self.entries.move_to_end(filename)
+            self._evict()
+
+    def _merge_deltas(self, entry):
+        """Return the dataframe of an entry with the rows appended since its last read merged into it, which then
+        replaces it. The concatenation runs without holding the lock of the cache, once for all the readers."""
+        with self.lock:
+            if not entry["deltas"]:
+                return entry["df"]
+            merging = entry.get("merging")
+            is_merging_thread = merging is None
+            if is_merging_thread:
+                merging = entry["merging"] = Future()
+                df, deltas = entry["df"], list(entry["deltas"])
+        if not is_merging_thread:
+            return merging.result()
+        try:
+            merged_df = pd.concat([df] + deltas, ignore_index=True)
+        except BaseException as error:
+            with self.lock:
+                entry["merging"] = None
+            merging.set_exception(error)
+            raise
+        with self.lock:
+            if entry["df"] is df and all(a is b for a, b in zip(entry["deltas"], deltas)):
+                entry["df"], entry["deltas"] = merged_df, entry["deltas"][len(deltas):]
+            entry["merging"] = None
+        merging.set_result(merged_df)
+        return merged_df
+
+    def publish(self, filename, previous_df, df, changes):
+        """Cache the new dataframe of a CSV file rewritten through the API, once the file is written. If previous_df
+        was the cached dataframe, its statistics are updated with the changes staged by the writes (see Staged_Changes)
+        and its indexes are kept if no row moved, except the ones of the changed columns."""
+        stat = os.stat(home_directory + filename + ".csv")
+        df_memory = int(df.memory_usage(index=True, deep=True).sum())
+        with self.lock:
+            entry = self.entries.get(filename)
+            is_previous = entry is not None and previous_df is not None and entry["df"] is previous_df and not entry["deltas"]
+            self._store(filename, df, stat, df_memory)
+            new_entry = self.entries.get(filename)
+            if not is_previous or new_entry is None:
+                return
+            memory = 0
+            if entry["statistics"] is not None:
+                for update_statistics in changes.statistics_updates:
+                    update_statistics(entry["statistics"])
+                new_entry["statistics"] = entry["statistics"]
+                memory += entry["statistics"].memory
+            if changes.keeps_positions:
+                new_entry["indexes"] = {c: index for c, index in entry["indexes"].items() if c not in changes.changed_columns}
+            memory += sum(index.memory for index in new_entry["indexes"].values())
+            new_entry["memory"] += memory
+            self.memory_used += memory
+
+    def peek(self, filename):
+        """Return the cached dataframe of a CSV file if it is still fresh, without loading it on a miss."""
+        complete_path = home_directory + filename + ".csv"
+        stat = os.stat(complete_path)
+        with self.lock:
+            entry = self.entries.get(filename)
+            if entry is None or entry["mtime"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                return None
+            self.entries.move_to_end(filename)
+            self.hits += 1
+            if not entry["deltas"]:
+                return entry["df"]
+        return self._merge_deltas(entry)
+
+    def peek_dtypes(self, filename):
+        """Return the column types of the cached dataframe of a CSV file if it is still fresh, or None,
+        without merging the rows appended to it."""
+        stat = os.stat(home_directory + filename + ".csv")
+        with self.lock:
+            entry = self.entries.get(filename)
+            if entry is None or entry["mtime"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                return None
+            return entry["df"].dtypes
+
+    def get_index(self, filename, df, column):
+        """Return the index of a column of a cached dataframe, building it on its first use.
+        Return None if this dataframe is not (or no longer) the cached one."""
+        with self.lock:
+            entry = self.entries.get(filename)
+            if entry is None or entry["df"] is not df or entry["deltas"]:
+                return None
+            index = entry["indexes"].get(column)
+        if index is None:
+            index = Column_Index(df[column])
+            with self.lock:
+                if self.entries.get(filename) is entry and column not in entry["indexes"]:
+                    entry["indexes"][column] = index
+                    entry["memory"] += index.memory
+                    self.memory_used += index.memory
+        return index
+
+    def get_statistics(self, filename, df):
+        """Return the statistics of a cached dataframe, computing them on their first use.
+        For a dataframe which is not (or no longer) the cached one, they are computed but not kept."""
+        with self.lock:
+            entry = self.entries.get(filename)
+            is_cached = entry is not None and entry["df"] is df and not entry["deltas"]
+            if is_cached and entry["statistics"] is not None:
+                return entry["statistics"]
+            stat = (entry["mtime"], entry["size"]) if is_cached else None
+        statistics = compute_dataset_statistics(filename, df, stat)
+        with self.lock:
+            if is_cached and self.entries.get(filename) is entry and entry["df"] is df and entry["statistics"] is None:
+                entry["statistics"] = statistics
+                entry["memory"] += statistics.memory
+                self.memory_used += statistics.memory
+        return statistics
+
+    def get_file_statistics(self, filename):
+        """Return the statistics of a CSV file processed out-of-core, which has no cached dataframe. They are computed
+        chunk by chunk on their first use (and again once a removed value was a min or a max of its column), then kept
+        as long as the file does not change, or is only changed through the API which updates them."""
+        statistics = self._fresh_file_statistics(filename)
+        if statistics is not None and not any(column.is_stale for column in statistics.columns.values()):
+            return statistics
+        statistics, stat = compute_file_statistics(filename)
+        self.store_file_statistics(filename, statistics, stat)
+        return statistics
+
+    def copy_file_statistics(self, filename):
+        """Return a copy of the statistics of a CSV file processed out-of-core, for a write to update them, or None
+        if they were not computed on the current version of the file."""
+        with self.lock:
+            statistics = self._fresh_file_statistics(filename)
+            return copy.deepcopy(statistics) if statistics is not None else None
+
+    def store_file_statistics(self, filename, statistics, stat=None):
+        """Keep the statistics of a CSV file processed out-of-core, computed on its version of stat (by default the current one)."""
+        stat = stat or os.stat(home_directory + filename + ".csv")
+        with self.lock:
+            self.file_statistics[filename] = {"statistics": statistics, "mtime": stat.st_mtime_ns, "size": stat.st_size}
+
+    def is_fresh(self, filename):
+        """True if a CSV file is cached and did not change since it was loaded or written through the API."""
+        try:
+            stat = os.stat(home_directory + filename + ".csv")
+        except FileNotFoundError:
+            return False
+        with self.lock:
+            entry = self.entries.get(filename)
+            return entry is not None and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size
+
+    def is_cached(self, filename, df):
+        """True if this dataframe is still the cached one of a CSV file."""
+        with self.lock:
+            entry = self.entries.get(filename)
+            return entry is not None and entry["df"] is df and not entry["deltas"]
+
+    def invalidate(self, filename):
+        """Drop a CSV file from the cache."""
+        with self.lock:
+            self.file_statistics.pop(filename, None)
+            entry = self.entries.pop(filename, None)
+            if entry is not None:
+                self.memory_used -= entry["memory"]
+
+    def stats(self):
+        """Return the counters and the memory usage of the cache."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": list(self.entries.keys()),
+                "memory_used_bytes": self.memory_used,
+                "max_memory_bytes": self.max_memory,
+            }
+
+    def _fresh_file_statistics(self, filename):
+        stat = os.stat(home_directory + filename + ".csv")
+        with self.lock:
+            entry = self.file_statistics.get(filename)
+            if entry is not None and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                return entry["statistics"]
+            return None
+
+    def _store(self, filename, df, stat, memory=None):
+        if memory is None:
+            memory = int(df.memory_usage(index=True, deep=True).sum())
+        with self.lock:
+            self.invalidate(filename)
+            if memory > self.max_memory:
+                return # Bigger than the whole budget : served but never cached
+            self.entries[filename] = {"df": df, "deltas": [], "rows": len(df), "mtime": stat.st_mtime_ns, "size": stat.st_size,
+                "memory": memory, "indexes": {}, "statistics": None}
+            self.memory_used += memory
+            self._evict()
+
+    def _evict(self):
+        """Evict the least recently used dataframes until the memory used fits in the budget."""
+        with self.lock:
+            while self.memory_used > self.max_memory and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.memory_used -= evicted["memory"]
+                self.evictions += 1
+
+
+def load_dataset(filename):
+    """Get the dataframe of a stored CSV file from the dataset cache, reading it chunk by chunk on a miss.
+    Raise an Out_Of_Core_Error for the files processed out-of-core, which are never loaded whole."""
+    if is_out_of_core(filename):
+        raise Out_Of_Core_Error("The CSV file '" + filename + "' is larger than " + str(config["out_of_core_min_mb"])
+            + " MB and this endpoint needs to load it whole.")
+    dataset_catalog.touch(filename)
+    with timed_phase("load"):
+        return dataset_cache.get(filename, lambda complete_path: read_dataset(filename))
+
+
+def validate_rows_against_schema(new_rows_df, dtypes):
+    """Check that new rows have the columns of a stored CSV file and values castable to its column types
+    (without loss for integer columns). Return the rows with the columns ordered and typed as in the file,
+    or raise a ValueError."""
+    if sorted(new_rows_df.columns) != sorted(dtypes.index):
+        raise ValueError("The columns of the new rows are not the ones of the CSV file.")
+    new_rows_df = new_rows_df[list(dtypes.index)]
+    typed_columns = {}
+    for column, dtype in dtypes.items():
+        values = new_rows_df[column]
+        if is_numeric_dtype(dtype) and not is_numeric_dtype(values):
+            values = pd.to_numeric(values) # Raise a ValueError for non numeric strings
+        typed_columns[column] = values.astype(dtype)
+        if "int" in str(dtype) and not (typed_columns[column] == values).all():
+            raise ValueError("The column '" + column + "' only accepts integers.")
+    return pd.DataFrame(typed_columns, index=new_rows_df.index)
+
+
+def append_rows_to_csv(filename, new_rows_df):
+    """Append rows at the end of a stored CSV file without rewriting it, in a single fsync'd write.
+    If anything goes wrong, the file is truncated back to its original size.
+    Must be called with the exclusive File_Lock of the file."""
+    complete_path = home_directory + filename + ".csv"
+    lines = new_rows_df.to_csv(header=False, index=False)
+    with open(complete_path, "rb+") as csv_file:
+        original_size = csv_file.seek(0, os.SEEK_END)
+        if original_size > 0:
+            csv_file.seek(original_size - 1)
+            if csv_file.read(1) != b"\n":
+                lines = "\n" + lines
+        try:
+            csv_file.write(lines.encode())
+            csv_file.flush()
+            os.fsync(csv_file.fileno())
+        except:
+            csv_file.truncate(original_size)
+            raise
+
+
+class Staged_Changes:
+    """Changes of the writes of a batch to the statistics and the indexes of a cached dataset. The writes never
+    modify the cached dataframe, they build a new one : their changes are staged here and published to the cache
+    with it once the file is written (see Dataset_Cache.publish)."""
+
+    def __init__(self):
+        self.statistics_updates = []
+        self.changed_columns = set()
+        self.keeps_positions = True # False once rows were added or removed, so that no index is kept
+
+    def update_statistics(self, update_statistics):
+        """Stage an update_statistics(statistics) of the statistics of the dataset."""
+        self.statistics_updates.append(update_statistics)
+
+
+class Write_Operation:
+    """A write (row_append, value_replace...) to a stored CSV file, waiting to be applied with the other writes
+    to the same file of its batch. apply(df, changes) returns the new dataframe, the HTTP response of the request,
+    the rows to append at the end of the file (or None) and whether the whole file has to be rewritten, and stages
+    its changes to the cached statistics and indexes in changes. df is None when the file is not cached and
+    needs_dataset is False.
+
+    The writes rewriting the file also have an apply_chunks(chunks, statistics) generator for the files processed
+    out-of-core : it yields the new rows chunk by chunk, updates the statistics of the file (if not None) along
+    the way, and returns the HTTP response of the request and whether a row changed."""
+
+    def __init__(self, apply, needs_dataset, apply_chunks=None):
+        self.apply = apply
+        self.needs_dataset = needs_dataset
+        self.apply_chunks = apply_chunks
+        self.changed = False
+        self.response = None
+        self.error = None
+        self.done = threading.Event()
+
+
+def run_write_batch(filename, operations):
+    """Apply a batch of writes to a stored CSV file under its exclusive lock : the dataset is loaded once,
+    every write is applied in memory, then the file is written once (appended or atomically rewritten).
+    The writes never modify the cached dataframe : the new dataframe and the changes of the batch are staged,
+    and only published to the cache once the file is written, so that a failing batch leaves it untouched."""
+    # The dataset is loaded like on any other miss before locking the file, so that the load runs on the work pool
+    # and is shared with the readers, then used under the lock if the file did not change in between
+    loaded_df, loaded_stat = None, None
+    if any(operation.needs_dataset for operation in operations) and not is_out_of_core(filename):
+        try:
+            loaded_stat = os.stat(home_directory + filename + ".csv")
+            loaded_df = load_dataset(filename)
+        except FileNotFoundError:
+            pass
+    with File_Lock(filename, exclusive=True):
+        if not os.path.isfile(home_directory + filename + ".csv"):
+            for operation in operations:
+                operation.response = ({"Message":API_error_no_CSV_found}, 404)
+            return
+        # The appends only need the column types, so that the rows appended to the cached dataframe are not merged
+        df = dataset_cache.peek(filename) if any(operation.needs_dataset for operation in operations) else None
+        stat = os.stat(home_directory + filename + ".csv")
+        if df is None and loaded_df is not None and (stat.st_mtime_ns, stat.st_size) == (loaded_stat.st_mtime_ns, loaded_stat.st_size):
+            df = loaded_df
+        is_out_of_core_batch = df is None and is_out_of_core(filename)
+        if df is None and not is_out_of_core_batch and any(operation.needs_dataset for operation in operations):
+            df = load_dataset(filename)
+        previous_df = df
+        changes = Staged_Changes()
+        appended_rows = []
+        pending_rows = [] # Appended since df was built, only added to it when a following write needs the dataset
+        needs_rewrite = False
+        is_written = False
+        try:
+            if is_out_of_core_batch:
+                is_written = True
+                run_out_of_core_write_batch(filename, operations)
+            else:
+                for operation in operations:
+                    if operation.needs_dataset and pending_rows:
+                        df = pd.concat([df] + pending_rows, ignore_index=True)
+                        pending_rows = []
+                    df, operation.response, rows, rewrite = operation.apply(df, changes)
+                    if rows is not None:
+                        appended_rows.append(rows)
+                        pending_rows.append(rows)
+                        changes.update_statistics(lambda statistics, rows=rows: statistics.add_rows(rows))
+                        changes.keeps_positions = False
+                    needs_rewrite = needs_rewrite or rewrite
+                if needs_rewrite and pending_rows:
+                    df = pd.concat([df] + pending_rows, ignore_index=True)
+                is_written = True
+                with timed_phase("write"):
+                    if needs_rewrite:
+                        write_csv_atomically(filename, df)
+                    elif appended_rows:
+                        append_rows_to_csv(filename, pd.concat(appended_rows))
+                if needs_rewrite:
+                    dataset_cache.publish(filename, previous_df, df, changes)
+                elif appended_rows:
+                    dataset_cache.append(filename, pd.concat(appended_rows, ignore_index=True), stat)
+        except:
+            if is_written:
+                dataset_cache.invalidate(filename) # The file may have been written but not published to the cache
+            raise
+        finally:
+            response_cache.invalidate(filename)
+            dataset_catalog.update(filename)
+
+
+def run_chunk_operation(operation, chunks, statistics):
+    """Chain the chunk by chunk version of a write to the chunks, and record its response once they all went through it."""
+    operation.response, operation.changed = yield from operation.apply_chunks(chunks, statistics)
+
+
+def run_out_of_core_write_batch(filename, operations):
+    """Apply a batch of writes to a CSV file processed out-of-core, without loading it. The rows of the appends are
+    appended to the file, and each run of consecutive rewrites (value_replace, row_deletion...) is chained into a
+    single pass over the file, chunk by chunk, spilled to a temporary file which replaces it if a row changed.
+    The statistics of the file, if computed, are updated on the way. Must be called with the exclusive File_Lock of the file."""
+    statistics = dataset_cache.copy_file_statistics(filename)
+    for is_rewrite, group in itertools.groupby(operations, key=lambda operation: operation.apply_chunks is not None):
+        group = list(group)
+        if is_rewrite:
+            chunks = iter_dataset_chunks(filename)
+            for operation in group:
+                chunks = run_chunk_operation(operation, chunks, statistics)
+            with timed_phase("write"):
+                write_csv_chunks_atomically(filename, chunks, lambda: any(operation.changed for operation in group))
+            continue
+        appended_rows = []
+        for operation in group:
+            _, operation.response, rows, _ = operation.apply(None, Staged_Changes())
+            if rows is not None:
+                appended_rows.append(rows)
+        if appended_rows:
+            rows = pd.concat(appended_rows)
+            with timed_phase("write"):
+                append_rows_to_csv(filename, rows)
+            if statistics is not None:
+                statistics.add_rows(rows)
+    if statistics is not None:
+        dataset_cache.store_file_statistics(filename, statistics)
+
+
+class Group_Committer:
+    """Group commit of the concurrent writes to a same file : the writes received within 'group_commit_window_ms'
+    are merged into one batch, applied and written once by the first of these requests while the others wait."""
+
+    def __init__(self, window_ms):
+        self.window_seconds = float(window_ms) / 1000
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def submit(self, filename, operation):
+        """Apply a write within the next batch of its file and return its HTTP response."""
+        with self.lock:
+            is_leader = filename not in self.pending
+            self.pending.setdefault(filename, []).append(operation)
+        if is_leader:
+            if self.window_seconds:
+                time.sleep(self.window_seconds)
+            with self.lock:
+                operations = self.pending.pop(filename)
+            try:
+                run_write_batch(filename, operations)
+            except Exception as error:
+                for other_operation in operations:
+                    other_operation.error = error
+            finally:
+                for other_operation in operations:
+                    other_operation.done.set()
+        operation.done.wait()
+        if operation.error is not None:
+            raise operation.error
+        return operation.response
+
+
+def match_positions(filename, df, filters):
+    """Return the sorted row positions of a dataset matching all the equality filters {column: value}.
+    Columns declared in 'indexed_columns' of config.json are resolved with their index and the position
+    sets intersected. The other columns are then only compared on the remaining candidate rows."""
+    indexed_columns = config.get("indexed_columns", {}).get(filename, [])
+    positions = None
+    remaining = {}
+    for column, value in filters.items():
+        index = dataset_cache.get_index(filename, df, column) if column in indexed_columns else None
+        if index is None:
+            remaining[column] = value
+            continue
+        found = index.lookup(value)
+        found = found[found < len(df)] # The index may already have rows appended after this dataframe
+        positions = found if positions is None else np.intersect1d(positions, found, assume_unique=True)
+
+    if not remaining:
+        return np.arange(len(df)) if positions is None else positions
+    candidates = df if positions is None else df.iloc[positions]
+    mask = np.ones(len(candidates), dtype=bool)
+    for column, value in remaining.items():
+        mask &= (candidates[column] == value).to_numpy()
+    return np.flatnonzero(mask) if positions is None else positions[mask]
+
+
+def select_rows(filename, df, filters):
+    """Return the rows of a dataset matching all the equality filters {column: value}."""
+    if not filters:
+        return df
+    with timed_phase("filter"):
+        count_rows(scanned=len(df))
+        return df.iloc[match_positions(filename, df, filters)]
+
+
+def match_chunk(chunk, filters):
+    """Return the mask of the rows of a chunk matching all the equality filters {column: value}."""
+    mask = np.ones(len(chunk), dtype=bool)
+    for column, value in filters.items():
+        if column not in chunk.columns:
+            return np.zeros(len(chunk), dtype=bool)
+        mask &= (chunk[column] == value).to_numpy()
+    return mask
+
+
+def iter_dataset_chunks(filename, columns=None, start=0):
+    """Iterate over a stored CSV file chunk by chunk without concatenating the chunks.
+    Slices of the cached dataframe are used if it is fresh, then the record batches of the sidecar,
+    otherwise the CSV file is read progressively ('out_of_core_chunksize' rows at a time for the files processed
+    out-of-core). Only the given columns and the rows from the position 'start' are read, and each chunk is indexed
+    by the positions of its rows in the file."""
+    chunksize = int(config["pandas_chunksize"])
+    df = dataset_cache.peek(filename)
+    if df is not None:
+        for i in range(start, len(df), chunksize):
+            chunk = df.iloc[i:i + chunksize]
+            yield chunk if columns is None else chunk[columns]
+        return
+
+    reader = open_fresh_sidecar(filename)
+    if reader is not None:
+        position = 0
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if position + batch.num_rows > start:
+                if columns is not None:
+                    batch = pa.RecordBatch.from_arrays([batch.column(batch.schema.get_field_index(c)) for c in columns], names=columns)
+                chunk = batch.to_pandas()
+                chunk.index = pd.RangeIndex(position, position + len(chunk))
+                yield chunk.iloc[max(start - position, 0):]
+            position += batch.num_rows
+        return
+
+    if is_out_of_core(filename):
+        chunksize = int(config["out_of_core_chunksize"])
+    position = start
+    skiprows = range(1, start + 1) if start else None
+    for chunk in pd.read_csv(home_directory + filename + ".csv", chunksize=chunksize, usecols=columns, skiprows=skiprows):
+        chunk.index = pd.RangeIndex(position, position + len(chunk))
+        position += len(chunk)
+        yield chunk if columns is None else chunk[columns]
+
+
+def read_dataset_dtypes(filename):
+    """Get the column types of a stored CSV file, from the cache or by only reading its first chunk."""
+    dtypes = dataset_cache.peek_dtypes(filename)
+    if dtypes is not None:
+        return dtypes
+    reader = open_fresh_sidecar(filename)
+    if reader is not None:
+        return reader.schema.empty_table().to_pandas().dtypes
+    return pd.read_csv(home_directory + filename + ".csv", nrows=int(config["pandas_chunksize"])).dtypes
+
+
+class Query_Error(ValueError):
+    """Raised when the predicates, projection or pagination parameters of a query can not be understood."""
+
+
+# Comparison operators usable as '<column>__<operator>=<value>' query parameters
+query_operators = {
+    "eq": lambda column, value: column == value,
+    "ne": lambda column, value: column != value,
+    "gt": lambda column, value: column > value,
+    "gte": lambda column, value: column >= value,
+    "lt": lambda column, value: column < value,
+    "lte": lambda column, value: column <= value,
+    "in": lambda column, values: column.isin(values),
+    "between": lambda column, bounds: column.between(bounds[0], bounds[1]),
+    "prefix": lambda column, value: column.astype(str).str.startswith(value),
+}
+
+
+def convert_query_value(value, builtin_type):
+    """Convert a query parameter to the python type of the column it is compared to."""
+    if isinstance(value, str) and builtin_type == bool:
+        return value.lower() in ["true", "1", "yes"]
+    if isinstance(value, str) and builtin_type == int and not value.lstrip("-").isdigit():
+        return float(value)
+    return builtin_type(value)
+
+
+def get_request_parameters():
+    """Get the parameters of a query, from the URL and from the JSON body (if it is a dictionary)."""
+    parameters = request.args.to_dict()
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        parameters.update(body)
+    return parameters
+
+
+def parse_query_predicates(parameters, dtypes):
+    """Parse the '<column>__<operator>' parameters of a query into a list of (column, operator, value)."""
+    predicates = []
+    for key, value in parameters.items():
+        if "__" not in key:
+            continue
+        column, operator = key.rsplit("__", 1)
+        if column not in dtypes.index or operator not in query_operators:
+            raise Query_Error("Unknown column or operator in the query parameter '" + key + "'.")
+        builtin_type = convert_pandas_dtypes_to_builtin_types(dtypes[column])
+        if operator == "prefix":
+            builtin_type = str
+        try:
+            if operator in ["in", "between"]:
+                values = value if isinstance(value, list) else str(value).split(",")
+                value = [convert_query_value(v, builtin_type) for v in values]
+                if operator == "between" and len(value) != 2:
+                    raise Query_Error("The 'between' operator expects 2 bounds separated by a comma.")
+            else:
+                value = convert_query_value(value, builtin_type)
+        except (TypeError, ValueError) as error:
+            raise Query_Error("Bad value for the query parameter '" + key + "' : " + str(error))
+        predicates.append((column, operator, value))
+    return predicates
+
+
+def parse_query_page(parameters, dtypes):
+    """Parse the projection ('fields') and pagination ('limit', 'offset', 'cursor') parameters of a query."""
+    fields = parameters.get("fields")
+    if fields is not None:
+        fields = fields if isinstance(fields, list) else str(fields).split(",")
+        unknown_fields = [f for f in fields if f not in dtypes.index]
+        if unknown_fields:
+            raise Query_Error("Unknown column(s) in 'fields' : " + ", ".join(unknown_fields))
+    try:
+        limit = int(parameters["limit"]) if parameters.get("limit") is not None else None
+        offset = int(parameters.get("offset") or 0)
+        start = int(base64.urlsafe_b64decode(str(parameters["cursor"]).encode()).decode()) if parameters.get("cursor") else 0
+    except ValueError:
+        raise Query_Error("'limit', 'offset' and 'cursor' must be integers or a cursor returned by a previous query.")
+    if (limit is not None and limit < 0) or offset < 0 or start < 0:
+        raise Query_Error("'limit', 'offset' and 'cursor' can not be negative.")
+    return {"fields": fields, "limit": limit, "offset": offset, "start": start}
+
+
+def is_pushed_down_query(parameters):
+    """True if a query uses operators, projection or pagination and must be evaluated during the scan."""
+    return any("__" in key or key in ["fields", "limit", "offset", "cursor", "stream"] for key in parameters)
+
+
+def is_scanned_in_parallel(filename):
+    """True if a query on a CSV file reads the file itself (not cached and without sidecar) and it is large
+    enough to be scanned in parallel. Queries with a limit are read sequentially, to stop as soon as it is reached."""
+    return (dataset_cache.peek(filename) is None and open_fresh_sidecar(filename) is None
+        and parallel_scanner.is_worthwhile(home_directory + filename + ".csv"))
+
+
+def iter_parallel_filtered_chunks(filename, predicates, columns, start=0):
+    """Filter a CSV file in parallel and yield the matching rows of each of its parts, in the order of the file
+    and indexed by their positions in the file."""
+    chunksize = int(config["out_of_core_chunksize"]) if is_out_of_core(filename) else None
+    position = 0
+    for rows, matches in parallel_scanner.scan(home_directory + filename + ".csv", filter_task, predicates, columns, chunksize=chunksize):
+        if matches is None:
+            continue
+        matches.index = matches.index + position
+        position += rows
+        yield matches[matches.index >= start] if start else matches
+
+
+def scan_cached_dataset(filename, df, predicates, fields=None, limit=None, offset=0, start=0, chunksize=None):
+    """Evaluate a pushed down query on a cached dataframe at once : the equality predicates are resolved with
+    match_positions (and the indexes of the columns), the other ones with one mask on the remaining rows (on
+    blocks of rows growing until the page is full if there is a limit), then only the page of matching rows
+    and the asked columns are materialized. Yield them in chunks of chunksize rows (all at once by default),
+    indexed by their row positions."""
+    equality_filters = OrderedDict()
+    other_predicates = []
+    for column, operator, value in predicates:
+        if operator == "eq" and column not in equality_filters:
+            equality_filters[column] = value
+        else:
+            other_predicates.append((column, operator, value))
+
+    with timed_phase("filter"):
+        count_rows(scanned=max(len(df) - start, 0))
+        if equality_filters:
+            positions = match_positions(filename, df, equality_filters)
+            positions = positions[np.searchsorted(positions, start):]
+        else:
+            positions = np.arange(start, len(df))
+        if other_predicates:
+            needed = None if limit is None else offset + limit
+            block_size = len(positions) if needed is None else max(needed, 1)
+            matches, found, i = [], 0, 0
+            while i < len(positions) and (needed is None or found < needed):
+                block = positions[i:i + block_size]
+                for column, operator, value in other_predicates:
+                    block = block[query_operators[operator](df[column].iloc[block], value).to_numpy()]
+                matches.append(block)
+                found += len(block)
+                i += block_size
+                block_size *= 2
+            positions = np.concatenate(matches) if matches else positions[:0]
+        positions = positions[offset:] if limit is None else positions[offset:offset + limit]
+
+    columns = [df.columns.get_loc(c) for c in (fields if fields is not None else df.columns)]
+    chunksize = chunksize or max(len(positions), 1)
+    for i in range(0, len(positions), chunksize):
+        chunk = df.iloc[positions[i:i + chunksize], columns]
+        chunk.index = pd.Index(positions[i:i + chunksize])
+        yield chunk
+
+
+def scan_dataset(filename, predicates, fields=None, limit=None, offset=0, start=0, chunksize=None):
+    """Scan a dataset chunk by chunk and evaluate the predicates, the pagination and the projection
+    during the read, so that non-matching rows and columns are never materialized nor serialized.
+    Yield the matching chunks (indexed by row positions) and stop reading once the limit is reached.
+    A cached dataframe is not scanned but queried at once, and its result yielded in chunks of chunksize
+    rows (see scan_cached_dataset)."""
+    df = dataset_cache.peek(filename)
+    if df is not None:
+        yield from scan_cached_dataset(filename, df, predicates, fields, limit, offset, start, chunksize)
+        return
+
+    columns = None
+    if fields is not None:
+        columns = list(dict.fromkeys(list(fields) + [column for column, _, _ in predicates]))
+    remaining = limit
+    if limit is None and is_scanned_in_parallel(filename):
+        chunks = iter_parallel_filtered_chunks(filename, predicates, columns, start)
+        predicates = [] # Already evaluated by the scan workers
+    else:
+        chunks = iter_dataset_chunks(filename, columns=columns, start=start)
+    for chunk in chunks:
+        if remaining == 0:
+            return
+        count_rows(scanned=len(chunk))
+        if predicates:
+            with timed_phase("filter"):
+                mask = np.ones(len(chunk), dtype=bool)
+                for column, operator, value in predicates:
+                    mask &= query_operators[operator](chunk[column], value).to_numpy()
+                chunk = chunk[mask]
+        if offset:
+            skipped = min(offset, len(chunk))
+            chunk = chunk.iloc[skipped:]
+            offset -= skipped
+        if remaining is not None:
+            chunk = chunk.iloc[:remaining]
+            remaining -= len(chunk)
+        if len(chunk):
+            yield chunk if fields is None else chunk[fields]
+
+
+def query_response(filename, predicates, page):
+    """Run a pushed down query and send its result, streamed if asked, otherwise with an
+    'X-Next-Cursor' header to get the next page when the limit was reached."""
+    stream_format = get_stream_format()
+    if stream_format is None and page["limit"] is None and is_out_of_core(filename):
+        stream_format = get_out_of_core_stream_format()
+    chunks = scan_dataset(filename, predicates, page["fields"], page["limit"], page["offset"], page["start"],
+        chunksize=int(config["pandas_chunksize"]) if stream_format else None)
+    if stream_format:
+        return stream_records(chunks, stream_format)
+
+    chunk_list = work_pool.run(list, chunks)
+    if chunk_list:
+        result_df = pd.concat(chunk_list)
+    else:
+        columns = page["fields"] if page["fields"] is not None else list(read_dataset_dtypes(filename).index)
+        result_df = pd.DataFrame(columns=columns)
+    response = dataframe_response(result_df)
+    if page["limit"] is not None and len(result_df) == page["limit"] and len(result_df):
+        response.headers["X-Next-Cursor"] = base64.urlsafe_b64encode(str(int(result_df.index[-1]) + 1).encode()).decode()
+    return response
+
+
+# -----------------------------
+# Batch of sub-queries
+# -----------------------------
+
+batch_query_types = ["filter", "search", "aggregate"]
+batch_aggregate_functions = ["count", "sum", "mean", "min", "max", "nunique"]
+
+def parse_batch_queries(body, default_filename):
+    """Check the sub-queries of a batch, given as a dictionary {query_id: query} or as a list (identified by
+    their positions), and normalize them into {query_id: query} where every query has its 'file', 'type',
+    equality 'filters' {column: value}, 'fields', 'limit' and aggregation ('function', 'column', 'group_by')."""
+    queries = body.get("queries") if isinstance(body, dict) else None
+    if isinstance(queries, list):
+        queries = OrderedDict((str(i), query) for i, query in enumerate(queries))
+    if not isinstance(queries, dict) or not queries:
+        raise Query_Error("The JSON body must have a non-empty 'queries' list or dictionary.")
+    if len(queries) > int(config["batch_max_queries"]):
+        raise Query_Error("A batch can not have more than " + str(config["batch_max_queries"]) + " queries.")
+
+    normalized_queries = OrderedDict()
+    for query_id, query in queries.items():
+        if not isinstance(query, dict) or query.get("type", "filter") not in batch_query_types:
+            raise Query_Error("The query '" + str(query_id) + "' must be a dictionary whose 'type' is one of : " + ", ".join(batch_query_types) + ".")
+        query_type = query.get("type", "filter")
+        filters = query.get("filters") or {}
+        if query_type == "filter":
+            if "column" not in query or "value" not in query:
+                raise Query_Error("The filter query '" + str(query_id) + "' needs a 'column' and a 'value'.")
+            filters = {query["column"]: query["value"]}
+        if not isinstance(filters, dict) or (query_type == "search" and not filters):
+            raise Query_Error("The query '" + str(query_id) + "' needs a 'filters' dictionary {column: value}.")
+        function = query.get("function", "count")
+        if query_type == "aggregate" and (function not in batch_aggregate_functions or (function != "count" and "column" not in query)):
+            raise Query_Error("The aggregate query '" + str(query_id) + "' needs a 'function' among " + ", ".join(batch_aggregate_functions)
+                + " and a 'column' (except for count).")
+        group_by = query.get("group_by") or []
+        normalized_queries[str(query_id)] = {
+            "file": str(query.get("file", default_filename)),
+            "type": query_type,
+            "filters": filters,
+            "fields": query.get("fields"),
+            "limit": query.get("limit"),
+            "function": function,
+            "column": query.get("column") if query_type == "aggregate" else None,
+            "group_by": group_by if isinstance(group_by, list) else [group_by],
+        }
+    return normalized_queries
+
+
+def check_batch_query(query_id, query, df):
+    """Check the columns of a sub-query against its dataset and type the values of its filters like their columns."""
+    used_columns = list(query["filters"]) + list(query["fields"] or []) + query["group_by"] + ([query["column"]] if query["column"] else [])
+    unknown_columns = [c for c in used_columns if c not in df.columns]
+    if unknown_columns:
+        raise Query_Error("Unknown column(s) in the query '" + query_id + "' : " + ", ".join(map(str, unknown_columns)))
+    try:
+        for c, v in query["filters"].items():
+            builtin_type = convert_pandas_dtypes_to_builtin_types(df.dtypes[c])
+            query["filters"][c] = v if isinstance(v, float) and builtin_type == int else convert_query_value(v, builtin_type)
+        query["limit"] = int(query["limit"]) if query["limit"] is not None else None
+    except (TypeError, ValueError) as error:
+        raise Query_Error("Bad value in the query '" + query_id + "' : " + str(error))
+
+
+def join_batch_keys(df, columns, filters_by_query):
+    """Find the rows of many equality sub-queries on the same columns in one pass : the rows whose values are
+    among the queried ones are joined with the table of the queried keys. Return {query_id: sorted positions}."""
+    keys = pd.DataFrame([[filters[c] for c in columns] for filters in filters_by_query.values()], columns=columns)
+    keys["_query"] = list(filters_by_query)
+    for c in columns:
+        if df.dtypes[c].kind in "iu":
+            keys = keys[keys[c] == keys[c].round()] # Non integral values can not match an integer column
+        if len(keys):
+            keys[c] = keys[c].astype(df.dtypes[c])
+    mask = np.ones(len(df), dtype=bool)
+    for c in columns:
+        mask &= df[c].isin(keys[c]).to_numpy()
+    rows = df.loc[mask, columns].reset_index(drop=True)
+    rows["_position"] = np.flatnonzero(mask)
+    matches = rows.merge(keys, on=columns, how="inner")
+    positions = {query_id: np.empty(0, dtype=np.int64) for query_id in filters_by_query}
+    matched_positions = matches["_position"].to_numpy()
+    for query_id, indices in matches.groupby("_query").indices.items():
+        positions[query_id] = np.sort(matched_positions[indices])
+    return positions
+
+
+def resolve_batch_rows(queries, datasets):
+    """Rows of every sub-query with filters, with one join per file and set of filtered columns."""
+    groups = OrderedDict()
+    for query_id, query in queries.items():
+        if query["filters"]:
+            groups.setdefault((query["file"], tuple(sorted(query["filters"]))), []).append(query_id)
+    positions = {}
+    with timed_phase("filter"):
+        for (filename, columns), query_ids in groups.items():
+            count_rows(scanned=len(datasets[filename]))
+            positions.update(join_batch_keys(datasets[filename], list(columns), OrderedDict((q, queries[q]["filters"]) for q in query_ids)))
+    return positions
+
+
+def batch_query_result(query, df, positions):
+    """Result dataframe of a sub-query : its rows (projected and limited), or its aggregation."""
+    rows = df.iloc[positions] if positions is not None else df
+    if query["type"] != "aggregate":
+        rows = rows if query["fields"] is None else rows[query["fields"]]
+        return rows if query["limit"] is None else rows.iloc[:query["limit"]]
+    if query["group_by"]:
+        if query["column"] is None:
+            return rows.groupby(query["group_by"]).size().reset_index(name="count")
+        return rows.groupby(query["group_by"])[query["column"]].agg(query["function"]).reset_index()
+    value = len(rows) if query["column"] is None else rows[query["column"]].agg(query["function"])
+    return pd.DataFrame({query["function"]: [value]})
+
+
+def batch_response(queries, datasets, positions):
+    """Send the results of the sub-queries as one JSON object keyed by query id, or streamed as one
+    NDJSON line {"query": id, "result": [...]} per sub-query."""
+    indent = 4 if is_pretty_requested() else None
+    def generate_results():
+        for query_id, query in queries.items():
+            result_df = batch_query_result(query, datasets[query["file"]], positions.get(query_id))
+            count_rows(returned=len(result_df))
+            with timed_phase("serialization"):
+                result = result_df.to_json(orient="records", indent=indent)
+            yield query_id, result
+
+    if request.args.get("stream") == "ndjson":
+        lines = ('{"query":' + json.dumps(query_id) + ',"result":' + result + "}\n" for query_id, result in generate_results())
+        return Response(stream_with_context(lines), mimetype=stream_formats["ndjson"])
+    body = "{" + ",".join(json.dumps(query_id) + ":" + result for query_id, result in generate_results()) + "}"
+    return Response(body, mimetype="application/json")
+
+
+class SQL_Timeout_Error(Exception):
+    """Raised when a SQL query runs longer than 'sql_timeout_seconds'."""
+
+
+class SQL_Engine:
+    """Long-lived in-process DuckDB database on which the SQL queries are run.
+
+    Every worker thread gets its own cursor, on which the cached dataframes of the queried CSV files
+    are registered as views (without copying them) under their filename, and kept registered across
+    requests as long as they are the cached ones. Queries run in a transaction which is always rolled
+    back, and the database has no access to the filesystem."""
+
+    def __init__(self, timeout_seconds, max_rows):
+        self.pid = os.getpid()
+        self.timeout_seconds = float(timeout_seconds)
+        self.max_rows = int(max_rows)
+        self.database = duckdb.connect(":memory:", config={"enable_external_access": False, "lock_configuration": True})
+        self.local = threading.local()
+
+    def cursor(self):
+        if not hasattr(self.local, "cursor"):
+            self.local.cursor = self.database.cursor()
+            self.local.registered = {}
+        return self.local.cursor
+
+    def query(self, sql_query, filenames):
+        """Run a SQL query on the given CSV files, used as tables named after their filename.
+        Return the result dataframe (truncated to 'max_rows') and whether it was truncated."""
+        cursor = self.cursor()
+        registered = self.local.registered
+        out_of_core_filenames = [filename for filename in filenames if is_out_of_core(filename)]
+        for filename in filenames:
+            if filename in out_of_core_filenames:
+                if filename in registered:
+                    cursor.unregister(filename)
+                    del registered[filename]
+                continue
+            df = load_dataset(filename)
+            count_rows(scanned=len(df))
+            if registered.get(filename) is not df:
+                cursor.register(filename, df)
+                registered[filename] = df
+
+        timer = threading.Timer(self.timeout_seconds, cursor.interrupt)
+        timer.start()
+        cursor.begin()
+        try:
+            # The files processed out-of-core are read block by block while the query runs, from a CSV reader
+            # registered within the transaction so that its rollback drops it
+            for filename in out_of_core_filenames:
+                cursor.register(filename, open_csv_batches(filename))
+            relation = cursor.sql(sql_query)
+            result_df = relation.limit(self.max_rows + 1).df() if relation is not None else pd.DataFrame()
+        except duckdb.InterruptException:
+            raise SQL_Timeout_Error("The SQL query was stopped after " + str(self.timeout_seconds) + " seconds.")
+        finally:
+            timer.cancel()
+            cursor.rollback()
+
+            # Release the dataframes which are no longer cached
+            for filename, df in list(registered.items()):
+                if not dataset_cache.is_cached(filename, df):
+                    cursor.unregister(filename)
+                    del registered[filename]
+        return result_df.iloc[:self.max_rows], len(result_df) > self.max_rows
+
+
+def open_csv_batches(filename):
+    """Open a stored CSV file as a stream of Arrow record batches, parsed as they are consumed.
+    Raise an Out_Of_Core_Error if pyarrow is not installed."""
+    if pa is None:
+        raise Out_Of_Core_Error("The CSV file '" + filename + "' is larger than " + str(config["out_of_core_min_mb"])
+            + " MB and can only be queried in SQL with pyarrow installed.")
+    return pa_csv.open_csv(home_directory + filename + ".csv")
+
+
+sql_engine = None
+sql_engine_lock = threading.Lock()
+
+def get_sql_engine():
+    """Get the SQL engine of the current process, created on its first use so that the forked workers
+    of the pre-fork server never share a DuckDB database. Return None if DuckDB is not installed."""
+    global sql_engine
+    if duckdb is None:
+        return None
+    with sql_engine_lock:
+        if sql_engine is None or sql_engine.pid != os.getpid():
+            sql_engine = SQL_Engine(config["sql_timeout_seconds"], config["sql_max_rows"])
+        return sql_engine
+
+
+def find_queried_filenames(sql_query):
+    """Get the stored CSV files used as tables in a SQL query. As SQL identifiers, the table names are matched
+    whatever their case, and the real filenames are returned."""
+    stored_filenames = [name[:-4] for name in os.listdir(home_directory) if name.endswith(".csv")]
+    identifiers = set(identifier.lower() for identifier in re.findall(r'[A-Za-z0-9_\-]+', sql_query))
+    return sorted(filename for filename in stored_filenames if filename.lower() in identifiers)
+
+
+stream_formats = {"ndjson": "application/x-ndjson", "json": "application/json", "csv": "text/csv"}
+
+def get_stream_format():
+    """Get the streaming format asked with the 'stream' URL parameter ('ndjson', 'json' or 'csv'), or None."""
+    stream_format = request.args.get("stream")
+    return stream_format if stream_format in stream_formats else None
+
+
+def get_out_of_core_stream_format():
+    """Streaming format of the unpaginated results of a file processed out-of-core, which are streamed by default :
+    the negotiated format if it can be streamed (JSON or CSV), otherwise None."""
+    response_format = get_response_format()
+    return response_format if response_format in stream_formats else None
+
+
+def stream_records(chunks, stream_format):
+    """Stream dataframe chunks as soon as they are ready, as 'records' style NDJSON lines, as one JSON array
+    or as CSV lines. Only one chunk is held in memory at a time."""
+    def generate():
+        first = True
+        if stream_format == "json":
+            yield "["
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            count_rows(returned=len(chunk))
+            with timed_phase("serialization"):
+                if stream_format == "csv":
+                    data = chunk.to_csv(index=False, header=first)
+                elif stream_format == "ndjson":
+                    data = chunk.to_json(orient="records", lines=True).rstrip("\n") + "\n"
+                else:
+                    records = chunk.to_json(orient="records")[1:-1]
+                    data = records if first else "," + records
+            yield data
+            first = False
+        if stream_format == "json":
+            yield "]"
+    return Response(stream_with_context(generate()), mimetype=stream_formats[stream_format])
+
+
+def is_pretty_requested():
+    """Pretty printing of the JSON responses is only done when asked with the 'pretty' URL parameter."""
+    return request.args.get("pretty", "false").lower() in ["true", "1", "yes"]
+
+
+class Format_Error(Exception):
+    """Raised when the format asked with the 'format' URL parameter or the Accept header is not available."""
+
+
+def write_arrow_stream(df):
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def write_parquet(df):
+    sink = pa.BufferOutputStream()
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), sink)
+    return sink.getvalue().to_pybytes()
+
+
+# Formats of the tabular responses : mimetype and writer of the dataframe, JSON first as the default one
+response_formats = OrderedDict([("json", "application/json"), ("csv", "text/csv")])
+response_writers = {"csv": lambda df: df.to_csv(index=False)}
+if pa is not None:
+    response_formats["arrow"] = "application/vnd.apache.arrow.stream"
+    response_formats["parquet"] = "application/vnd.apache.parquet"
+    response_writers.update({"arrow": write_arrow_stream, "parquet": write_parquet})
+if msgpack is not None:
+    response_formats["msgpack"] = "application/x-msgpack"
+    response_writers["msgpack"] = lambda df: msgpack.packb(df.to_dict(orient="list"))
+
+
+def get_response_format():
+    """Get the format of a tabular response, asked with the 'format' URL parameter or else with the Accept header."""
+    response_format = request.args.get("format")
+    if response_format is None:
+        mimetype = request.accept_mimetypes.best_match(list(response_formats.values()), default="application/json")
+        return next(f for f, m in response_formats.items() if m == mimetype)
+    if response_format not in response_formats:
+        raise Format_Error("The format '" + response_format + "' is not available, try one of : " + ", ".join(response_formats) + ".")
+    return response_format
+
+
+def dataframe_response(df, orient="records", status=200):
+    """Send the JSON string written by pandas straight out, without parsing it back into python objects,
+    or the dataframe written in the negotiated format (CSV, Arrow IPC stream, Parquet or MessagePack columns).
+    The index of the dataframes sent 'columns' oriented (e.g. the statistics names) becomes their first column."""
+    response_format = get_response_format()
+    count_rows(returned=len(df))
+    with timed_phase("serialization"):
+        if response_format == "json":
+            body = df.to_json(orient=orient, indent=4 if is_pretty_requested() else None)
+        else:
+            body = response_writers[response_format](df.reset_index() if orient != "records" else df)
+    return Response(body, status=status, mimetype=response_formats[response_format])
+
+
+def json_response(obj, status=200):
+    """Send a python object (dict, list...) as a compact JSON response, or an indented one if asked."""
+    with timed_phase("serialization"):
+        if is_pretty_requested():
+            body = json.dumps(obj, indent=4)
+        else:
+            body = json.dumps(obj, separators=(",", ":"))
+    return Response(body, status=status, mimetype="application/json")
+
+
+# -----------------------------
+# Conditional requests and response cache
+# -----------------------------
+
+def file_versions(filenames):
+    """Version of each stored CSV file : its inode (changed by the atomic rewrites), mtime and size."""
+    versions = []
+    for filename in filenames:
+        stat = os.stat(home_directory + filename + ".csv")
+        versions.append((filename, stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    return tuple(versions)
+
+
+class Response_Cache:
+    """Bounded cache of the serialized responses of the GET endpoints, keyed by endpoint, filename and normalized
+    URL parameters. An entry is only used while the versions of its CSV files are the ones it was computed on,
+    and it is dropped when one of them is written through the API. The least recently used entries are evicted
+    when the total size of the cached bodies goes over the budget."""
+
+    def __init__(self, max_memory_mb):
+        self.max_memory = int(max_memory_mb) * 1024 * 1024
+        self.entries = OrderedDict()
+        self.memory_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, versions):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry["versions"] != versions:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, versions, response):
+        body = response.get_data()
+        if len(body) > self.max_memory:
+            return
+        entry = {"versions": versions, "filenames": set(version[0] for version in versions), "body": body, "mimetype": response.mimetype,
+            "headers": [(k, v) for k, v in response.headers.items() if k not in ["Content-Type", "Content-Length"]]}
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = entry
+            self.memory_used += len(body)
+            while self.memory_used > self.max_memory:
+                _, evicted = self.entries.popitem(last=False)
+                self.memory_used -= len(evicted["body"])
+
+    def invalidate(self, filename):
+        """Drop the responses computed on a CSV file, called when it is written through the API."""
+        with self.lock:
+            for key in [key for key, entry in self.entries.items() if filename in entry["filenames"]]:
+                self._remove(key)
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries),
+                "memory_used_bytes": self.memory_used, "max_memory_bytes": self.max_memory}
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.memory_used -= len(entry["body"])
+
+
+def conditional_get(endpoint):
+    """Decorator of the GET endpoints whose response only depends on the stored CSV files and on the URL.
+
+    The responses get an ETag and a Last-Modified header derived from the versions of the files, and a
+    'Cache-Control' header. A request whose If-None-Match (or If-Modified-Since) matches gets an empty 304 response,
+    otherwise the serialized response is sent from the response cache if it was computed on the same versions."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, filename, **view_args):
+            if endpoint not in activated_endpoints or request.get_data() or not os.path.isfile(home_directory + filename + ".csv"):
+                return method(self, filename, **view_args)
+
+            # Key of the response : the decoded SQL query (and its tables) or the normalized URL parameters
+            parameters = tuple(sorted((k, v) for k, v in request.args.items(multi=True) if k != "query"))
+            filenames = [filename]
+            if endpoint == "sql":
+                try:
+                    sql_query = base64.urlsafe_b64decode(request.args.get("query", "").encode()).decode()
+                except ValueError:
+                    return method(self, filename, **view_args)
+                filenames = sorted(set(filenames + find_queried_filenames(sql_query)))
+                # Not normalized : the spaces within the string literals are part of the query
+                parameters += (("query", sql_query),)
+            key = (endpoint, filename, tuple(sorted(view_args.items())), parameters, get_response_format())
+            try:
+                versions = file_versions(filenames)
+            except FileNotFoundError:
+                return method(self, filename, **view_args)
+            etag = hashlib.sha1(repr((key, versions)).encode()).hexdigest()
+            last_modified = datetime.fromtimestamp(max(version[2] for version in versions) // 10 ** 9, tz=timezone.utc)
+
+            if request.if_none_match:
+                is_not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                is_not_modified = request.if_modified_since is not None and request.if_modified_since.replace(tzinfo=timezone.utc) >= last_modified
+            if is_not_modified:
+                response = Response(status=304)
+            else:
+                entry = response_cache.get(key, versions)
+                if entry is not None:
+                    response = Response(entry["body"], status=200, mimetype=entry["mimetype"], headers=entry["headers"])
+                else:
+                    response = method(self, filename, **view_args)
+                    if not isinstance(response, Response) or response.status_code != 200:
+                        return response
+                    if not response.is_streamed and file_versions(filenames) == versions:
+                        response_cache.put(key, versions, response)
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.headers["Cache-Control"] = config["cache_control"]
+            response.vary.add("Accept")
+            return response
+        return wrapper
+    return decorator
+
+
+@app.before_request
+def start_request_instrumentation():
+    """Start timing the request, and profiling it if asked with the 'X-Profile: cprofile' header."""
+    state = {"endpoint": request.url_rule.rule if request.url_rule is not None else "unmatched", "start": time.perf_counter(),
+        "phases": OrderedDict(), "rows_scanned": 0, "rows_returned": 0, "profiler": None}
+    request_state.current = state
+    if config["profiling_enabled"] and request.headers.get("X-Profile") == "cprofile":
+        state["profiler"] = cProfile.Profile()
+        state["profiler"].enable()
+
+
+def count_streamed_bytes(chunks, endpoint):
+    for chunk in chunks:
+        metrics.increment("csv2api_response_bytes_total", len(chunk), endpoint=endpoint)
+        yield chunk
+
+
+# Registered before compress_response so that it runs after it and counts the bytes really sent
+@app.after_request
+def record_request_metrics(response):
+    """Record the latency, status and size of the response. With profiling enabled, the 'X-Profile: phases' header
+    adds the duration of each phase to the response (Server-Timing header) and 'X-Profile: cprofile' replaces
+    the response by the cProfile statistics of the request."""
+    state = current_request_state()
+    if state is None:
+        return response
+    endpoint = state["endpoint"]
+    elapsed = time.perf_counter() - state["start"]
+    metrics.observe("csv2api_request_duration_seconds", elapsed, endpoint=endpoint, method=request.method)
+    metrics.increment("csv2api_requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+    if response.is_streamed:
+        response.response = count_streamed_bytes(response.response, endpoint)
+    else:
+        metrics.increment("csv2api_response_bytes_total", len(response.get_data()), endpoint=endpoint)
+
+    if config["profiling_enabled"] and request.headers.get("X-Profile") in ["phases", "cprofile"]:
+        timings = ["%s;dur=%.3f" % (phase, seconds * 1000) for phase, seconds in state["phases"].items()]
+        response.headers["Server-Timing"] = ", ".join(timings + ["total;dur=%.3f" % (elapsed * 1000)])
+        response.headers["X-Profile-Rows"] = "scanned=%d;returned=%d" % (state["rows_scanned"], state["rows_returned"])
+        if state["profiler"] is not None:
+            state["profiler"].disable()
+            stats_text = io.StringIO()
+            pstats.Stats(state["profiler"], stream=stats_text).sort_stats("cumulative").print_stats(50)
+            profile_response = Response(stats_text.getvalue(), status=response.status_code, mimetype="text/plain")
+            for header in ["Server-Timing", "X-Profile-Rows"]:
+                profile_response.headers[header] = response.headers[header]
+            return profile_response
+    return response
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Metrics of this process in the Prometheus text format : latency histograms of the requests and of their phases,
+    requests, rows scanned and returned, bytes sent, and the state of the caches, of the work pool and of the warm-up."""
+    if "metrics" not in activated_endpoints:
+        return json_response({"Message":API_error_endpoint_disabled}, status=405)
+    dataset_cache_stats = dataset_cache.stats()
+    response_cache_stats = response_cache.stats()
+    response_lookups = response_cache_stats["hits"] + response_cache_stats["misses"]
+    warm_up = dataset_catalog.warm_up_progress()
+    gauges = [
+        ("csv2api_dataset_cache_hits", {}, dataset_cache_stats["hits"]),
+        ("csv2api_dataset_cache_misses", {}, dataset_cache_stats["misses"]),
+        ("csv2api_dataset_cache_evictions", {}, dataset_cache_stats["evictions"]),
+        ("csv2api_dataset_cache_hit_ratio", {}, dataset_cache_stats["hit_ratio"]),
+        ("csv2api_dataset_cache_memory_bytes", {}, dataset_cache_stats["memory_used_bytes"]),
+        ("csv2api_response_cache_hits", {}, response_cache_stats["hits"]),
+        ("csv2api_response_cache_misses", {}, response_cache_stats["misses"]),
+        ("csv2api_response_cache_hit_ratio", {}, response_cache_stats["hits"] / response_lookups if response_lookups else 0.0),
+        ("csv2api_response_cache_memory_bytes", {}, response_cache_stats["memory_used_bytes"]),
+        ("csv2api_work_pool_rejected", {}, work_pool.rejected),
+        ("csv2api_warm_up_files", {"state": "done"}, warm_up["done"]),
+        ("csv2api_warm_up_files", {"state": "total"}, warm_up["total"]),
+        ("csv2api_catalog_files", {}, len(dataset_catalog.entries)),
+    ]
+    return Response(metrics.render(gauges), mimetype="text/plain; version=0.0.4")
+
+
+def compress_chunks(chunks, compressor):
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@app.after_request
+def compress_response(response):
+    """Compress the responses with zstd or gzip, as accepted by the client in its Accept-Encoding header.
+    Small responses and already compressed formats (Parquet) are sent as they are, streamed ones are
+    compressed chunk by chunk."""
+    response.vary.add("Accept-Encoding")
+    if response.status_code != 200 or "Content-Encoding" in response.headers or response.mimetype == response_formats.get("parquet"):
+        return response
+    encodings = ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+    encoding = request.accept_encodings.best_match(encodings)
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        compressor = zstandard.ZstdCompressor().compressobj() if encoding == "zstd" else zlib.compressobj(6, zlib.DEFLATED, 31)
+        response.response = compress_chunks(response.response, compressor)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < int(config["compression_min_bytes"]):
+            return response
+        compressor = zstandard.ZstdCompressor().compressobj() if encoding == "zstd" else zlib.compressobj(6, zlib.DEFLATED, 31)
+        response.set_data(compressor.compress(body) + compressor.flush())
+    response.headers["Content-Encoding"] = encoding
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        response.set_etag(etag, weak=True) # Not byte-identical to the uncompressed response anymore
+    return response
+
+
 # Definition of the API namespace 'csv2api' which will be called. API general documentation is at '/'
 ns_csv2api = api.namespace('csv2api', 
                 description = "CSV files stored in the /data/ directory and to load in order to build the API.")
 
+@api.errorhandler(Server_Busy_Error)
+def handle_server_busy(error):
+    """Backpressure : reject the request when the work pool queue is full."""
+    return {"Message":"API successfully reached but the server is busy. " + str(error)}, 503, {"Retry-After": "1"}
+
+@api.errorhandler(Format_Error)
+def handle_format_error(error):
+    return {"Message":"API successfully reached but the asked format is not available. " + str(error)}, 406
+
+@api.errorhandler(Out_Of_Core_Error)
+def handle_out_of_core_error(error):
+    return {"Message":"API successfully reached but this CSV is too large to be loaded in memory. " + str(error)}, 413
+
 # Explanation of the general body query dictionary expected by POST/PUT methods : 
 # -> The API user will have to write instead into a JSON dictionary each column and its value which will be used as filter, new row etc...
 general_query_dict_model = api.model('General CSV Query Dictionary Model', {
@@ -62,27 +2366,63 @@ general_query_dict_model = api.model('General CSV Query Dictionary Model', {
     'etc': fields.String(
         description='etc... for all other wished columns. Columns:values are not mandatory, zero to infinity can be sent to the server. '),
 })
+batch_query_model = api.model('Batch Query Model', {
+    'queries': fields.Raw(example={
+        "tunis": {"type": "filter", "column": "nom_gouvernorat_ar", "value": "Tunis", "fields": ["nom_municipalite_ar"]},
+        "ariana_2020": {"type": "search", "filters": {"code_gouvernorat": 12, "population_annee": 2020}, "limit": 10},
+        "population": {"type": "aggregate", "function": "sum", "column": "population_valeur", "group_by": "nom_gouvernorat_ar"},
+        "other_file": {"type": "aggregate", "function": "count", "file": "another_csv"}},
+        description='The sub-queries, as a dictionary {query_id: query} or as a list. The type of a query is filter (a column and a value), '
+            + 'search (equality filters on several columns) or aggregate (count, sum, mean, min, max or nunique of a column, with optional '
+            + 'filters and group_by). Queries run on the CSV of the URL, or on the one of their optional "file". '
+            + 'filter and search queries accept optional "fields" and "limit".'),
+})
 class Query_Dict(fields.Raw):
     def format(self, value):
         return {'column1': value.column1, 'column2': value.column, "etc...":value.etc}
 
+# Documentation of the optional URL parameters shared by several endpoints
+pretty_params_doc = {
+    'pretty': "optional, 'true' to indent the returned JSON"}
+format_params_doc = dict(pretty_params_doc, **{
+    'format': "optional, 'json', 'csv', 'arrow' (IPC stream), 'parquet' or 'msgpack', instead of the Accept header"})
+stream_params_doc = dict(format_params_doc, **{
+    'stream': "optional, 'ndjson', 'json' or 'csv' to stream the result chunk by chunk instead of building it in memory"})
+query_params_doc = dict(stream_params_doc, **{
+    'fields': 'optional, comma separated columns to return',
+    'limit': 'optional, maximum number of rows to return',
+    'offset': 'optional, number of matching rows to skip',
+    'cursor': 'optional, the X-Next-Cursor header returned with the previous page',
+    '<column>__<operator>': 'optional, predicate on a column with the operator eq, ne, gt, gte, lt, lte, '
+        + 'in (comma separated values), between (2 comma separated bounds) or prefix'})
+
 # -----------------------------
 # GET --- Restful API HTTP Verb
 # -----------------------------
 
 @ns_csv2api.route('/<filename>/all_data')
 class CSV_all_data(Resource):
-    @api.doc(responses={
+    @api.doc(params=stream_params_doc, responses={
         200:'Success',
+        304:'Not Modified : the CSV file did not change since the ETag of the If-None-Match header.',
         404:'API successfully reached but this CSV was not found.',
+        406:'API successfully reached but the asked format is not available.',
         405:'API successfully reached but this functionnality of the API / endpoint is disabled.'
     })
+    @conditional_get("all_data")
     def get(self, filename):
         """REST GET : Get the whole CSV file stored, as a 'records' style oriented JSON."""
         if "all_data" in activated_endpoints:
             if os.path.isfile(home_directory + filename + ".csv"):
-                df = read_csv_by_chunks(home_directory + filename + ".csv", int(config["pandas_chunksize"]))
-                return json.loads(df.to_json(orient="records")), 200
+                stream_format = get_stream_format()
+                if stream_format is None and is_out_of_core(filename):
+                    stream_format = get_out_of_core_stream_format()
+                    if stream_format is None:
+                        raise Format_Error("This CSV file is too large to be sent other than streamed, in json or csv.")
+                if stream_format:
+                    return stream_records(iter_dataset_chunks(filename), stream_format)
+                df = load_dataset(filename)
+                return dataframe_response(df)
             else:
                 return {"Message": API_error_no_CSV_found }, 404
         else:
@@ -91,20 +2431,22 @@ class CSV_all_data(Resource):
 
 @ns_csv2api.route('/<filename>/header')
 class CSV_header(Resource):
-    @api.doc(responses={
+    @api.doc(params=pretty_params_doc, responses={
         200:'Success',
+        304:'Not Modified : the CSV file did not change since the ETag of the If-None-Match header.',
         404:'API successfully reached but this CSV was not found.',
         405:'API successfully reached but this functionnality of the API / endpoint is disabled.'
     })
+    @conditional_get("header")
     def get(self, filename):
         """REST GET : Get the header of the CSV file stored."""
         if "header" in activated_endpoints:
             if os.path.isfile(home_directory + filename + ".csv"):
-                df = read_csv_by_chunks(home_directory + filename + ".csv", int(config["pandas_chunksize"]))
+                dtypes = read_dataset_dtypes(filename) if is_out_of_core(filename) else load_dataset(filename).dtypes
                 df_header = {}
-                for c in df.columns:
-                    df_header[c] = str(df.dtypes[c])
-                return jsonify(df_header)
+                for c in dtypes.index:
+                    df_header[c] = str(dtypes[c])
+                return json_response(df_header)
             else:
                 return {"Message":API_error_no_CSV_found}, 404
         else:
@@ -113,25 +2455,44 @@ class CSV_header(Resource):
 
 @ns_csv2api.route('/<filename>/filter/<queried_column>/<queried_value>')
 class CSV_filter(Resource):
-    @api.doc(responses={
+    @api.doc(params=query_params_doc, responses={
         200:'Success',
+        304:'Not Modified : the CSV file did not change since the ETag of the If-None-Match header.',
+        400:'API successfully reached but the query parameters were bad interpreted.',
         404:'API successfully reached but this CSV was not found.',
+        406:'API successfully reached but the asked format is not available.',
         405:'API successfully reached but this functionnality of the API / endpoint is disabled.'
     })
+    @conditional_get("filter")
     def get(self, filename, queried_column, queried_value):
         """REST GET : Filter on an input value of an input column and get the whole CSV file stored, \
             as a 'records' style oriented JSON."""
         if "filter" in activated_endpoints:
             if os.path.isfile(home_directory + filename + ".csv"):
-                df = read_csv_by_chunks(home_directory + filename + ".csv", int(config["pandas_chunksize"]))
+                parameters = get_request_parameters()
+                if is_pushed_down_query(parameters) or is_out_of_core(filename):
+                    # Type of the filter (numeric or textual) decided once with the header, then applied during the scan
+                    dtypes = read_dataset_dtypes(filename)
+                    if is_numeric_dtype(dtypes[queried_column]):
+                        value = float(queried_value)
+                    else:
+                        value = str(queried_value)
+                    try:
+                        predicates = [(queried_column, "eq", value)] + parse_query_predicates(parameters, dtypes)
+                        page = parse_query_page(parameters, dtypes)
+                    except Query_Error as error:
+                        return {"Message":"API successfully reached but the query parameters were bad interpreted. " + str(error)}, 400
+                    return query_response(filename, predicates, page)
+
+                df = load_dataset(filename)
 
                 # Retrieve data according to the filter (numeric or textual)
                 if is_numeric_dtype(df[queried_column]):
-                    filtered_df = df[df[queried_column] == float(queried_value)]
+                    filtered_df = select_rows(filename, df, {queried_column: float(queried_value)})
                 else:
-                    filtered_df = df[df[queried_column] == str(queried_value)]
+                    filtered_df = select_rows(filename, df, {queried_column: str(queried_value)})
 
-                return json.loads(filtered_df.to_json(orient="records")), 200
+                return dataframe_response(filtered_df)
 
             else:
                 return {"Message":API_error_no_CSV_found}, 404
@@ -141,18 +2502,40 @@ class CSV_filter(Resource):
 
 @ns_csv2api.route('/<filename>/summary_stats')
 class CSV_summary_stats(Resource):
-    @api.doc(responses={
+    @api.doc(params=format_params_doc, responses={
         200:'Success',
+        304:'Not Modified : the CSV file did not change since the ETag of the If-None-Match header.',
         404:'API successfully reached but this CSV was not found.',
+        406:'API successfully reached but the asked format is not available.',
         405:'API successfully reached but this functionnality of the API / endpoint is disabled.'
     })
+    @conditional_get("summary_stats")
     def get(self, filename):
         """REST GET : Get summary statistics describing the CSV file stored as a 'columns' style oriented JSON."""
         if "summary_stats" in activated_endpoints:
             if os.path.isfile(home_directory + filename + ".csv"):
-                df = read_csv_by_chunks(home_directory + filename + ".csv", int(config["pandas_chunksize"]))
-
-                return json.loads(df.describe().to_json(orient="columns")), 200
+                # The statistics of the files processed out-of-core are merged from the ones of their chunks
+                df = None if is_out_of_core(filename) else load_dataset(filename)
+                with timed_phase("aggregate"):
+                    if df is None:
+                        statistics = work_pool.run(dataset_cache.get_file_statistics, filename)
+                    else:
+                        statistics = dataset_cache.get_statistics(filename, df)
+                    # The stale columns are computed again outside the lock, which every cache lookup of the process takes
+                    with dataset_cache.lock:
+                        stale_columns, version = statistics.stale_columns()
+                    recomputed = statistics.compute_columns(df, stale_columns) if df is not None and stale_columns else None
+                    with dataset_cache.lock:
+                        summary_df = statistics.summary(recomputed, version)
+                        approximate_columns = statistics.approximate_columns([c for c in summary_df.columns if c not in statistics.numeric_columns])
+                        approximate_quantiles = statistics.approximate_quantiles([c for c in summary_df.columns if c in statistics.numeric_columns])
+
+                response = dataframe_response(summary_df, orient="columns")
+                if approximate_columns is not None:
+                    response.headers["X-Approximate-Counts"] = approximate_columns
+                if approximate_quantiles is not None:
+                    response.headers["X-Approximate-Quantiles"] = approximate_quantiles
+                return response
 
             else:
                 return {"Message":API_error_no_CSV_found}, 404
@@ -161,22 +2544,35 @@ class CSV_summary_stats(Resource):
 
 @ns_csv2api.route('/<filename>/value_counts')
 class CSV_value_counts(Resource):
-    @api.doc(responses={
+    @api.doc(params=pretty_params_doc, responses={
         200:'Success',
+        304:'Not Modified : the CSV file did not change since the ETag of the If-None-Match header.',
         404:'API successfully reached but this CSV was not found.',
         405:'API successfully reached but this functionnality of the API / endpoint is disabled.'
     })
+    @conditional_get("value_counts")
     def get(self, filename):
         """REST GET : For each column CSV file stored, get the count of records by each possible value found."""
         if "value_counts" in activated_endpoints:
             if os.path.isfile(home_directory + filename + ".csv"):
-                df = read_csv_by_chunks(home_directory + filename + ".csv", int(config["pandas_chunksize"]))
+                df = None if is_out_of_core(filename) else load_dataset(filename)
+                with timed_phase("aggregate"):
+                    if df is None:
+                        statistics = work_pool.run(dataset_cache.get_file_statistics, filename)
+                    else:
+                        statistics = dataset_cache.get_statistics(filename, df)
+                    with dataset_cache.lock:
+                        column_value_counts = statistics.value_counts()
+                        approximate_columns = statistics.approximate_columns()
 
                 value_counts = {}
-                for col in df.columns:
-                    value_counts[col] = json.loads(df[col].value_counts().to_json(orient="columns")), 200
+                for col, counts in column_value_counts.items():
+                    value_counts[col] = json.loads(counts.to_json(orient="columns")), 200
 
-                return jsonify(value_counts)
+                response = json_response(value_counts)
+                if approximate_columns is not None:
+                    response.headers["X-Approximate-Counts"] = approximate_columns
+                return response
 
             else:
                 return {"Message":API_error_no_CSV_found}, 404
@@ -184,19 +2580,81 @@ class CSV_value_counts(Resource):
             return {"Message":API_error_endpoint_disabled}, 405
 
 
+@ns_csv2api.route('/catalog')
+class CSV_catalog(Resource):
+    @api.doc(params=pretty_params_doc, responses={
+        200:'Success',
+        405:'API successfully reached but this functionnality of the API / endpoint is disabled.'
+    })
+    def get(self):
+        """REST GET : Get the catalog of the CSV files stored : size, modification time, header and whether they are loaded."""
+        if "catalog" in activated_endpoints:
+            return json_response(dataset_catalog.describe())
+        else:
+            return {"Message":API_error_endpoint_disabled}, 405
+
+
+@ns_csv2api.route('/health')
+class CSV_health(Resource):
+    @api.doc(responses={
+        200:'Success : the server is alive.',
+        405:'API successfully reached but this functionnality of the API / endpoint is disabled.'
+    })
+    def get(self):
+        """REST GET : Liveness probe, answered as soon as the server runs."""
+        if "health" in activated_endpoints:
+            return {"Status":"alive"}, 200
+        else:
+            return {"Message":API_error_endpoint_disabled}, 405
+
+
+@ns_csv2api.route('/ready')
+class CSV_ready(Resource):
+    @api.doc(responses={
+        200:'Success : the warm-up of the datasets is done.',
+        503:'The warm-up of the datasets is still running.',
+        405:'API successfully reached but this functionnality of the API / endpoint is disabled.'
+    })
+    def get(self):
+        """REST GET : Readiness probe, with the progress of the warm-up of the datasets."""
+        if "health" in activated_endpoints:
+            warm_up = dataset_catalog.warm_up_progress()
+            return {"Ready":warm_up["ready"], "Warm_up":warm_up}, 200 if warm_up["ready"] else 503
+        else:
+            return {"Message":API_error_endpoint_disabled}, 405
+
+
+@ns_csv2api.route('/cache_stats')
+class CSV_cache_stats(Resource):
+    @api.doc(responses={
+        200:'Success',
+        405:'API successfully reached but this functionnality of the API / endpoint is disabled.'
+    })
+    def get(self):
+        """REST GET : Get the hit/miss/eviction counters and the memory usage of the dataset cache."""
+        if "cache_stats" in activated_endpoints:
+            return dict(dataset_cache.stats(), response_cache=response_cache.stats()), 200
+        else:
+            return {"Message":API_error_endpoint_disabled}, 405
+
+
 @ns_csv2api.route('/<filename>/sql')
 class CSV_sql(Resource):
-    @api.doc(responses={
+    @api.doc(params=format_params_doc, responses={
         200:'Success',
+        304:'Not Modified : the CSV file did not change since the ETag of the If-None-Match header.',
+        400:'API successfully reached but the SQL query failed.',
         404:'API successfully reached but this CSV was not found in the SQL query nor in the URL.',
+        408:'API successfully reached but the SQL query timed out.',
+        413:'API successfully reached but this CSV is too large to be loaded in memory (without DuckDB and pyarrow).',
+        406:'API successfully reached but the asked format is not available.',
         405:'API successfully reached but this functionnality of the API / endpoint is disabled.'
     })
+    @conditional_get("sql")
     def get(self, filename):
         """REST GET : Get the result of a SQL query on the CSV file stored."""
         if "sql" in activated_endpoints:
             if os.path.isfile(home_directory + filename + ".csv"):
-                df = read_csv_by_chunks(home_directory + filename + ".csv", int(config["pandas_chunksize"]))
-
                 # Get the JSON body of the API REST query
                 parser = reqparse.RequestParser()
                 parser.add_argument("query", type=str, required=True)
@@ -204,15 +2662,40 @@ class CSV_sql(Resource):
                 query = str(parser.parse_args()["query"])
                 decoded_query = base64.urlsafe_b64decode(query.encode()).decode()
 
+                # Query the persistent SQL engine, where every stored CSV is a table named after its filename
+                sql_engine = get_sql_engine()
+                if sql_engine is not None:
+                    queried_filenames = find_queried_filenames(decoded_query)
+                    if not queried_filenames:
+                        return {"Message": str(
+                            "API successfully reached but this CSV was not found in the SQL query."
+                            + "Please try to rewrite your query and make sure that your 'FROM xxx' statement is right.")}, 404
+                    try:
+                        with timed_phase("sql"):
+                            query_df, is_truncated = work_pool.run(sql_engine.query, decoded_query, queried_filenames)
+                    except SQL_Timeout_Error as error:
+                        return {"Message":"API successfully reached but the SQL query timed out. " + str(error)}, 408
+                    except duckdb.Error as error:
+                        return {"Message":"API successfully reached but the SQL query failed. " + str(error)}, 400
+                    response = dataframe_response(query_df)
+                    if is_truncated:
+                        response.headers["X-Row-Limit-Reached"] = str(sql_engine.max_rows)
+                    return response
+
+                # Without DuckDB : pandasql copies the dataframe into a new SQLite database at each query
+                df = load_dataset(filename)
+
                 # Insensitive case value replacement
                 insensitive_subst = re.compile(re.escape('from ' + filename), re.IGNORECASE)
                 decoded_query = insensitive_subst.sub('FROM df', decoded_query)
 
                 # Query the CSV/dataframe and return the result, or return an error message
                 if 'FROM df' in decoded_query:
-                    query_df = ps.sqldf(decoded_query)
+                    count_rows(scanned=len(df))
+                    with timed_phase("sql"):
+                        query_df = work_pool.run(ps.sqldf, decoded_query, {"df": df})
                     del df
-                    return json.loads(query_df.to_json(orient="records")), 200
+                    return dataframe_response(query_df)
                 else:
                     return {"Message": str(
                         "API successfully reached but this CSV was not found in the SQL query."
@@ -229,9 +2712,11 @@ class CSV_sql(Resource):
 
 @ns_csv2api.route('/<filename>/search')
 class CSV_search(Resource):
-    @api.doc(responses={
+    @api.doc(params=query_params_doc, responses={
         200:'Success',
+        400:'API successfully reached but the query parameters were bad interpreted.',
         404:'API successfully reached but no filter or CSV were found.',
+        406:'API successfully reached but the asked format is not available.',
         405:'API successfully reached but this functionnality of the API / endpoint is disabled.'
     })
     @api.expect(general_query_dict_model, validate=False, required=False)
@@ -240,7 +2725,25 @@ class CSV_search(Resource):
             as a 'records" style oriented JSON."""
         if "search" in activated_endpoints:
             if os.path.isfile(home_directory + filename + ".csv"):
-                df = read_csv_by_chunks(home_directory + filename + ".csv", int(config["pandas_chunksize"]))
+                parameters = get_request_parameters()
+                if is_pushed_down_query(parameters) or is_out_of_core(filename):
+                    # Parse the URL with the header only, then apply all the filters during the scan
+                    dtypes = read_dataset_dtypes(filename)
+                    parser = reqparse.RequestParser()
+                    for c in dtypes.index:
+                        parser.add_argument(c, type=convert_pandas_dtypes_to_builtin_types(dtypes[c]))
+                    predicates = [(k, "eq", v) for k, v in parser.parse_args().items() if v != None]
+                    try:
+                        predicates += parse_query_predicates(parameters, dtypes)
+                        page = parse_query_page(parameters, dtypes)
+                    except Query_Error as error:
+                        return {"Message":"API successfully reached but the query parameters were bad interpreted. " + str(error)}, 400
+                    if not predicates:
+                        return {"Message":"API successfully reached but no filter (which at least filter some rows) was found. \
+                            Please add it or go to ./all_data to get the whole CSV."}, 404
+                    return query_response(filename, predicates, page)
+
+                df = load_dataset(filename)
 
                 #Parse the URL
                 parser = reqparse.RequestParser()
@@ -250,17 +2753,14 @@ class CSV_search(Resource):
     
                 #Retrieve the filters in the URL and query the DF
                 query_dict = parser.parse_args()
-                filtered_df = df.copy()
-                for k in query_dict.keys():
-                    if query_dict[k] != None:
-                        filtered_df = filtered_df[filtered_df[k] == query_dict[k]]
+                filtered_df = select_rows(filename, df, {k: v for k, v in query_dict.items() if v != None})
 
                 #Return the filtered DF or a success message if no filter has been sent
-                if filtered_df.equals(df):
+                if len(filtered_df) == len(df):
                     return {"Message":"API successfully reached but no filter (which at least filter some rows) was found. \
                         Please add it or go to ./all_data to get the whole CSV."}, 404
                 else:
-                    return json.loads(filtered_df.to_json(orient="records")), 200
+                    return dataframe_response(filtered_df)
 
             else:
                 return {"Message":API_error_no_CSV_found}, 404
@@ -268,6 +2768,46 @@ class CSV_search(Resource):
             return {"Message":API_error_endpoint_disabled}, 405
 
 
+@ns_csv2api.route('/<filename>/batch')
+class CSV_batch(Resource):
+    @api.doc(params={
+        'pretty': "optional, 'true' to indent the returned JSON",
+        'stream': "optional, 'ndjson' to stream one line per sub-query"},
+        responses={
+        200:'Success',
+        400:'API successfully reached but the batch of queries was bad interpreted.',
+        404:'API successfully reached but a CSV of the batch was not found.',
+        413:'API successfully reached but a CSV of the batch is too large to be loaded in memory.',
+        405:'API successfully reached but this functionnality of the API / endpoint is disabled.'
+    })
+    @api.expect(batch_query_model, validate=False, required=True)
+    def post(self, filename):
+        """REST POST : Run a batch of filter, search and aggregate sub-queries on one or several CSV files stored, \
+            and get their results keyed by sub-query."""
+        if "batch" in activated_endpoints:
+            try:
+                queries = parse_batch_queries(request.get_json(silent=True), filename)
+            except Query_Error as error:
+                return {"Message":"API successfully reached but the batch of queries was bad interpreted. " + str(error)}, 400
+
+            # Every file is loaded once for all the sub-queries on it
+            filenames = list(dict.fromkeys(query["file"] for query in queries.values()))
+            missing_filenames = [f for f in filenames if not os.path.isfile(home_directory + f + ".csv")]
+            if missing_filenames:
+                return {"Message":API_error_no_CSV_found + " Missing : " + ", ".join(missing_filenames)}, 404
+            datasets = {f: load_dataset(f) for f in filenames}
+            try:
+                for query_id, query in queries.items():
+                    check_batch_query(query_id, query, datasets[query["file"]])
+            except Query_Error as error:
+                return {"Message":"API successfully reached but the batch of queries was bad interpreted. " + str(error)}, 400
+
+            positions = work_pool.run(resolve_batch_rows, queries, datasets)
+            return batch_response(queries, datasets, positions)
+        else:
+            return {"Message":API_error_endpoint_disabled}, 405
+
+
 @ns_csv2api.route('/<filename>/csv_file_creation/<orient>')
 class CSV_file_creation(Resource):
     @api.doc(responses={
@@ -291,7 +2831,14 @@ class CSV_file_creation(Resource):
 
                 # Save results or return an error message
                 try:
-                    new_df.to_csv(home_directory + filename + ".csv", index = False)
+                    with File_Lock(filename, exclusive=True):
+                        if os.path.isfile(home_directory + filename + ".csv"):
+                            return {"Message":"API successfully reached but this CSV already exists. \
+                                Please try another endpoint with a NONE existing filename."}, 404
+                        write_csv_atomically(filename, new_df)
+                        dataset_cache.invalidate(filename)
+                        response_cache.invalidate(filename)
+                        dataset_catalog.update(filename)
                     return {"Message":"API successfully reached and the CSV was well created in the directory."}, 200
                 except:
                     return {"Message":"API successfully reached but an error occured while creating the file."}, 417
@@ -321,14 +2868,8 @@ class CSV_new_row(Resource):
         if "row_append" in activated_endpoints:
             if os.path.isfile(home_directory + filename + ".csv"):
 
-                # Original CSV file
-                df = read_csv_by_chunks(home_directory + filename + ".csv", int(config["pandas_chunksize"]))
-                if "0" in df.columns:
-                    df = df.drop("0", 1) # Delete the index_col created named "0"
-
                 # Transform input rows of the JSON body of the API REST query into dataframe
                 query_dict = request.get_json()
-                print(json.dumps(query_dict))
                 if orient == "records":
                     new_rows_df = pd.read_json(json.dumps(query_dict), orient=orient)
                 elif orient in ["split", "records", "index", "columns", "values"]:
@@ -336,19 +2877,20 @@ class CSV_new_row(Resource):
                 else:
                     new_rows_df = pd.read_json(json.dumps(query_dict), orient='index')
 
-                # Return 202 if row(s) well appended or 409 otherwise
-                print(df.head())
-                print(new_rows_df.head())
-                if list(df.columns) == list(new_rows_df.columns):
+                # Check the rows against the schema of the file (which is not loaded if not cached) and append them
+                def append_new_rows(df, changes):
                     try:
-                        updated_df = df.append(new_rows_df)
-                        updated_df.to_csv(home_directory + filename + ".csv", index = False)
-                        return {"Message":"API successfully reached and the CSV was well updated in the directory."}, 202
-                    except:
-                        return {"Message":"API successfully reached but an error occured while creating the file."}, 409
-                else:
-                    return {"Message":"API successfully reached but the JSON was bad interpreted. \
-                        Maybe change the orientin the URL like row_append/orient."}, 400
+                        rows_df = validate_rows_against_schema(new_rows_df, df.dtypes if df is not None else read_dataset_dtypes(filename))
+                    except (ValueError, TypeError):
+                        return df, ({"Message":"API successfully reached but the JSON was bad interpreted. \
+                            Maybe change the orientin the URL like row_append/orient."}, 400), None, False
+                    return df, ({"Message":"API successfully reached and the CSV was well updated in the directory."}, 202), rows_df, False
+
+                # Return 202 if row(s) well appended or 409 otherwise
+                try:
+                    return group_committer.submit(filename, Write_Operation(append_new_rows, needs_dataset=False))
+                except:
+                    return {"Message":"API successfully reached but an error occured while creating the file."}, 409
             else:
                 return {"Message":"API successfully reached but this CSV was not found. "}, 404
         else:
@@ -364,6 +2906,7 @@ class CSV_value_replace(Resource):
         },
         responses={
         202:'Success : API successfully reached and CSV file modified.',
+        400:'API successfully reached but the new value does not match the type of the column.',
         409:'API successfully reached but no update done.',
         404:'API successfully reached but this CSV was not found.',
         405:'API successfully reached but this functionnality of the API / endpoint is disabled.'
@@ -373,41 +2916,72 @@ class CSV_value_replace(Resource):
         """REST PUT : Replace some values filtered in a CSV file by other ones."""
         if "value_replace" in activated_endpoints:
             if os.path.isfile(home_directory + filename + ".csv"):
-                df = read_csv_by_chunks(home_directory + filename + ".csv", int(config["pandas_chunksize"]))
+                dtypes = read_dataset_dtypes(filename) if is_out_of_core(filename) else load_dataset(filename).dtypes
 
                 # Parse the URL
                 parser = reqparse.RequestParser()
                 parser.add_argument("_column_to_update_", required=True)
                 parser.add_argument("_new_value_to_set_", required=True)
-                for c in df.columns:
-                    t = convert_pandas_dtypes_to_builtin_types(df.dtypes[c])
+                for c in dtypes.index:
+                    t = convert_pandas_dtypes_to_builtin_types(dtypes[c])
                     parser.add_argument(c, type=t)
 
-                # Retrieve the filters in the URL and apply them
+                # Retrieve the filters in the URL and the new value, typed as its column
                 query_dict = parser.parse_args()
                 column_to_update = query_dict["_column_to_update_"]
-                new_value_to_set = query_dict["_new_value_to_set_"]
-                filtered_df = df.copy()
-                for k in query_dict.keys():
-                    if query_dict[k] != None and k not in ["_column_to_update_", "_new_value_to_set_"]:
-                        filtered_df = df[filtered_df[k] == query_dict[k]]
-
-                # Replace chosen/filtered values by new ones through a mapping
-                new_df = df.copy()
-                new_map_to_replace = {}
-                for i in filtered_df.index:
-                    print(i)
-                    new_map_to_replace[ new_df.loc[i][column_to_update] ] = new_value_to_set
-                new_df[column_to_update].replace(new_map_to_replace, inplace=True)
-                print(new_df)
-
-                # Return the 304 status if the values have been well replaced or 202 otherwise
-                if not new_df.equals(df):
-                    new_df.to_csv(home_directory + filename + ".csv", index = False)
-                    return {"Message":"API successfully reached and CSV file modified."}, 202
-                else:
-
+                filters = {k: v for k, v in query_dict.items() if v != None and k not in ["_column_to_update_", "_new_value_to_set_"]}
+                if column_to_update not in dtypes.index:
                     return {"Message":"API successfully reached but no update done."}, 409
+                try:
+                    column_type = convert_pandas_dtypes_to_builtin_types(dtypes[column_to_update])
+                    new_value_to_set = convert_query_value(query_dict["_new_value_to_set_"], column_type)
+                    if isinstance(new_value_to_set, float) and column_type == int:
+                        raise ValueError("The column '" + column_to_update + "' only accepts integers.")
+                except (TypeError, ValueError) as error:
+                    return {"Message":"API successfully reached but the new value does not match the type of the column. " + str(error)}, 400
+
+                # One combined mask of the filtered rows whose value really changes, then a single masked assignment
+                # on a copy of the dataframe : the cached one is only replaced by it once the file is written
+                def replace_values(df, changes):
+                    if column_to_update not in df.columns:
+                        return df, ({"Message":"API successfully reached but no update done."}, 409), None, False
+                    positions = match_positions(filename, df, filters)
+                    positions = positions[(df[column_to_update].to_numpy()[positions] != new_value_to_set)]
+                    if not len(positions):
+                        return df, ({"Message":"API successfully reached but no update done."}, 409), None, False
+                    # The new frame shares the other columns with the cached one : the updated column is deleted from a shallow copy
+                    # then inserted again, as assigning it would write into the shared block (pandas 1.1). Only this column is copied
+                    # in the frames read from a sidecar (a block per column), and its block in the ones read from the CSV file
+                    column_values = df[column_to_update].copy()
+                    column_values.iloc[positions] = new_value_to_set
+                    new_df = df.copy(deep=False)
+                    del new_df[column_to_update]
+                    new_df.insert(df.columns.get_loc(column_to_update), column_to_update, column_values)
+                    old_values, new_values = df[column_to_update].iloc[positions], column_values.iloc[positions]
+                    changes.update_statistics(lambda statistics: statistics.replace_values(column_to_update, old_values, new_values))
+                    changes.changed_columns.add(column_to_update)
+                    return new_df, ({"Message":"API successfully reached and CSV file modified.", "Affected_rows":int(len(positions))}, 202), None, True
+
+                # Same replacement on a file processed out-of-core, chunk by chunk
+                def replace_chunk_values(chunks, statistics):
+                    affected_rows = 0
+                    for chunk in chunks:
+                        if column_to_update in chunk.columns:
+                            mask = match_chunk(chunk, filters) & (chunk[column_to_update] != new_value_to_set).to_numpy()
+                            if mask.any():
+                                chunk = chunk.copy()
+                                old_values = chunk.loc[mask, column_to_update]
+                                chunk.loc[mask, column_to_update] = new_value_to_set
+                                if statistics is not None:
+                                    statistics.replace_values(column_to_update, old_values, chunk.loc[mask, column_to_update])
+                                affected_rows += int(mask.sum())
+                        yield chunk
+                    if not affected_rows:
+                        return ({"Message":"API successfully reached but no update done."}, 409), False
+                    return ({"Message":"API successfully reached and CSV file modified.", "Affected_rows":affected_rows}, 202), True
+
+                # Return the 409 status if no value has to be replaced or 202 otherwise
+                return group_committer.submit(filename, Write_Operation(replace_values, needs_dataset=True, apply_chunks=replace_chunk_values))
 
             else:
                 return {"Message":API_error_no_CSV_found}, 404
@@ -430,28 +3004,50 @@ class CSV_row_deletion(Resource):
         """REST DELETE : Delete some rows from the existing CSV file stored."""
         if "row_deletion" in activated_endpoints:
             if os.path.isfile(home_directory + filename + ".csv"):
-                df = read_csv_by_chunks(home_directory + filename + ".csv", int(config["pandas_chunksize"]))
-
+                dtypes = read_dataset_dtypes(filename) if is_out_of_core(filename) else load_dataset(filename).dtypes
 
                 # Parse the URL
                 parser = reqparse.RequestParser()
-                for c in df.columns:
-                    t = convert_pandas_dtypes_to_builtin_types(df.dtypes[c])
+                for c in dtypes.index:
+                    t = convert_pandas_dtypes_to_builtin_types(dtypes[c])
                     parser.add_argument(c, type=t)
+                query_dict = parser.parse_args()
 
                 # Retrieve the filters in the URL and query the DF
-                query_dict = parser.parse_args()
-                filtered_df = df.copy()
-                for k in query_dict.keys():
-                    if query_dict[k] != None:
-                        filtered_df = filtered_df[filtered_df[k] != query_dict[k]]
+                # A row is deleted as soon as it matches one of the filters
+                def delete_rows(df, changes):
+                    kept_rows = np.ones(len(df), dtype=bool)
+                    for k in query_dict.keys():
+                        if query_dict[k] != None and k in df.columns:
+                            kept_rows[match_positions(filename, df, {k: query_dict[k]})] = False
+                    if kept_rows.all():
+                        return df, ({"Message":"API successfully reached but CSV row(s) not found."}, 304), None, False
+                    filtered_df = df[kept_rows].reset_index(drop=True)
+                    removed_df = df[~kept_rows]
+                    changes.update_statistics(lambda statistics: statistics.remove_rows(removed_df))
+                    changes.keeps_positions = False
+                    return filtered_df, ({"Message":"API successfully reached and CSV row(s) deleted."}, 202), None, True
+
+                # Same deletion on a file processed out-of-core, chunk by chunk
+                def delete_chunk_rows(chunks, statistics):
+                    deleted_rows = 0
+                    for chunk in chunks:
+                        deleted = np.zeros(len(chunk), dtype=bool)
+                        for k in query_dict.keys():
+                            if query_dict[k] != None and k in chunk.columns:
+                                deleted |= (chunk[k] == query_dict[k]).to_numpy()
+                        if deleted.any():
+                            if statistics is not None:
+                                statistics.remove_rows(chunk[deleted])
+                            deleted_rows += int(deleted.sum())
+                            chunk = chunk[~deleted]
+                        yield chunk
+                    if not deleted_rows:
+                        return ({"Message":"API successfully reached but CSV row(s) not found."}, 304), False
+                    return ({"Message":"API successfully reached and CSV row(s) deleted."}, 202), True
 
                 # Return the 304 status if the row has been well removed or 202 if no row has been found
-                if filtered_df.equals(df):
-                    return {"Message":"API successfully reached but CSV row(s) not found."}, 304
-                else:
-                    filtered_df.to_csv(home_directory + filename + ".csv", index = False)
-                    return {"Message":"API successfully reached and CSV row(s) deleted."}, 202
+                return group_committer.submit(filename, Write_Operation(delete_rows, needs_dataset=True, apply_chunks=delete_chunk_rows))
 
             else:
                 return {"Message":API_error_no_CSV_found}, 404
@@ -470,20 +3066,30 @@ class CSV_column_deletion(Resource):
         """REST DELETE : Delete the column in the input URL from the stored CSV file."""
         if "column_deletion" in activated_endpoints:
             if os.path.isfile(home_directory + filename + ".csv"):
-                df = read_csv_by_chunks(home_directory + filename + ".csv", int(config["pandas_chunksize"]))
-
                 # Drop the input column in the URL
-                if column_name in list(df.columns):
-                    filtered_df = df.drop(str(column_name), axis=1)
-                else:
-                    filtered_df = df.copy()
+                def delete_column(df, changes):
+                    if column_name not in list(df.columns):
+                        return df, ({"Message":"API successfully reached but CSV column not found."}, 304), None, False
+                    filtered_df = df.drop(str(column_name), axis=1).reset_index(drop=True)
+                    changes.update_statistics(lambda statistics: statistics.drop_column(column_name))
+                    changes.changed_columns.add(column_name)
+                    return filtered_df, ({"Message":"API successfully reached and CSV column deleted."}, 202), None, True
+
+                def delete_chunk_column(chunks, statistics):
+                    is_found = False
+                    for chunk in chunks:
+                        if column_name in chunk.columns:
+                            is_found = True
+                            chunk = chunk.drop(str(column_name), axis=1)
+                        yield chunk
+                    if not is_found:
+                        return ({"Message":"API successfully reached but CSV column not found."}, 304), False
+                    if statistics is not None:
+                        statistics.drop_column(column_name)
+                    return ({"Message":"API successfully reached and CSV column deleted."}, 202), True
 
                 # Return the 304 status if the column has been well removed or 202 if no column has been found
-                if filtered_df.equals(df):
-                    return {"Message":"API successfully reached but CSV column not found."}, 304
-                else:
-                    filtered_df.to_csv(home_directory + filename + ".csv", index = False)
-                    return {"Message":"API successfully reached and CSV column deleted."}, 202
+                return group_committer.submit(filename, Write_Operation(delete_column, needs_dataset=True, apply_chunks=delete_chunk_column))
 
             else:
                 return {"Message":API_error_no_CSV_found}, 404
@@ -502,7 +3108,13 @@ class CSV_file_deletion(Resource):
         """REST DELETE : Delete from storage the whole CSV file in the input URL."""
         if "csv_file_deletion" in activated_endpoints:
             if os.path.isfile(home_directory + filename + ".csv"):
-                os.remove(home_directory + filename + ".csv")
+                with File_Lock(filename, exclusive=True):
+                    if os.path.isfile(home_directory + filename + ".csv"):
+                        os.remove(home_directory + filename + ".csv")
+                    dataset_cache.invalidate(filename)
+                    response_cache.invalidate(filename)
+                    dataset_catalog.update(filename)
+                    remove_sidecar(filename)
                 if os.path.isfile(home_directory + filename + ".csv"):
                     return {"Message":"API successfully reached but no CSV deleted."}, 409
                 else:
@@ -512,12 +3124,189 @@ class CSV_file_deletion(Resource):
         else:
             return {"Message":API_error_endpoint_disabled}, 405
 
-if __name__ == '__main__':
+# -----------------------------
+# Catalog of the data directory, warm-up and watcher
+# -----------------------------
+
+def read_csv_header(filename):
+    try:
+        return list(pd.read_csv(home_directory + filename + ".csv", nrows=0).columns)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError):
+        return []
+
+
+class Dataset_Catalog:
+    """Catalog of the CSV files of the data directory, built from a cheap scan (name, size, mtime and header only)
+    and refreshed by the watcher and the writes of the API. It counts the requests of each file, to warm up
+    the hottest ones first, and follows the progress of the warm-up."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.progress = {"ready": False, "running": False, "total": 0, "done": 0, "current": None, "errors": {}}
+
+    def scan(self):
+        """Scan the data directory. Return the CSV files added or changed since the last scan and the removed ones."""
+        versions = {}
+        for entry in os.scandir(home_directory):
+            if entry.name.endswith(".csv") and entry.is_file():
+                stat = entry.stat()
+                versions[entry.name[:-4]] = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            changed = sorted(f for f, version in versions.items() if f not in self.entries or self.entries[f]["version"] != version)
+            removed = sorted(f for f in self.entries if f not in versions)
+        for filename in changed + removed:
+            self.update(filename)
+        return changed, removed
+
+    def update(self, filename):
+        """Refresh the entry of a CSV file, or remove it if the file does not exist anymore."""
+        try:
+            stat = os.stat(home_directory + filename + ".csv")
+        except FileNotFoundError:
+            with self.lock:
+                self.entries.pop(filename, None)
+            return
+        header = read_csv_header(filename)
+        with self.lock:
+            requests = self.entries[filename]["requests"] if filename in self.entries else 0
+            self.entries[filename] = {"version": (stat.st_ino, stat.st_mtime_ns, stat.st_size), "size": stat.st_size,
+                "mtime": stat.st_mtime_ns, "columns": header, "requests": requests}
+
+    def touch(self, filename):
+        with self.lock:
+            if filename in self.entries:
+                self.entries[filename]["requests"] += 1
+
+    def warm_up_order(self, filenames):
+        """Order of the warm-up : the files of 'preload_datasets' in their configured order, then, if it has "*",
+        the other files from the most requested to the least, the smallest first among equals."""
+        configured = [f for f in config["preload_datasets"] if f in filenames]
+        if "*" not in config["preload_datasets"]:
+            return configured
+        with self.lock:
+            others = sorted((f for f in filenames if f not in configured and f in self.entries),
+                key=lambda f: (-self.entries[f]["requests"], self.entries[f]["size"]))
+        return configured + others
+
+    def describe(self):
+        with self.lock:
+            return [{"Filename": f, "Size_bytes": entry["size"],
+                "Modified": datetime.fromtimestamp(entry["mtime"] / 10 ** 9, tz=timezone.utc).isoformat(),
+                "Columns": entry["columns"], "Requests": entry["requests"], "Loaded": dataset_cache.is_fresh(f),
+                "Out_of_core": is_out_of_core(f)}
+                for f, entry in self.entries.items()]
+
+    def warm_up_progress(self):
+        with self.lock:
+            return dict(self.progress, errors=dict(self.progress["errors"]))
+
+
+def warm_up_datasets(filenames):
+    """Convert the given CSV files into sidecars if they are missing or stale, then load the ones to warm up
+    (see Dataset_Catalog.warm_up_order) into the cache, updating the progress reported by the readiness endpoint."""
+    preloaded = dataset_catalog.warm_up_order(filenames)
+    filenames = preloaded + [f for f in filenames if f not in preloaded]
+    with dataset_catalog.lock:
+        dataset_catalog.progress.update({"running": True, "total": len(filenames), "done": 0, "current": None, "errors": {}})
+    for filename in filenames:
+        with dataset_catalog.lock:
+            dataset_catalog.progress["current"] = filename
+        try:
+            if not os.path.isfile(home_directory + filename + ".csv"):
+                pass
+            elif is_out_of_core(filename):
+                pass # Never loaded nor converted : its queries read the CSV file chunk by chunk
+            elif filename in preloaded:
+                dataset_cache.get(filename, lambda complete_path: read_dataset(filename))
+            elif open_fresh_sidecar(filename) is None:
+                build_sidecar(filename)
+        except Exception as error:
+            with dataset_catalog.lock:
+                dataset_catalog.progress["errors"][filename] = str(error)
+        with dataset_catalog.lock:
+            dataset_catalog.progress["done"] += 1
+    with dataset_catalog.lock:
+        dataset_catalog.progress.update({"ready": True, "running": False, "current": None})
+
+
+def refresh_catalog():
+    """Refresh the catalog and drop the cached dataframes, responses and sidecars of the CSV files added,
+    replaced or removed outside the API. They are not warmed up again : a write of another worker of the production
+    server looks like an outside change, so the changed files are only loaded again by the next request needing them."""
+    changed, removed = dataset_catalog.scan()
+    for filename in removed:
+        dataset_cache.invalidate(filename)
+        response_cache.invalidate(filename)
+        remove_sidecar(filename)
+
+    # The files written through the API are still fresh in the cache
+    changed = [f for f in changed if not dataset_cache.is_fresh(f)]
+    for filename in changed:
+        dataset_cache.invalidate(filename)
+        response_cache.invalidate(filename)
+
+
+def watch_data_directory():
+    """Watcher of the data directory, run in a background thread : the catalog is refreshed on every inotify event
+    (if inotify_simple is installed) or else every 'watch_interval_seconds'."""
+    interval = float(config["watch_interval_seconds"])
+    inotify = None
+    if inotify_simple is not None:
+        inotify = inotify_simple.INotify()
+        watched_events = inotify_simple.flags
+        inotify.add_watch(home_directory, watched_events.CLOSE_WRITE | watched_events.MOVED_TO | watched_events.MOVED_FROM
+            | watched_events.CREATE | watched_events.DELETE)
+    while True:
+        if inotify is not None:
+            inotify.read(timeout=int(interval * 1000), read_delay=100)
+        else:
+            time.sleep(interval)
+        try:
+            refresh_catalog()
+        except Exception as error:
+            app.logger.exception(error)
+
+
+def start_background_tasks():
+    """Start the background warm-up (if 'background_warm_up') and the watcher of the data directory (if 'watch_data_directory').
+    Called in each worker of the pre-fork server (see config/gunicorn.conf.py), after the fork."""
+    if config["background_warm_up"] and not dataset_catalog.progress["ready"]:
+        threading.Thread(target=warm_up_datasets, args=(list(dataset_catalog.entries),), name="csv2api-warm-up", daemon=True).start()
+    if config["watch_data_directory"]:
+        threading.Thread(target=watch_data_directory, name="csv2api-watcher", daemon=True).start()
+
+
+def create_app(config_path='./config/config.json'):
+    """Application factory : load the config, scan the data directory into the catalog and, unless it is done
+    in the background, convert the CSV files into sidecars and preload the configured datasets. Return the Flask app.
+    It is what WSGI servers import, e.g. gunicorn "csv2api:create_app()"."""
+    global config, activated_endpoints, cipher_key, dataset_cache, group_committer, work_pool, parallel_scanner, response_cache, dataset_catalog
 
     # Load input config parameters
-    config = json.load(open('./config/config.json',))
+    config = json.load(open(config_path,))
     activated_endpoints = config["activated_endpoints"]
     cipher_key = config["cipher_key"]
+    dataset_cache = Dataset_Cache(config["dataset_cache_max_memory_mb"])
+    group_committer = Group_Committer(config["group_commit_window_ms"])
+    work_pool = Work_Pool(config["work_pool_threads"], config["work_pool_max_queue"])
+    parallel_scanner = Parallel_Scanner(config["scan_workers"], config["parallel_scan_min_mb"])
+    response_cache = Response_Cache(config["response_cache_max_memory_mb"])
+    dataset_catalog = Dataset_Catalog()
+    dataset_catalog.scan()
+    if not config["background_warm_up"]:
+        warm_up_datasets(list(dataset_catalog.entries))
+
+    # Not kept in the master process of the pre-fork server : each of its workers starts its own scan processes
+    parallel_scanner.shutdown()
+    return app
+
+
+if __name__ == '__main__':
+
+    # Development server, see config/gunicorn.conf.py for the multi-worker production one
+    create_app()
+    start_background_tasks()
 
     # Example of encryption / decryption of sql query that can be put in an URL
     # encoded = base64.urlsafe_b64encode("""SELECT * FROM my_csv WHERE attribute = 'A' """.encode()).decode()
@@ -0,0 +1,67 @@
+"""Fixtures of the behavior tests : each test runs the app on its own copy of ./data and ./config in a temporary
+directory (the API reads them relatively to the working directory), with the settings of config.json it needs."""
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+REPOSITORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPOSITORY)
+
+import csv2api
+
+
+@pytest.fixture
+def work_directory(tmp_path, monkeypatch):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "config").mkdir()
+    shutil.copyfile(os.path.join(REPOSITORY, "data", "tunisian_pop.csv"), tmp_path / "data" / "tunisian_pop.csv")
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    if getattr(csv2api, "parallel_scanner", None) is not None:
+        csv2api.parallel_scanner.shutdown()
+
+
+@pytest.fixture
+def make_client(work_directory):
+    """Return a function creating the app with some settings of config.json overridden, and returning its test client."""
+    def make(**settings):
+        config = json.load(open(os.path.join(REPOSITORY, "config", "config.json")))
+        config.update(settings)
+        json.dump(config, open("config/config.json", "w"), indent=4)
+        # The SQL engine is created on the first query of the process, with the settings of that time
+        csv2api.sql_engine = None
+        return csv2api.create_app("./config/config.json").test_client()
+    return make
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client()
+
+
+@pytest.fixture
+def write_dataset(work_directory):
+    """Return a function writing a synthetic CSV file of the given number of rows into ./data, shaped like
+    tunisian_pop.csv plus a float column with missing values and a unique string column. Return its dataframe."""
+    def write(filename, rows, seed=0):
+        rng = np.random.default_rng(seed)
+        density = rng.lognormal(5, 1.5, rows).round(2)
+        density[rng.random(rows) < 0.05] = np.nan
+        df = pd.DataFrame({
+            "code_municipalite": np.arange(rows) + 1000,
+            "nom_municipalite_ar": np.char.add("Municipalite ", rng.integers(0, max(rows // 20, 1), rows).astype(str)),
+            "code_gouvernorat": rng.integers(11, 20, rows),
+            "population_annee": rng.integers(2014, 2025, rows),
+            "population_valeur": rng.integers(1000, 1000000, rows),
+            "densite": density,
+            "identifiant": np.char.add("id", np.arange(rows).astype(str)),
+        })
+        df.to_csv(work_directory / "data" / (filename + ".csv"), index=False)
+        return df
+    return write
+
@@ -0,0 +1,57 @@
+import json
+
+import pandas as pd
+
+
+def test_sub_queries_return_the_answers_of_the_single_endpoints(client):
+    queries = {
+        "tunis": {"type": "filter", "column": "code_gouvernorat", "value": 11},
+        "ariana_2020": {"type": "search", "filters": {"code_gouvernorat": 12, "population_annee": 2020}, "fields": ["code_municipalite"], "limit": 3},
+        "absent": {"type": "filter", "column": "code_gouvernorat", "value": 99},
+        "fractional": {"type": "filter", "column": "code_gouvernorat", "value": 11.5},
+        "population": {"type": "aggregate", "function": "sum", "column": "population_valeur", "group_by": "nom_gouvernorat_ar"},
+        "count": {"type": "aggregate"},
+    }
+
+    results = client.post("/csv2api/tunisian_pop/batch", json={"queries": queries}).get_json()
+
+    df = pd.read_csv("data/tunisian_pop.csv")
+    assert results["tunis"] == client.get("/csv2api/tunisian_pop/filter/code_gouvernorat/11").get_json()
+    ariana = df[(df["code_gouvernorat"] == 12) & (df["population_annee"] == 2020)]
+    assert results["ariana_2020"] == ariana[["code_municipalite"]].head(3).to_dict(orient="records")
+    assert results["absent"] == [] and results["fractional"] == []
+    population = df.groupby("nom_gouvernorat_ar")["population_valeur"].sum()
+    assert {row["nom_gouvernorat_ar"]: row["population_valeur"] for row in results["population"]} == population.to_dict()
+    assert results["count"] == [{"count": 350}]
+
+
+def test_many_keys_of_a_column_are_resolved_together(client):
+    codes = pd.read_csv("data/tunisian_pop.csv")["code_municipalite"].tolist()
+    queries = [{"type": "filter", "column": "code_municipalite", "value": code} for code in codes[:100] + [1, 2]]
+
+    results = client.post("/csv2api/tunisian_pop/batch", json={"queries": queries}).get_json()
+
+    assert [len(results[str(i)]) for i in range(102)] == [1] * 100 + [0, 0]
+    assert all(results[str(i)][0]["code_municipalite"] == code for i, code in enumerate(codes[:100]))
+
+
+def test_sub_queries_on_several_files_and_streamed(client, write_dataset):
+    df = write_dataset("synthetic", 500)
+    queries = [{"type": "aggregate", "function": "nunique", "column": "nom_gouvernorat_ar"},
+        {"file": "synthetic", "type": "aggregate", "function": "max", "column": "population_valeur", "filters": {"code_gouvernorat": 13}}]
+
+    lines = client.post("/csv2api/tunisian_pop/batch?stream=ndjson", json={"queries": queries}).get_data(as_text=True).splitlines()
+
+    assert [json.loads(line) for line in lines] == [{"query": "0", "result": [{"nunique": 24}]},
+        {"query": "1", "result": [{"max": int(df.loc[df["code_gouvernorat"] == 13, "population_valeur"].max())}]}]
+
+
+def test_bad_batches_are_refused(make_client):
+    client = make_client(batch_max_queries=2)
+    filter_query = {"type": "filter", "column": "code_gouvernorat", "value": 11}
+
+    assert client.post("/csv2api/tunisian_pop/batch", json={"queries": []}).status_code == 400
+    assert client.post("/csv2api/tunisian_pop/batch", json={"queries": [filter_query] * 3}).status_code == 400
+    assert client.post("/csv2api/tunisian_pop/batch", json={"queries": [{"type": "delete"}]}).status_code == 400
+    assert client.post("/csv2api/tunisian_pop/batch", json={"queries": [dict(filter_query, column="unknown")]}).status_code == 400
+    assert client.post("/csv2api/tunisian_pop/batch", json={"queries": [dict(filter_query, file="unknown")]}).status_code == 404
@@ -0,0 +1,84 @@
+import os
+
+import pandas as pd
+
+import csv2api
+
+
+def catalog(client):
+    return {entry["Filename"]: entry for entry in client.get("/csv2api/catalog").get_json()}
+
+
+def test_catalog_lists_the_files_without_loading_them(make_client, write_dataset):
+    write_dataset("synthetic", 100)
+    client = make_client(preload_datasets=["tunisian_pop"])
+
+    entries = catalog(client)
+
+    assert sorted(entries) == ["synthetic", "tunisian_pop"]
+    assert entries["synthetic"]["Size_bytes"] == os.path.getsize("data/synthetic.csv")
+    assert entries["synthetic"]["Columns"] == list(pd.read_csv("data/synthetic.csv", nrows=0).columns)
+    assert entries["tunisian_pop"]["Loaded"] and not entries["synthetic"]["Loaded"]
+
+
+def test_background_warm_up_reports_its_progress(make_client, write_dataset):
+    write_dataset("synthetic", 100)
+    client = make_client(background_warm_up=True, preload_datasets=["*"])
+
+    ready = client.get("/csv2api/ready")
+    assert ready.status_code == 503 and not ready.get_json()["Ready"]
+    assert client.get("/csv2api/health").status_code == 200
+
+    csv2api.warm_up_datasets(list(csv2api.dataset_catalog.entries))
+
+    ready = client.get("/csv2api/ready")
+    assert ready.status_code == 200
+    assert ready.get_json()["Warm_up"]["done"] == ready.get_json()["Warm_up"]["total"] == 2
+    assert all(entry["Loaded"] for entry in catalog(client).values())
+
+
+def test_most_requested_files_are_warmed_up_first(make_client, write_dataset):
+    write_dataset("large", 300)
+    write_dataset("small", 100)
+    client = make_client(background_warm_up=True, preload_datasets=["tunisian_pop", "*"])
+    assert csv2api.dataset_catalog.warm_up_order(["large", "small", "tunisian_pop"]) == ["tunisian_pop", "small", "large"]
+
+    client.get("/csv2api/large/header")
+
+    assert csv2api.dataset_catalog.warm_up_order(["large", "small", "tunisian_pop"]) == ["tunisian_pop", "large", "small"]
+    assert catalog(client)["large"]["Requests"] == 1
+
+
+def test_refresh_follows_the_files_changed_outside_the_api(client, write_dataset):
+    write_dataset("synthetic", 100)
+    assert "synthetic" not in catalog(client)
+    csv2api.refresh_catalog()
+    assert not catalog(client)["synthetic"]["Loaded"]
+    assert len(client.get("/csv2api/synthetic/all_data").get_json()) == 100
+    assert catalog(client)["synthetic"]["Loaded"]
+
+    df = write_dataset("synthetic", 200, seed=1)
+    os.remove("data/tunisian_pop.csv")
+    csv2api.refresh_catalog()
+
+    assert sorted(catalog(client)) == ["synthetic"]
+    assert catalog(client)["synthetic"]["Size_bytes"] == os.path.getsize("data/synthetic.csv")
+    assert len(client.get("/csv2api/synthetic/all_data").get_json()) == len(df)
+    assert client.get("/csv2api/synthetic/summary_stats").get_json()["population_valeur"]["max"] == df["population_valeur"].max()
+
+
+def test_refresh_does_not_load_the_changed_files_again(client, monkeypatch):
+    assert client.put("/csv2api/tunisian_pop/row_append/records", json=[{"code_municipalite": 9999, "nom_municipalite_ar": "Nouvelle",
+        "code_gouvernorat": 99, "nom_gouvernorat_ar": "Nouveau", "population_annee": 2020, "population_valeur": 5}]).status_code == 202
+    # As seen by another worker, whose catalog and cached dataframe are the ones before the write
+    csv2api.dataset_cache.invalidate("tunisian_pop")
+    csv2api.dataset_catalog.entries["tunisian_pop"]["version"] = None
+    loads = []
+    read_dataset = csv2api.read_dataset
+    monkeypatch.setattr(csv2api, "read_dataset", lambda filename: loads.append(filename) or read_dataset(filename))
+
+    csv2api.refresh_catalog()
+
+    assert loads == []
+    assert len(client.get("/csv2api/tunisian_pop/filter/code_gouvernorat/99").get_json()) == 1
+    assert loads == ["tunisian_pop"]
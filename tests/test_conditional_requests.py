@@ -0,0 +1,68 @@
+import base64
+
+import csv2api
+
+
+def test_matching_etag_gets_a_304_until_the_file_changes(client):
+    response = client.get("/csv2api/tunisian_pop/summary_stats")
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache" and "Accept" in response.headers["Vary"]
+
+    not_modified = client.get("/csv2api/tunisian_pop/summary_stats", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.get_data() == b""
+
+    client.put("/csv2api/tunisian_pop/value_replace?_column_to_update_=population_valeur&_new_value_to_set_=7&code_gouvernorat=12")
+    modified = client.get("/csv2api/tunisian_pop/summary_stats", headers={"If-None-Match": etag})
+    assert modified.status_code == 200 and modified.headers["ETag"] != etag
+    assert modified.get_json() != response.get_json()
+
+
+def test_if_modified_since_gets_a_304(client):
+    last_modified = client.get("/csv2api/tunisian_pop/header").headers["Last-Modified"]
+
+    assert client.get("/csv2api/tunisian_pop/header", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/csv2api/tunisian_pop/header", headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}).status_code == 200
+
+
+def test_etag_depends_on_the_url_and_the_format(client):
+    urls = ["/csv2api/tunisian_pop/filter/code_gouvernorat/11", "/csv2api/tunisian_pop/filter/code_gouvernorat/12"]
+    json_etags = [client.get(url).headers["ETag"] for url in urls]
+    csv_etags = [client.get(url, headers={"Accept": "text/csv"}).headers["ETag"] for url in urls]
+
+    assert len(set(json_etags + csv_etags)) == 4
+    assert client.get(urls[0], headers={"Accept": "text/csv", "If-None-Match": json_etags[0]}).status_code == 200
+    assert client.get(urls[0], headers={"Accept": "text/csv", "If-None-Match": csv_etags[0]}).status_code == 304
+
+
+def test_responses_are_served_from_the_cache_until_the_file_is_written(client):
+    first = client.get("/csv2api/tunisian_pop/value_counts")
+    second = client.get("/csv2api/tunisian_pop/value_counts")
+    assert second.get_data() == first.get_data()
+    assert csv2api.response_cache.stats()["hits"] == 1
+
+    client.put("/csv2api/tunisian_pop/row_append/records", json=[{"code_municipalite": 9999, "nom_municipalite_ar": "Nouvelle",
+        "code_gouvernorat": 99, "nom_gouvernorat_ar": "Nouveau", "population_annee": 2020, "population_valeur": 5}])
+    third = client.get("/csv2api/tunisian_pop/value_counts")
+    assert third.get_json()["code_gouvernorat"][0]["99"] == 1
+    assert csv2api.response_cache.stats()["hits"] == 1
+
+
+def test_sql_etag_follows_every_queried_file(client, write_dataset):
+    write_dataset("synthetic", 100)
+    query = base64.urlsafe_b64encode(b"SELECT count(*) AS n FROM synthetic, tunisian_pop").decode()
+    etag = client.get("/csv2api/tunisian_pop/sql?query=" + query).headers["ETag"]
+    assert client.get("/csv2api/tunisian_pop/sql?query=" + query, headers={"If-None-Match": etag}).status_code == 304
+
+    write_dataset("synthetic", 200)
+
+    response = client.get("/csv2api/tunisian_pop/sql?query=" + query, headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.get_json() == [{"n": 200 * 350}]
+
+
+def test_sql_queries_differing_within_a_literal_are_not_mixed_up(client):
+    queries = [base64.urlsafe_b64encode(query.encode()).decode() for query in ["SELECT 'a  b' AS x FROM tunisian_pop LIMIT 1", "SELECT 'a b' AS x FROM tunisian_pop LIMIT 1"]]
+
+    responses = [client.get("/csv2api/tunisian_pop/sql?query=" + query) for query in queries]
+
+    assert [response.get_json() for response in responses] == [[{"x": "a  b"}], [{"x": "a b"}]]
+    assert responses[0].headers["ETag"] != responses[1].headers["ETag"]
@@ -0,0 +1,69 @@
+import os
+
+import pandas as pd
+
+import csv2api
+
+
+def test_cached_and_uncached_answers_are_the_same(make_client):
+    client = make_client(preload_datasets=[], response_cache_max_memory_mb=0)
+    expected = pd.read_csv("data/tunisian_pop.csv")
+
+    uncached = client.get("/csv2api/tunisian_pop/all_data").get_json()
+    cached = client.get("/csv2api/tunisian_pop/all_data").get_json()
+
+    assert uncached == cached == expected.to_dict(orient="records")
+    stats = client.get("/csv2api/cache_stats").get_json()
+    assert (stats["misses"], stats["hits"]) == (1, 1)
+    assert stats["entries"] == ["tunisian_pop"]
+
+
+def test_file_changed_outside_the_api_is_reloaded(make_client):
+    client = make_client(response_cache_max_memory_mb=0)
+    assert client.get("/csv2api/tunisian_pop/filter/code_gouvernorat/99").get_json() == []
+
+    with open("data/tunisian_pop.csv", "a") as csv_file:
+        csv_file.write("9999,Nouvelle,99,Nouveau,2020,5\n")
+
+    rows = client.get("/csv2api/tunisian_pop/filter/code_gouvernorat/99").get_json()
+    assert rows == [{"code_municipalite": 9999, "nom_municipalite_ar": "Nouvelle", "code_gouvernorat": 99,
+        "nom_gouvernorat_ar": "Nouveau", "population_annee": 2020, "population_valeur": 5}]
+
+
+def test_least_recently_used_datasets_are_evicted(client, write_dataset):
+    for filename in ["first", "second", "third"]:
+        write_dataset(filename, 1000)
+    cache = csv2api.Dataset_Cache(1)
+    load = lambda complete_path: pd.read_csv(complete_path)
+    memory = int(load("data/first.csv").memory_usage(index=True, deep=True).sum())
+    cache.max_memory = 2 * memory + memory // 2
+
+    cache.get("first", load)
+    cache.get("second", load)
+    cache.get("first", load)
+    cache.get("third", load)
+
+    assert list(cache.entries) == ["first", "third"]
+    assert cache.evictions == 1
+    assert cache.memory_used <= cache.max_memory
+
+
+def test_dataset_larger_than_the_budget_is_served_but_not_cached(client, write_dataset):
+    df = write_dataset("large", 1000)
+    cache = csv2api.Dataset_Cache(1)
+    cache.max_memory = 1000
+
+    loaded = cache.get("large", lambda complete_path: pd.read_csv(complete_path))
+
+    pd.testing.assert_frame_equal(loaded, df)
+    assert cache.entries == {} and cache.memory_used == 0
+
+
+def test_deleted_file_is_dropped_from_the_cache(client):
+    assert client.get("/csv2api/cache_stats").get_json()["entries"] == ["tunisian_pop"]
+
+    assert client.delete("/csv2api/tunisian_pop/csv_file_deletion").status_code == 200
+
+    assert not os.path.exists("data/tunisian_pop.csv")
+    assert client.get("/csv2api/cache_stats").get_json()["entries"] == []
+    assert client.get("/csv2api/tunisian_pop/all_data").status_code == 404
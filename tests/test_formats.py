@@ -0,0 +1,68 @@
+import gzip
+import io
+
+import pandas as pd
+import pytest
+
+
+FILTER_URL = "/csv2api/tunisian_pop/filter/code_gouvernorat/11"
+
+
+def expected_rows():
+    df = pd.read_csv("data/tunisian_pop.csv")
+    return df[df["code_gouvernorat"] == 11].reset_index(drop=True)
+
+
+def test_csv_is_negotiated_with_the_url_or_the_accept_header(client):
+    by_url = client.get(FILTER_URL + "?format=csv")
+    by_header = client.get(FILTER_URL, headers={"Accept": "text/csv"})
+
+    assert by_url.mimetype == by_header.mimetype == "text/csv"
+    assert by_url.get_data() == by_header.get_data()
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(by_url.get_data())), expected_rows())
+
+
+def test_arrow_and_parquet_responses(client):
+    pa = pytest.importorskip("pyarrow")
+
+    arrow = client.get(FILTER_URL, headers={"Accept": "application/vnd.apache.arrow.stream"})
+    parquet = client.get(FILTER_URL + "?format=parquet")
+
+    pd.testing.assert_frame_equal(pa.ipc.open_stream(arrow.get_data()).read_pandas(), expected_rows())
+    pd.testing.assert_frame_equal(pd.read_parquet(io.BytesIO(parquet.get_data())), expected_rows())
+
+
+def test_msgpack_response(client):
+    msgpack = pytest.importorskip("msgpack")
+
+    response = client.get(FILTER_URL + "?format=msgpack")
+
+    assert response.mimetype == "application/x-msgpack"
+    assert msgpack.unpackb(response.get_data()) == expected_rows().to_dict(orient="list")
+
+
+def test_unknown_format_is_refused(client):
+    assert client.get(FILTER_URL + "?format=xml").status_code == 406
+    assert client.get(FILTER_URL, headers={"Accept": "application/xml"}).mimetype == "application/json"
+
+
+def test_large_responses_are_compressed(client):
+    plain = client.get("/csv2api/tunisian_pop/all_data")
+    compressed = client.get("/csv2api/tunisian_pop/all_data", headers={"Accept-Encoding": "gzip"})
+    small = client.get("/csv2api/tunisian_pop/header", headers={"Accept-Encoding": "gzip"})
+
+    assert compressed.headers["Content-Encoding"] == "gzip" and "Accept-Encoding" in compressed.headers["Vary"]
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert len(compressed.get_data()) < len(plain.get_data()) // 3
+    assert "Content-Encoding" not in small.headers
+    assert compressed.headers["ETag"].startswith("W/")
+
+
+def test_streamed_responses_are_compressed_chunk_by_chunk(client):
+    zstandard = pytest.importorskip("zstandard")
+    plain = client.get("/csv2api/tunisian_pop/all_data?stream=ndjson").get_data()
+
+    compressed = client.get("/csv2api/tunisian_pop/all_data?stream=ndjson", headers={"Accept-Encoding": "zstd, gzip"})
+
+    assert compressed.headers["Content-Encoding"] == "zstd"
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(compressed.get_data()) == plain
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+import csv2api
+
+
+def test_index_lookups_match_the_comparisons(write_dataset):
+    df = write_dataset("synthetic", 2000)
+
+    for column, value in [("code_gouvernorat", 13), ("nom_municipalite_ar", "Municipalite 7"), ("densite", df["densite"].iloc[5])]:
+        index = csv2api.Column_Index(df[column])
+        np.testing.assert_array_equal(index.lookup(value), np.flatnonzero((df[column] == value).to_numpy()))
+    assert len(csv2api.Column_Index(df["code_gouvernorat"]).lookup(99)) == 0
+    assert len(csv2api.Column_Index(df["nom_municipalite_ar"]).lookup("Absente")) == 0
+    # NaN is equal to no value, as in the comparisons
+    assert df["densite"].isna().any() and len(csv2api.Column_Index(df["densite"]).lookup(np.nan)) == 0
+
+
+def test_appended_rows_are_indexed(write_dataset):
+    df = write_dataset("synthetic", 2000)
+    new_rows = write_dataset("new_rows", 500, seed=1)
+    all_rows = pd.concat([df, new_rows], ignore_index=True)
+
+    for column, value in [("code_gouvernorat", 13), ("nom_municipalite_ar", "Municipalite 7")]:
+        index = csv2api.Column_Index(df[column])
+        index.append(new_rows[column], len(df))
+        np.testing.assert_array_equal(index.lookup(value), np.flatnonzero((all_rows[column] == value).to_numpy()))
+
+
+def test_indexed_and_unindexed_queries_return_the_same_rows(make_client):
+    urls = ["/csv2api/tunisian_pop/filter/code_gouvernorat/11", "/csv2api/tunisian_pop/filter/nom_gouvernorat_ar/Tunis",
+        "/csv2api/tunisian_pop/search?code_gouvernorat=12&population_annee=2020&nom_gouvernorat_ar=Ariana"]
+    unindexed_client = make_client(indexed_columns={}, response_cache_max_memory_mb=0)
+    unindexed = [unindexed_client.get(url).get_json() if "filter" in url else unindexed_client.post(url).get_json() for url in urls]
+
+    client = make_client(response_cache_max_memory_mb=0)
+    indexed = [client.get(url).get_json() if "filter" in url else client.post(url).get_json() for url in urls]
+
+    assert indexed == unindexed
+    assert all(indexed)
+    assert set(csv2api.dataset_cache.entries["tunisian_pop"]["indexes"]) == {"code_gouvernorat", "nom_gouvernorat_ar", "population_annee"}
+
+
+def test_indexed_queries_stay_right_after_a_row_deletion(client):
+    assert client.delete("/csv2api/tunisian_pop/row_deletion?code_gouvernorat=11").status_code == 202
+
+    assert client.get("/csv2api/tunisian_pop/filter/code_gouvernorat/11").get_json() == []
+    expected = pd.read_csv("data/tunisian_pop.csv")
+    rows = client.get("/csv2api/tunisian_pop/filter/code_gouvernorat/12").get_json()
+    assert rows == expected[expected["code_gouvernorat"] == 12].to_dict(orient="records")
+
+
+def test_indexed_and_unindexed_nan_queries_match_no_row(make_client, write_dataset):
+    df = write_dataset("synthetic", 2000)
+    results = []
+    for indexed_columns in [{}, {"synthetic": ["densite"]}]:
+        client = make_client(indexed_columns=indexed_columns, response_cache_max_memory_mb=0)
+        results.append((client.get("/csv2api/synthetic/filter/densite/nan").get_json(),
+            client.delete("/csv2api/synthetic/row_deletion?densite=nan").status_code))
+
+    assert results == [([], 304), ([], 304)]
+    assert len(pd.read_csv("data/synthetic.csv")) == len(df)
@@ -0,0 +1,60 @@
+import argparse
+import importlib.util
+import os
+
+import pandas as pd
+import pytest
+
+import csv2api
+from conftest import REPOSITORY
+
+
+@pytest.fixture
+def load_test(monkeypatch):
+    spec = importlib.util.spec_from_file_location("load_test", os.path.join(REPOSITORY, "benchmarks", "load_test.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setitem(module.SIZES, "2k", 2000)
+    return module
+
+
+def test_generated_csv_is_reproducible_chunk_by_chunk(load_test, tmp_path, monkeypatch):
+    load_test.generate_csv(str(tmp_path / "whole.csv"), 2500, seed=3)
+    monkeypatch.setattr(load_test, "GENERATION_CHUNK_ROWS", 1000)
+    load_test.generate_csv(str(tmp_path / "chunked.csv"), 2500, seed=3)
+
+    whole = pd.read_csv(tmp_path / "whole.csv")
+    source = pd.read_csv(load_test.SOURCE_CSV)
+    assert len(whole) == 2500 and list(whole.columns[:6]) == list(source.columns)
+    assert set(whole["code_gouvernorat"]) <= set(source["code_gouvernorat"])
+    assert whole["densite"].isna().any() and whole["est_urbaine"].dtype == bool
+    assert len(pd.read_csv(tmp_path / "chunked.csv")) == 2500
+
+
+def test_every_scenario_succeeds_through_the_test_client(load_test, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    work_directory, _ = load_test.prepare_work_directory(str(tmp_path), "2k", 0, response_cache=False)
+    args = argparse.Namespace(requests=2, heavy_requests=1)
+    results = {}
+    csv2api.sql_engine = None
+
+    load_test.run_client(work_directory, args, results)
+    csv2api.parallel_scanner.shutdown()
+
+    scenarios = results["client"]["scenarios"]
+    assert sorted(scenarios) == sorted(load_test.scenarios())
+    assert {name: report["errors"] for name, report in scenarios.items() if report["errors"]} == {}
+    heavy = {name for name, (_, is_heavy) in load_test.scenarios().items() if is_heavy}
+    assert all(report["requests"] == (1 if name in heavy else 2) for name, report in scenarios.items())
+
+
+def test_regressions_against_a_baseline(load_test):
+    def report(p95_ms, throughput_rps, peak_rss_mb):
+        return {"results": {"2k": {"client": {"scenarios": {"filter": {"p95_ms": p95_ms, "throughput_rps": throughput_rps, "peak_rss_mb": peak_rss_mb}}}}}}
+    baseline = report(10.0, 100.0, 200.0)
+
+    assert load_test.compare_reports(baseline, report(11.0, 90.0, 220.0), 0.2) == []
+    regressions = load_test.compare_reports(baseline, report(15.0, 70.0, 200.0), 0.2)
+    assert [(regression["metric"], regression["change"]) for regression in regressions] == [("p95_ms", 0.5), ("throughput_rps", -0.3)]
+    # Latencies below 1 ms are too noisy to be compared
+    assert load_test.compare_reports(report(0.2, 100.0, 200.0), report(0.8, 100.0, 200.0), 0.2) == []
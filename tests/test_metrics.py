@@ -0,0 +1,77 @@
+import csv2api
+
+
+FILTER_URL = "/csv2api/tunisian_pop/filter/code_gouvernorat/11"
+
+
+def scrape(client):
+    """Return the samples of /metrics as a dict, e.g. {'csv2api_requests_total{endpoint="...",...}': 1.0}."""
+    response = client.get("/metrics")
+    assert response.status_code == 200 and response.mimetype == "text/plain"
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def sample(samples, name, *label_parts):
+    """Value of the sample of the given metric whose labels contain all the given parts, 0 if it is not exposed yet."""
+    matches = [value for key, value in samples.items() if key.split("{")[0] == name and all(part in key for part in label_parts)]
+    assert len(matches) <= 1, (name, label_parts)
+    return matches[0] if matches else 0.0
+
+
+def test_requests_rows_and_caches_are_counted(make_client):
+    client = make_client(response_cache_max_memory_mb=0)
+    endpoint = 'endpoint="/csv2api/<filename>/filter/<queried_column>/<queried_value>"'
+    before = scrape(client)
+
+    for _ in range(3):
+        client.get(FILTER_URL)
+    client.get("/csv2api/unknown/filter/code_gouvernorat/11")
+
+    after = scrape(client)
+    def delta(name, *label_parts):
+        return sample(after, name, *label_parts) - sample(before, name, *label_parts)
+    rows = len(client.get(FILTER_URL).get_json())
+    assert delta("csv2api_requests_total", endpoint, 'status="200"') == 3
+    assert delta("csv2api_requests_total", endpoint, 'status="404"') == 1
+    assert delta("csv2api_request_duration_seconds_count", endpoint) == 4
+    assert sample(after, "csv2api_request_duration_seconds_bucket", endpoint, 'le="+Inf"') \
+        == sample(after, "csv2api_request_duration_seconds_count", endpoint)
+    assert delta("csv2api_rows_returned_total", endpoint) == 3 * rows
+    assert sample(after, "csv2api_dataset_cache_hits") == csv2api.dataset_cache.stats()["hits"] - 1
+    assert sample(after, "csv2api_catalog_files") == 1
+    assert sample(after, "csv2api_warm_up_files", 'state="done"') == sample(after, "csv2api_warm_up_files", 'state="total"') == 1
+
+
+def test_phases_are_reported_when_profiling_is_enabled(make_client):
+    disabled = make_client().get(FILTER_URL, headers={"X-Profile": "phases"})
+    assert "Server-Timing" not in disabled.headers
+
+    client = make_client(profiling_enabled=True, response_cache_max_memory_mb=0)
+    response = client.get(FILTER_URL, headers={"X-Profile": "phases"})
+
+    phases = dict(timing.split(";dur=") for timing in response.headers["Server-Timing"].split(", "))
+    assert {"filter", "serialization", "total"} <= set(phases)
+    assert all(float(duration) <= float(phases["total"]) for duration in phases.values())
+    rows = len(response.get_json())
+    assert response.headers["X-Profile-Rows"] == "scanned=350;returned=%d" % rows
+
+
+def test_cprofile_replaces_the_response_by_the_statistics(make_client):
+    client = make_client(profiling_enabled=True, response_cache_max_memory_mb=0)
+
+    response = client.get(FILTER_URL, headers={"X-Profile": "cprofile"})
+
+    assert response.status_code == 200 and response.mimetype == "text/plain"
+    assert "function calls" in response.get_data(as_text=True) and "cumulative" in response.get_data(as_text=True)
+    assert "Server-Timing" in response.headers
+
+
+def test_metrics_endpoint_can_be_disabled(make_client):
+    client = make_client(activated_endpoints=["all_data"])
+
+    assert client.get("/metrics").status_code == 405
@@ -0,0 +1,107 @@
+import base64
+import json
+
+import pandas as pd
+import pytest
+
+import csv2api
+
+
+READS = [
+    ("GET", "/csv2api/synthetic/all_data"),
+    ("GET", "/csv2api/synthetic/all_data?stream=ndjson"),
+    ("GET", "/csv2api/synthetic/header"),
+    ("GET", "/csv2api/synthetic/filter/code_gouvernorat/12"),
+    ("GET", "/csv2api/synthetic/filter/nom_municipalite_ar/Municipalite%203?fields=code_municipalite,densite"),
+    ("GET", "/csv2api/synthetic/filter/population_annee/2020?limit=50&offset=20"),
+    ("POST", "/csv2api/synthetic/search?code_gouvernorat__in=11,15&densite__lt=300&fields=code_municipalite,densite"),
+    ("POST", "/csv2api/synthetic/search?identifiant=id2999"),
+    ("GET", "/csv2api/synthetic/sql?query=" + base64.urlsafe_b64encode(b"SELECT code_gouvernorat, count(*) AS n, "
+        b"sum(population_valeur) AS population, max(densite) AS densite FROM synthetic GROUP BY 1 ORDER BY 1").decode()),
+]
+
+
+def make_mode_client(make_client, out_of_core):
+    """Client of the app with synthetic.csv processed in memory, or out-of-core by chunks of 700 rows."""
+    client = make_client(preload_datasets=[], response_cache_max_memory_mb=0, out_of_core_chunksize=700,
+        out_of_core_min_mb=0.0001 if out_of_core else 1024)
+    assert csv2api.is_out_of_core("synthetic") == out_of_core
+    return client
+
+
+def body(response):
+    assert response.status_code == 200
+    if response.mimetype == "application/x-ndjson":
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    return json.loads(response.get_data(as_text=True))
+
+
+def test_in_core_and_out_of_core_reads_are_the_same(make_client, write_dataset):
+    df = write_dataset("synthetic", 3000)
+
+    in_core = [body(make_mode_client(make_client, False).open(url, method=method)) for method, url in READS]
+    out_of_core = [body(make_mode_client(make_client, True).open(url, method=method)) for method, url in READS]
+
+    assert len(in_core[0]) == len(df) and len(in_core[3]) == (df["code_gouvernorat"] == 12).sum()
+    assert in_core[7] == [json.loads(df.iloc[[2999]].to_json(orient="records"))[0]]
+    for (method, url), expected, result in zip(READS, in_core, out_of_core):
+        assert result == expected, url
+
+
+def test_in_core_and_out_of_core_statistics_are_the_same(make_client, write_dataset):
+    write_dataset("synthetic", 3000)
+
+    results = []
+    for out_of_core in [False, True]:
+        client = make_mode_client(make_client, out_of_core)
+        results.append((body(client.get("/csv2api/synthetic/summary_stats")), body(client.get("/csv2api/synthetic/value_counts"))))
+
+    (in_core_summary, in_core_counts), (out_of_core_summary, out_of_core_counts) = results
+    pd.testing.assert_frame_equal(pd.DataFrame(out_of_core_summary), pd.DataFrame(in_core_summary), check_exact=False)
+    assert out_of_core_counts == in_core_counts
+
+
+@pytest.mark.parametrize("out_of_core", [False, True], ids=["in_core", "out_of_core"])
+def test_writes_give_the_same_file(make_client, write_dataset, out_of_core):
+    df = write_dataset("synthetic", 3000)
+    client = make_mode_client(make_client, out_of_core)
+    appended = [{"code_municipalite": 9000 + i, "nom_municipalite_ar": "Nouvelle", "code_gouvernorat": 20, "population_annee": 2024,
+        "population_valeur": i, "densite": 1.5, "identifiant": "new%d" % i} for i in range(3)]
+
+    assert client.put("/csv2api/synthetic/value_replace?_column_to_update_=population_valeur&_new_value_to_set_=7&code_gouvernorat=12").status_code == 202
+    assert client.delete("/csv2api/synthetic/row_deletion?code_gouvernorat=13").status_code == 202
+    assert client.delete("/csv2api/synthetic/row_deletion?code_gouvernorat=99").status_code == 304
+    assert client.put("/csv2api/synthetic/row_append/records", json=appended[:2]).status_code == 202
+    assert client.put("/csv2api/synthetic/row_append/records", json=appended[2:]).status_code == 202
+    assert client.delete("/csv2api/synthetic/column_deletion/densite").status_code == 202
+
+    expected = df.copy()
+    expected.loc[expected["code_gouvernorat"] == 12, "population_valeur"] = 7
+    expected = pd.concat([expected[expected["code_gouvernorat"] != 13], pd.DataFrame(appended)], ignore_index=True)
+    expected = expected.drop(columns="densite")
+    pd.testing.assert_frame_equal(pd.read_csv("data/synthetic.csv"), expected)
+    assert len(body(client.get("/csv2api/synthetic/filter/code_gouvernorat/20"))) == 3
+
+
+def test_appends_to_an_out_of_core_file_update_its_statistics(make_client, write_dataset):
+    df = write_dataset("synthetic", 3000)
+    client = make_mode_client(make_client, True)
+    assert body(client.get("/csv2api/synthetic/summary_stats"))["population_valeur"]["count"] == len(df)
+
+    response = client.put("/csv2api/synthetic/row_append/records", json=[{"code_municipalite": 9000, "nom_municipalite_ar": "Nouvelle",
+        "code_gouvernorat": 20, "population_annee": 2024, "population_valeur": 2000000, "densite": 1.5, "identifiant": "new"}])
+
+    assert response.status_code == 202
+    summary = body(client.get("/csv2api/synthetic/summary_stats"))
+    assert summary["population_valeur"]["count"] == len(df) + 1 and summary["population_valeur"]["max"] == 2000000
+    assert len(pd.read_csv("data/synthetic.csv")) == len(df) + 1
+
+
+def test_endpoints_loading_the_whole_file_are_refused(make_client, write_dataset):
+    write_dataset("synthetic", 3000)
+    client = make_mode_client(make_client, True)
+
+    response = client.post("/csv2api/synthetic/batch", json={"queries": [{"type": "filter", "column": "code_gouvernorat", "value": 11}]})
+
+    assert response.status_code == 413
+    assert not csv2api.dataset_cache.is_fresh("synthetic")
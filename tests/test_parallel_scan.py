@@ -0,0 +1,57 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+
+import csv2api
+
+
+def records(df):
+    return json.loads(df.to_json(orient="records"))
+
+
+def test_byte_ranges_start_at_line_boundaries_and_cover_the_file(write_dataset):
+    df = write_dataset("synthetic", 3000)
+
+    header, ranges = csv2api.split_csv_byte_ranges("data/synthetic.csv", 7)
+
+    content = open("data/synthetic.csv", "rb").read()
+    assert header == content[:len(header)] and ranges[0][0] == len(header) and ranges[-1][1] == len(content)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    assert all(content[start - 1:start] == b"\n" for start, _ in ranges)
+    parts = [pd.read_csv(io.BytesIO(header + content[start:end])) for start, end in ranges]
+    pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True), df)
+
+
+@pytest.fixture(params=[1, 3])
+def scan_workers(request, make_client, write_dataset):
+    """A synthetic CSV file, not cached nor converted into a sidecar, scanned sequentially or by 3 worker processes."""
+    df = write_dataset("synthetic", 5000)
+    client = make_client(preload_datasets=[], scan_workers=request.param, parallel_scan_min_mb=0.01, response_cache_max_memory_mb=0)
+    csv2api.remove_sidecar("synthetic")
+    assert csv2api.is_scanned_in_parallel("synthetic") == (request.param > 1)
+    return client, df
+
+
+def test_parallel_and_sequential_scans_return_the_same_rows(scan_workers):
+    client, df = scan_workers
+
+    rows = client.post("/csv2api/synthetic/search?code_gouvernorat__in=11,15&densite__lt=300&fields=code_municipalite,densite").get_json()
+    assert rows == records(df.loc[df["code_gouvernorat"].isin([11, 15]) & (df["densite"] < 300), ["code_municipalite", "densite"]])
+
+    cursor = csv2api.base64.urlsafe_b64encode(b"2500").decode()
+    rows = client.get("/csv2api/synthetic/filter/population_annee/2020?cursor=" + cursor + "&stream=ndjson").get_data(as_text=True)
+    expected = df.iloc[2500:]
+    assert [json.loads(line) for line in rows.splitlines()] == records(expected[expected["population_annee"] == 2020])
+
+
+def test_parallel_and_sequential_statistics_are_the_same(scan_workers):
+    client, df = scan_workers
+
+    summary = pd.DataFrame(client.get("/csv2api/synthetic/summary_stats").get_json())
+    value_counts = client.get("/csv2api/synthetic/value_counts").get_json()
+
+    pd.testing.assert_frame_equal(summary, df.describe(), check_dtype=False)
+    assert value_counts["nom_municipalite_ar"][0] == json.loads(df["nom_municipalite_ar"].value_counts().to_json())
+    assert sum(value_counts["code_gouvernorat"][0].values()) == len(df)
@@ -0,0 +1,63 @@
+import json
+
+import pandas as pd
+import pytest
+
+import csv2api
+
+
+def records(df):
+    return json.loads(df.to_json(orient="records"))
+
+
+@pytest.fixture(params=["cached", "sidecar", "csv"])
+def source(request, make_client, write_dataset):
+    """A synthetic dataset queried from its cached dataframe, from its sidecar, or from its CSV file chunk by chunk."""
+    df = write_dataset("synthetic", 2000)
+    client = make_client(preload_datasets=["synthetic"] if request.param == "cached" else [], response_cache_max_memory_mb=0)
+    if request.param == "csv":
+        csv2api.remove_sidecar("synthetic")
+    yield client, df
+    assert csv2api.dataset_cache.is_fresh("synthetic") == (request.param == "cached")
+
+
+def test_predicates_projection_and_pagination(source):
+    client, df = source
+
+    rows = client.get("/csv2api/synthetic/filter/code_gouvernorat/13?fields=code_municipalite,densite&limit=50&offset=10").get_json()
+    assert rows == records(df.loc[df["code_gouvernorat"] == 13, ["code_municipalite", "densite"]].iloc[10:60])
+
+    rows = client.post("/csv2api/synthetic/search?population_valeur__between=100000,500000&code_gouvernorat__in=11,12&densite__gt=100").get_json()
+    expected = df[df["population_valeur"].between(100000, 500000) & df["code_gouvernorat"].isin([11, 12]) & (df["densite"] > 100)]
+    assert rows == records(expected)
+
+    rows = client.post("/csv2api/synthetic/search", json={"nom_municipalite_ar__prefix": "Municipalite 1", "population_annee__ne": 2020,
+        "fields": ["nom_municipalite_ar"]}).get_json()
+    assert rows == records(df.loc[df["nom_municipalite_ar"].str.startswith("Municipalite 1") & (df["population_annee"] != 2020), ["nom_municipalite_ar"]])
+
+
+def test_cursor_pagination_returns_every_row_once(source):
+    client, df = source
+    pages = []
+    url = "/csv2api/synthetic/filter/code_gouvernorat/14?limit=70"
+    cursor = ""
+    while cursor is not None:
+        response = client.get(url + ("&cursor=" + cursor if cursor else ""))
+        pages += response.get_json()
+        cursor = response.headers.get("X-Next-Cursor")
+
+    assert pages == records(df[df["code_gouvernorat"] == 14])
+
+
+def test_streamed_query_returns_the_same_rows(source):
+    client, df = source
+
+    body = client.post("/csv2api/synthetic/search?code_gouvernorat__lte=12&fields=identifiant&stream=ndjson").get_data(as_text=True)
+
+    assert [json.loads(line) for line in body.splitlines()] == records(df.loc[df["code_gouvernorat"] <= 12, ["identifiant"]])
+
+
+def test_bad_queries_are_rejected(client):
+    assert client.post("/csv2api/tunisian_pop/search?unknown__eq=1").status_code == 400
+    assert client.post("/csv2api/tunisian_pop/search?code_gouvernorat__between=1").status_code == 400
+    assert client.get("/csv2api/tunisian_pop/filter/code_gouvernorat/11?limit=-1").status_code == 400
@@ -0,0 +1,59 @@
+import json
+import os
+
+import pandas as pd
+
+import csv2api
+
+NEW_ROWS = [{"code_municipalite": 9998, "nom_municipalite_ar": "Nouvelle", "code_gouvernorat": 99, "nom_gouvernorat_ar": "Nouveau",
+    "population_annee": 2020, "population_valeur": 5},
+    {"code_municipalite": 9999, "nom_municipalite_ar": "Autre", "code_gouvernorat": 11, "nom_gouvernorat_ar": "Tunis",
+    "population_annee": 2021, "population_valeur": 7}]
+
+
+def test_rows_are_appended_at_the_end_of_the_file(client):
+    original = open("data/tunisian_pop.csv").read()
+    inode = os.stat("data/tunisian_pop.csv").st_ino
+
+    assert client.put("/csv2api/tunisian_pop/row_append/records", json=NEW_ROWS).status_code == 202
+
+    assert os.stat("data/tunisian_pop.csv").st_ino == inode
+    content = open("data/tunisian_pop.csv").read()
+    assert content.startswith(original)
+    assert content[len(original):] == "9998,Nouvelle,99,Nouveau,2020,5\n9999,Autre,11,Tunis,2021,7\n"
+
+
+def test_cached_answers_after_appends_are_the_ones_of_the_file(client):
+    client.get("/csv2api/tunisian_pop/summary_stats")
+    client.get("/csv2api/tunisian_pop/value_counts")
+    for row in NEW_ROWS:
+        assert client.put("/csv2api/tunisian_pop/row_append/records", json=[row]).status_code == 202
+    assert csv2api.dataset_cache.is_fresh("tunisian_pop")
+
+    df = pd.read_csv("data/tunisian_pop.csv")
+    assert client.get("/csv2api/tunisian_pop/all_data").get_json() == json.loads(df.to_json(orient="records"))
+    assert client.get("/csv2api/tunisian_pop/filter/code_gouvernorat/11").get_json() == json.loads(df[df["code_gouvernorat"] == 11].to_json(orient="records"))
+    assert client.get("/csv2api/tunisian_pop/summary_stats").get_json() == json.loads(df.describe().to_json(orient="columns"))
+    value_counts = client.get("/csv2api/tunisian_pop/value_counts").get_json()
+    assert value_counts["nom_gouvernorat_ar"][0] == json.loads(df["nom_gouvernorat_ar"].value_counts().to_json())
+
+
+def test_append_to_a_file_which_is_not_cached(make_client):
+    client = make_client(preload_datasets=[])
+
+    assert client.put("/csv2api/tunisian_pop/row_append/records", json=NEW_ROWS).status_code == 202
+
+    assert not csv2api.dataset_cache.is_fresh("tunisian_pop")
+    assert pd.read_csv("data/tunisian_pop.csv").tail(2).to_dict(orient="records") == NEW_ROWS
+
+
+def test_rows_not_matching_the_schema_are_refused(client):
+    original = open("data/tunisian_pop.csv").read()
+    missing_column = [{k: v for k, v in NEW_ROWS[0].items() if k != "population_valeur"}]
+    not_an_integer = [dict(NEW_ROWS[0], population_valeur="beaucoup")]
+
+    assert client.put("/csv2api/tunisian_pop/row_append/records", json=missing_column).status_code == 400
+    assert client.put("/csv2api/tunisian_pop/row_append/records", json=not_an_integer).status_code == 400
+
+    assert open("data/tunisian_pop.csv").read() == original
+    assert len(client.get("/csv2api/tunisian_pop/all_data").get_json()) == 350
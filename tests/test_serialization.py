@@ -0,0 +1,29 @@
+import json
+
+import pandas as pd
+
+
+def test_records_are_written_as_pandas_writes_them(client, write_dataset):
+    df = write_dataset("synthetic", 200)
+
+    response = client.get("/csv2api/synthetic/all_data")
+
+    assert response.get_data(as_text=True) == df.to_json(orient="records")
+    assert any(record["densite"] is None for record in response.get_json())
+
+
+def test_pretty_response_has_the_same_content(client):
+    compact = client.get("/csv2api/tunisian_pop/summary_stats").get_data(as_text=True)
+    pretty = client.get("/csv2api/tunisian_pop/summary_stats?pretty=true").get_data(as_text=True)
+
+    assert "\n" not in compact and "\n" in pretty
+    assert json.loads(compact) == json.loads(pretty)
+    assert json.loads(compact) == json.loads(pd.read_csv("data/tunisian_pop.csv").describe().to_json(orient="columns"))
+
+
+def test_header_is_a_compact_json_object(client):
+    response = client.get("/csv2api/tunisian_pop/header")
+
+    assert response.mimetype == "application/json"
+    assert response.get_data(as_text=True) == ('{"code_municipalite":"int64","nom_municipalite_ar":"object","code_gouvernorat":"int64",'
+        '"nom_gouvernorat_ar":"object","population_annee":"int64","population_valeur":"int64"}')
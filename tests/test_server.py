@@ -0,0 +1,64 @@
+import json
+import os
+import runpy
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+import csv2api
+
+REPOSITORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+GUNICORN_CONFIG = os.path.join(REPOSITORY, "config", "gunicorn.conf.py")
+
+
+def free_port():
+    with socket.socket() as listening_socket:
+        listening_socket.bind(("127.0.0.1", 0))
+        return listening_socket.getsockname()[1]
+
+
+def test_create_app_preloads_the_datasets(make_client):
+    client = make_client()
+
+    assert csv2api.dataset_cache.is_fresh("tunisian_pop")
+    assert client.get("/csv2api/ready").status_code == 200
+
+
+def test_server_settings_are_read_from_the_config(make_client):
+    make_client(server_bind="127.0.0.1:5050", server_workers=0, server_threads=2, server_timeout_seconds=30)
+
+    settings = runpy.run_path(GUNICORN_CONFIG)
+
+    assert settings["bind"] == "127.0.0.1:5050"
+    assert settings["workers"] == os.cpu_count()
+    assert (settings["threads"], settings["timeout"], settings["worker_class"]) == (2, 30, "gthread")
+    assert settings["preload_app"]
+
+
+def test_production_server_serves_the_api(make_client):
+    pytest.importorskip("gunicorn")
+    port = free_port()
+    make_client(server_bind="127.0.0.1:%d" % port, server_workers=2, watch_data_directory=False)
+    environment = dict(os.environ, PYTHONPATH=REPOSITORY)
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", GUNICORN_CONFIG, "csv2api:create_app()"], env=environment,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                header = json.load(urllib.request.urlopen("http://127.0.0.1:%d/csv2api/tunisian_pop/header" % port, timeout=5))
+                break
+            except OSError:
+                assert server.poll() is None and time.time() < deadline
+                time.sleep(0.2)
+        assert header["code_gouvernorat"] == "int64"
+        for _ in range(10):
+            rows = json.load(urllib.request.urlopen("http://127.0.0.1:%d/csv2api/tunisian_pop/filter/code_gouvernorat/11" % port, timeout=5))
+            assert len(rows) == 8
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
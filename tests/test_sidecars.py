@@ -0,0 +1,44 @@
+import os
+
+import pandas as pd
+
+import csv2api
+
+
+def test_sidecar_is_built_at_warm_up_and_loaded_instead_of_the_csv(client):
+    assert os.path.isfile("data/.sidecars/tunisian_pop.arrow")
+    assert csv2api.open_fresh_sidecar("tunisian_pop") is not None
+
+    pd.testing.assert_frame_equal(csv2api.read_dataset("tunisian_pop"), pd.read_csv("data/tunisian_pop.csv"))
+
+
+def test_stale_sidecar_is_rebuilt(client):
+    with open("data/tunisian_pop.csv", "a") as csv_file:
+        csv_file.write("9999,Nouvelle,99,Nouveau,2020,5\n")
+
+    assert csv2api.open_fresh_sidecar("tunisian_pop") is None
+    df = csv2api.read_dataset("tunisian_pop")
+
+    pd.testing.assert_frame_equal(df, pd.read_csv("data/tunisian_pop.csv"))
+    assert csv2api.open_fresh_sidecar("tunisian_pop") is not None
+
+
+def test_corrupted_sidecar_is_ignored(client):
+    with open("data/.sidecars/tunisian_pop.arrow", "wb") as sidecar:
+        sidecar.write(b"not an arrow file")
+
+    assert csv2api.open_fresh_sidecar("tunisian_pop") is None
+    pd.testing.assert_frame_equal(csv2api.read_dataset("tunisian_pop"), pd.read_csv("data/tunisian_pop.csv"))
+
+
+def test_answers_from_the_sidecar_and_from_the_csv_are_the_same(make_client, write_dataset):
+    write_dataset("synthetic", 1000)
+    client = make_client(preload_datasets=[], response_cache_max_memory_mb=0)
+    csv2api.remove_sidecar("synthetic")
+    from_csv = client.get("/csv2api/synthetic/filter/code_gouvernorat/12").get_json()
+
+    csv2api.dataset_cache.invalidate("synthetic")
+    assert csv2api.open_fresh_sidecar("synthetic") is not None
+    from_sidecar = client.get("/csv2api/synthetic/filter/code_gouvernorat/12").get_json()
+
+    assert from_csv == from_sidecar
@@ -0,0 +1,72 @@
+import base64
+
+import pandas as pd
+
+import csv2api
+
+
+def sql_url(filename, query):
+    return "/csv2api/" + filename + "/sql?query=" + base64.urlsafe_b64encode(query.encode()).decode()
+
+
+def test_query_result_is_the_one_of_pandas(client):
+    df = pd.read_csv("data/tunisian_pop.csv")
+    query = ("SELECT nom_gouvernorat_ar, sum(population_valeur) AS population FROM tunisian_pop "
+        "GROUP BY nom_gouvernorat_ar ORDER BY population DESC")
+
+    rows = client.get(sql_url("tunisian_pop", query)).get_json()
+
+    expected = df.groupby("nom_gouvernorat_ar", as_index=False)["population_valeur"].sum().sort_values("population_valeur", ascending=False)
+    assert rows == [{"nom_gouvernorat_ar": name, "population": population} for name, population in expected.itertuples(index=False)]
+
+
+def test_duckdb_and_pandasql_return_the_same_rows(client, monkeypatch):
+    query = "SELECT code_municipalite, population_valeur FROM tunisian_pop WHERE code_gouvernorat = 12 ORDER BY code_municipalite"
+    with_duckdb = client.get(sql_url("tunisian_pop", query)).get_json()
+
+    monkeypatch.setattr(csv2api, "duckdb", None)
+    with_pandasql = client.get(sql_url("tunisian_pop", query + " ")).get_json()
+
+    assert with_duckdb == with_pandasql and with_duckdb
+
+
+def test_table_names_are_case_insensitive(client):
+    rows = client.get(sql_url("tunisian_pop", "select count(*) as n from TUNISIAN_POP")).get_json()
+
+    assert rows == [{"n": 350}]
+
+
+def test_stored_files_can_be_joined(client, write_dataset):
+    write_dataset("synthetic", 100)
+    query = ("SELECT count(*) AS n FROM synthetic s JOIN (SELECT DISTINCT code_gouvernorat FROM tunisian_pop) t "
+        "ON s.code_gouvernorat = t.code_gouvernorat")
+
+    rows = client.get(sql_url("tunisian_pop", query)).get_json()
+
+    synthetic = pd.read_csv("data/synthetic.csv")
+    assert rows == [{"n": int(synthetic["code_gouvernorat"].isin(pd.read_csv("data/tunisian_pop.csv")["code_gouvernorat"]).sum())}]
+
+
+def test_rows_are_truncated_to_the_limit(make_client):
+    client = make_client(sql_max_rows=10)
+
+    response = client.get(sql_url("tunisian_pop", "SELECT * FROM tunisian_pop"))
+
+    assert len(response.get_json()) == 10
+    assert response.headers["X-Row-Limit-Reached"] == "10"
+
+
+def test_long_query_is_stopped(make_client):
+    client = make_client(sql_timeout_seconds=0.2)
+
+    response = client.get(sql_url("tunisian_pop", "SELECT count(*) FROM tunisian_pop, range(100000000) a, range(100) b"))
+
+    assert response.status_code == 408
+
+
+def test_bad_queries_are_refused(client):
+    assert client.get(sql_url("tunisian_pop", "SELECT * FROM unknown_table")).status_code == 404
+    assert client.get(sql_url("tunisian_pop", "SELECT unknown_column FROM tunisian_pop")).status_code == 400
+    assert client.get(sql_url("tunisian_pop", "SELECT * FROM read_csv_auto('data/tunisian_pop.csv'), tunisian_pop")).status_code == 400
+    assert client.get(sql_url("tunisian_pop", "DELETE FROM tunisian_pop")).status_code == 400
+    assert client.get(sql_url("tunisian_pop", "SELECT count(*) AS n FROM tunisian_pop")).get_json() == [{"n": 350}]
@@ -0,0 +1,129 @@
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+import csv2api
+
+
+def describe(df):
+    return json.loads(df.describe().to_json(orient="columns"))
+
+
+def test_statistics_follow_the_writes(client):
+    assert client.get("/csv2api/tunisian_pop/summary_stats").get_json() == describe(pd.read_csv("data/tunisian_pop.csv"))
+    client.get("/csv2api/tunisian_pop/value_counts")
+
+    assert client.delete("/csv2api/tunisian_pop/row_deletion?code_gouvernorat=11").status_code == 202
+    assert client.put("/csv2api/tunisian_pop/value_replace?_column_to_update_=population_valeur&_new_value_to_set_=7&code_gouvernorat=12").status_code == 202
+    assert client.delete("/csv2api/tunisian_pop/column_deletion/population_annee").status_code == 202
+
+    df = pd.read_csv("data/tunisian_pop.csv")
+    summary = pd.DataFrame(client.get("/csv2api/tunisian_pop/summary_stats").get_json())
+    pd.testing.assert_frame_equal(summary, df.describe(), check_dtype=False)
+    value_counts = client.get("/csv2api/tunisian_pop/value_counts")
+    assert "X-Approximate-Counts" not in value_counts.headers
+    assert {column: counts[0] for column, counts in value_counts.get_json().items()} == \
+        {column: json.loads(df[column].value_counts().to_json()) for column in df.columns}
+
+
+def test_merged_statistics_are_the_ones_of_the_whole_column(write_dataset, client):
+    df = write_dataset("synthetic", 3000)
+    statistics = csv2api.Dataset_Statistics(df.iloc[:1000])
+    statistics.merge(csv2api.Dataset_Statistics(df.iloc[1000:]))
+
+    summary = statistics.summary()
+    expected = df.describe()
+    pd.testing.assert_frame_equal(summary[expected.columns].loc[["count", "mean", "std", "min", "max"]],
+        expected.loc[["count", "mean", "std", "min", "max"]])
+    assert statistics.columns["nom_municipalite_ar"].value_counts().to_dict() == df["nom_municipalite_ar"].value_counts().to_dict()
+
+
+def test_counts_of_high_cardinality_columns_are_bounded(make_client, write_dataset):
+    df = write_dataset("synthetic", 20000)
+    # Half of the rows share 4 values, the other half are unique
+    df["nom_municipalite_ar"] = np.where(np.arange(len(df)) % 2 == 0, np.array(["a", "b", "c", "d"])[np.arange(len(df)) % 8 // 2], df["identifiant"])
+    df.to_csv("data/synthetic.csv", index=False)
+    client = make_client(value_counts_max_exact_distinct=1000, value_counts_top_k=10)
+
+    response = client.get("/csv2api/synthetic/value_counts")
+
+    errors = dict(item.split(";max_error=") for item in response.headers["X-Approximate-Counts"].split(", "))
+    assert {"identifiant", "nom_municipalite_ar"} <= set(errors)
+    counts = response.get_json()["nom_municipalite_ar"][0]
+    error = int(errors["nom_municipalite_ar"])
+    assert error <= len(df) // 1001
+    assert list(counts)[:4] == ["a", "b", "c", "d"]
+    for value, count in counts.items():
+        assert 0 <= (df["nom_municipalite_ar"] == value).sum() - count <= error
+    # The top-k of a column of unique values is still returned
+    identifiants = response.get_json()["identifiant"][0]
+    assert len(identifiants) == 10
+    assert all(0 <= (df["identifiant"] == value).sum() - count <= int(errors["identifiant"]) for value, count in identifiants.items())
+
+
+def test_counts_of_mostly_distinct_columns_are_not_emptied(make_client):
+    client = make_client(value_counts_max_exact_distinct=100, value_counts_top_k=5)
+    df = pd.read_csv("data/tunisian_pop.csv")
+
+    counts = client.get("/csv2api/tunisian_pop/value_counts").get_json()["code_municipalite"][0]
+
+    expected = df["code_municipalite"].value_counts()
+    assert len(counts) == 5
+    assert all(count == expected[int(value)] for value, count in counts.items())
+
+
+def test_unique_of_high_cardinality_columns_is_estimated(make_client, write_dataset):
+    df = write_dataset("synthetic", 20000)
+    df = df.astype({"code_gouvernorat": str})
+    client = make_client(value_counts_max_exact_distinct=1000)
+    statistics = csv2api.Dataset_Statistics(df)
+
+    unique = statistics.columns["identifiant"].describe()["unique"]
+
+    assert abs(unique - len(df)) < 0.05 * len(df)
+    assert statistics.columns["code_gouvernorat"].describe()["unique"] == df["code_gouvernorat"].nunique()
+    assert statistics.approximate_columns(["identifiant", "code_gouvernorat"]) == "identifiant;max_error=%d" % statistics.columns["identifiant"].error
+
+
+def test_stale_columns_are_computed_again_outside_the_cache_lock(client, monkeypatch):
+    client.get("/csv2api/tunisian_pop/summary_stats")
+    smallest = pd.read_csv("data/tunisian_pop.csv")["population_valeur"].min()
+    assert client.delete("/csv2api/tunisian_pop/row_deletion?population_valeur=%d" % smallest).status_code == 202
+    lock_is_free = []
+    compute_columns = csv2api.Dataset_Statistics.compute_columns
+
+    def try_lock():
+        acquired = csv2api.dataset_cache.lock.acquire(timeout=1)
+        if acquired:
+            csv2api.dataset_cache.lock.release()
+        lock_is_free.append(acquired)
+
+    def observed_compute_columns(df, columns):
+        # Taken from another thread, as the lock of the cache is reentrant
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+        return compute_columns(df, columns)
+    monkeypatch.setattr(csv2api.Dataset_Statistics, "compute_columns", staticmethod(observed_compute_columns))
+
+    summary = pd.DataFrame(client.get("/csv2api/tunisian_pop/summary_stats").get_json())
+
+    assert lock_is_free == [True]
+    pd.testing.assert_frame_equal(summary, pd.read_csv("data/tunisian_pop.csv").describe(), check_dtype=False)
+    statistics = csv2api.dataset_cache.get_statistics("tunisian_pop", csv2api.load_dataset("tunisian_pop"))
+    assert not any(column.is_stale for column in statistics.columns.values())
+
+
+def test_sampled_quantiles_are_reported(make_client, write_dataset):
+    df = write_dataset("synthetic", 3000)
+    client = make_client(statistics_sample_size=1000)
+
+    sampled = client.get("/csv2api/synthetic/summary_stats")
+    exact = client.get("/csv2api/tunisian_pop/summary_stats")
+
+    columns = df.select_dtypes(include="number").columns
+    assert sampled.headers["X-Approximate-Quantiles"] == ", ".join("%s;sample_size=1000" % c for c in columns)
+    assert sampled.get_json()["code_municipalite"]["count"] == len(df)
+    assert "X-Approximate-Quantiles" not in exact.headers
@@ -0,0 +1,34 @@
+import io
+import json
+
+import pandas as pd
+
+
+def test_streamed_formats_return_the_same_rows(client):
+    expected = pd.read_csv("data/tunisian_pop.csv").to_dict(orient="records")
+
+    ndjson = client.get("/csv2api/tunisian_pop/all_data?stream=ndjson")
+    assert ndjson.is_streamed and ndjson.mimetype == "application/x-ndjson"
+    assert [json.loads(line) for line in ndjson.get_data(as_text=True).splitlines()] == expected
+
+    array = client.get("/csv2api/tunisian_pop/all_data?stream=json").get_data(as_text=True)
+    assert json.loads(array) == expected
+
+    csv = client.get("/csv2api/tunisian_pop/all_data?stream=csv").get_data(as_text=True)
+    assert pd.read_csv(io.StringIO(csv)).to_dict(orient="records") == expected
+
+
+def test_streamed_filter_and_search_match_their_json_response(client):
+    for method, url in [("get", "/csv2api/tunisian_pop/filter/code_gouvernorat/11"),
+            ("post", "/csv2api/tunisian_pop/search?code_gouvernorat=12&population_annee=2020")]:
+        expected = getattr(client, method)(url).get_json()
+        streamed = getattr(client, method)(url + ("&" if "?" in url else "?") + "stream=ndjson").get_data(as_text=True)
+
+        assert expected
+        assert [json.loads(line) for line in streamed.splitlines()] == expected
+
+
+def test_empty_stream_is_a_valid_json_array(client):
+    response = client.get("/csv2api/tunisian_pop/filter/code_gouvernorat/99?stream=json")
+
+    assert json.loads(response.get_data(as_text=True)) == []
@@ -0,0 +1,66 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+import csv2api
+
+REPLACE_URL = "/csv2api/tunisian_pop/value_replace?_column_to_update_=population_valeur&_new_value_to_set_=7&code_gouvernorat=12"
+
+
+def test_filtered_values_are_replaced(client):
+    expected = pd.read_csv("data/tunisian_pop.csv")
+    replaced = expected["code_gouvernorat"] == 12
+    expected.loc[replaced, "population_valeur"] = 7
+
+    response = client.put(REPLACE_URL)
+
+    assert response.status_code == 202
+    assert response.get_json()["Affected_rows"] == replaced.sum()
+    pd.testing.assert_frame_equal(pd.read_csv("data/tunisian_pop.csv"), expected)
+    assert client.get("/csv2api/tunisian_pop/all_data").get_json() == json.loads(expected.to_json(orient="records"))
+    assert client.put(REPLACE_URL).status_code == 409
+
+
+def test_value_of_another_type_is_refused(client):
+    original = open("data/tunisian_pop.csv").read()
+
+    assert client.put("/csv2api/tunisian_pop/value_replace?_column_to_update_=population_valeur&_new_value_to_set_=abc").status_code == 400
+    assert client.put("/csv2api/tunisian_pop/value_replace?_column_to_update_=population_valeur&_new_value_to_set_=1.5").status_code == 400
+    assert client.put("/csv2api/tunisian_pop/value_replace?_column_to_update_=unknown&_new_value_to_set_=1").status_code == 409
+
+    assert open("data/tunisian_pop.csv").read() == original
+
+
+def test_cached_dataframe_is_not_modified_by_a_failed_write(client, monkeypatch):
+    cached_df = csv2api.load_dataset("tunisian_pop")
+    cached_copy = cached_df.copy()
+    original = open("data/tunisian_pop.csv").read()
+    summary = client.get("/csv2api/tunisian_pop/summary_stats").get_json()
+
+    def fail(filename, df):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(csv2api, "write_csv_atomically", fail)
+
+    assert client.put(REPLACE_URL).status_code == 500
+
+    pd.testing.assert_frame_equal(cached_df, cached_copy)
+    assert open("data/tunisian_pop.csv").read() == original
+    monkeypatch.undo()
+    assert client.get("/csv2api/tunisian_pop/summary_stats").get_json() == summary
+    assert client.get("/csv2api/tunisian_pop/filter/code_gouvernorat/12").get_json() == \
+        json.loads(cached_copy[cached_copy["code_gouvernorat"] == 12].to_json(orient="records"))
+
+
+def test_only_the_updated_column_is_copied(client):
+    cached_df = csv2api.load_dataset("tunisian_pop")
+    cached_copy = cached_df.copy()
+
+    assert client.put(REPLACE_URL).status_code == 202
+
+    new_df = csv2api.load_dataset("tunisian_pop")
+    pd.testing.assert_frame_equal(cached_df, cached_copy)
+    assert list(new_df.columns) == list(cached_df.columns)
+    assert not np.shares_memory(new_df["population_valeur"].to_numpy(), cached_df["population_valeur"].to_numpy())
+    for column in cached_df.columns.drop("population_valeur"):
+        assert np.shares_memory(new_df[column].to_numpy(), cached_df[column].to_numpy()), column
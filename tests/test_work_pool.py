@@ -0,0 +1,103 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import csv2api
+
+
+def blocking_loads(monkeypatch, filename):
+    """Make the loads of a file wait until the returned event is set. Return (started, release, loads)."""
+    started, release, loads = threading.Event(), threading.Event(), []
+    read_dataset = csv2api.read_dataset
+
+    def slow_read_dataset(name):
+        if name == filename:
+            loads.append(name)
+            started.set()
+            release.wait(10)
+        return read_dataset(name)
+    monkeypatch.setattr(csv2api, "read_dataset", slow_read_dataset)
+    return started, release, loads
+
+
+def test_cached_requests_are_served_during_a_slow_load(make_client, write_dataset, monkeypatch):
+    write_dataset("synthetic", 1000)
+    client = make_client(preload_datasets=["tunisian_pop"])
+    app = client.application
+    started, release, _ = blocking_loads(monkeypatch, "synthetic")
+
+    with ThreadPoolExecutor(1) as executor:
+        slow = executor.submit(lambda: app.test_client().get("/csv2api/synthetic/all_data").status_code)
+        assert started.wait(5)
+        start = time.perf_counter()
+        assert client.get("/csv2api/tunisian_pop/header").status_code == 200
+        assert client.get("/csv2api/tunisian_pop/filter/code_gouvernorat/11").status_code == 200
+        assert time.perf_counter() - start < 2
+        release.set()
+        assert slow.result() == 200
+
+
+
+def test_cached_requests_are_served_while_a_write_loads_its_file(make_client, write_dataset, monkeypatch):
+    write_dataset("synthetic", 1000)
+    client = make_client(preload_datasets=["tunisian_pop"])
+    app = client.application
+    started, release, _ = blocking_loads(monkeypatch, "synthetic")
+
+    with ThreadPoolExecutor(1) as executor:
+        slow = executor.submit(lambda: app.test_client().delete("/csv2api/synthetic/column_deletion/densite").status_code)
+        assert started.wait(5)
+        start = time.perf_counter()
+        assert client.get("/csv2api/tunisian_pop/header").status_code == 200
+        assert time.perf_counter() - start < 2
+        release.set()
+        assert slow.result() == 202
+    assert "densite" not in pd.read_csv("data/synthetic.csv").columns
+
+
+def test_concurrent_misses_wait_for_a_single_load(make_client, write_dataset, monkeypatch):
+    df = write_dataset("synthetic", 1000)
+    client = make_client(preload_datasets=[], response_cache_max_memory_mb=0)
+    app = client.application
+    started, release, loads = blocking_loads(monkeypatch, "synthetic")
+
+    with ThreadPoolExecutor(4) as executor:
+        responses = [executor.submit(lambda: app.test_client().get("/csv2api/synthetic/filter/code_gouvernorat/12").get_json()) for _ in range(4)]
+        assert started.wait(5)
+        time.sleep(0.2)
+        release.set()
+        results = [response.result() for response in responses]
+
+    assert loads == ["synthetic"]
+    assert all(result == results[0] for result in results)
+    assert len(results[0]) == (df["code_gouvernorat"] == 12).sum()
+
+
+def test_requests_beyond_the_queue_are_rejected(make_client, write_dataset, monkeypatch):
+    write_dataset("synthetic", 1000)
+    client = make_client(preload_datasets=[], work_pool_threads=1, work_pool_max_queue=0)
+    app = client.application
+    started, release, _ = blocking_loads(monkeypatch, "synthetic")
+
+    with ThreadPoolExecutor(1) as executor:
+        slow = executor.submit(lambda: app.test_client().get("/csv2api/synthetic/all_data").status_code)
+        assert started.wait(5)
+        response = client.get("/csv2api/tunisian_pop/all_data")
+        release.set()
+        assert slow.result() == 200
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert client.get("/csv2api/tunisian_pop/all_data").status_code == 200
+
+
+def test_writer_loads_a_missed_file_under_its_lock(make_client):
+    make_client(preload_datasets=[], work_pool_threads=1, work_pool_max_queue=0)
+
+    with csv2api.File_Lock("tunisian_pop", exclusive=True):
+        df = csv2api.load_dataset("tunisian_pop")
+
+    pd.testing.assert_frame_equal(df, pd.read_csv("data/tunisian_pop.csv"))
+    assert csv2api.dataset_cache.is_fresh("tunisian_pop")
@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import csv2api
+
+
+def new_row(code):
+    return [{"code_municipalite": code, "nom_municipalite_ar": "Nouvelle", "code_gouvernorat": 99, "nom_gouvernorat_ar": "Nouveau",
+        "population_annee": 2020, "population_valeur": code}]
+
+
+def test_concurrent_writes_are_consistent(make_client):
+    client = make_client(group_commit_window_ms=20)
+    client.get("/csv2api/tunisian_pop/summary_stats")
+    app = client.application
+
+    def kind(i):
+        return "replace" if i % 4 == 3 else "deletion" if i % 8 == 5 else "append"
+
+    def write(i):
+        client = app.test_client()
+        if kind(i) == "replace":
+            return client.put("/csv2api/tunisian_pop/value_replace?_column_to_update_=population_valeur&_new_value_to_set_=%d&code_gouvernorat=12" % i).status_code
+        if kind(i) == "deletion":
+            # The row appended by the previous request, if it was already written (304 otherwise)
+            return client.delete("/csv2api/tunisian_pop/row_deletion?code_municipalite=%d" % (10000 + i - 1)).status_code
+        return client.put("/csv2api/tunisian_pop/row_append/records", json=new_row(10000 + i)).status_code
+    with ThreadPoolExecutor(8) as executor:
+        statuses = list(executor.map(write, range(64)))
+
+    assert set(statuses) <= {202, 304, 409}
+    appended = sum(1 for i, status in enumerate(statuses) if kind(i) == "append" and status == 202)
+    deleted = sum(1 for i, status in enumerate(statuses) if kind(i) == "deletion" and status == 202)
+    df = pd.read_csv("data/tunisian_pop.csv")
+    assert appended == 40 and len(df) == 350 + appended - deleted
+    assert client.get("/csv2api/tunisian_pop/all_data").get_json() == json.loads(df.to_json(orient="records"))
+    assert client.get("/csv2api/tunisian_pop/filter/code_gouvernorat/99").get_json() == json.loads(df[df["code_gouvernorat"] == 99].to_json(orient="records"))
+    assert client.get("/csv2api/tunisian_pop/summary_stats").get_json() == json.loads(df.describe().to_json(orient="columns"))
+
+
+def test_concurrent_writes_are_committed_together(make_client, monkeypatch):
+    client = make_client(group_commit_window_ms=300)
+    app = client.application
+    batches = []
+    run_write_batch = csv2api.run_write_batch
+    monkeypatch.setattr(csv2api, "run_write_batch", lambda filename, operations: batches.append(len(operations)) or run_write_batch(filename, operations))
+
+    with ThreadPoolExecutor(8) as executor:
+        statuses = list(executor.map(lambda i: app.test_client().put("/csv2api/tunisian_pop/row_append/records", json=new_row(10000 + i)).status_code, range(8)))
+
+    assert statuses == [202] * 8
+    assert sum(batches) == 8 and len(batches) < 8
+    assert sorted(pd.read_csv("data/tunisian_pop.csv")["code_municipalite"].tail(8)) == list(range(10000, 10008))
+
+
+def test_failed_batch_leaves_the_file_and_the_cache_untouched(make_client, monkeypatch):
+    client = make_client(group_commit_window_ms=1000)
+    app = client.application
+    original = open("data/tunisian_pop.csv").read()
+    before = client.get("/csv2api/tunisian_pop/all_data").get_json()
+
+    def fail(filename, df):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(csv2api, "write_csv_atomically", fail)
+    batches = []
+    run_write_batch = csv2api.run_write_batch
+    monkeypatch.setattr(csv2api, "run_write_batch", lambda filename, operations: batches.append(len(operations)) or run_write_batch(filename, operations))
+    requests = [lambda client: client.put("/csv2api/tunisian_pop/row_append/records", json=new_row(10000)),
+        lambda client: client.put("/csv2api/tunisian_pop/value_replace?_column_to_update_=population_valeur&_new_value_to_set_=7&code_gouvernorat=12")]
+    with ThreadPoolExecutor(2) as executor:
+        statuses = [response.status_code for response in executor.map(lambda request: request(app.test_client()), requests)]
+
+    assert batches == [2] and statuses == [409, 500]
+    assert open("data/tunisian_pop.csv").read() == original
+    assert not [name for name in os.listdir("data") if name.endswith(".tmp")]
+    monkeypatch.undo()
+    assert client.get("/csv2api/tunisian_pop/all_data").get_json() == before
+
+
+def test_file_lock_excludes_the_readers_while_writing(client):
+    acquired = threading.Event()
+
+    def read():
+        with csv2api.File_Lock("tunisian_pop", exclusive=False):
+            acquired.set()
+
+    with csv2api.File_Lock("tunisian_pop", exclusive=True):
+        with csv2api.File_Lock("tunisian_pop", exclusive=True):
+            pass # Taken again by the same thread without blocking
+        reader = threading.Thread(target=read)
+        reader.start()
+        assert not acquired.wait(0.3)
+    assert acquired.wait(5)
+    reader.join()